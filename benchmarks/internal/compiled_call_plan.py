@@ -0,0 +1,57 @@
+import time
+
+import falcon
+from falcon.testing import StartResponseMock, create_environ
+
+import hug
+
+REQUESTS = 100000
+
+
+class Timer(object):
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        taken = time.perf_counter() - self.start
+        print(
+            "{0} took {1:.3f}s ({2:.2f}us per request)".format(
+                self.name, taken, taken / REQUESTS * 1000000
+            )
+        )
+
+
+class Resource(object):
+    def on_get(self, request, response):
+        response.data = hug.output_format.json({"text": "Hello, World!"})
+        response.content_type = "application/json; charset=utf-8"
+
+
+def hug_server(compiled):
+    api = hug.API("compiled_call_plan_{0}".format(compiled))
+    api.http.compiled = compiled
+
+    @hug.get("/text", api=api)
+    def text():
+        return {"text": "Hello, World!"}
+
+    return api.http.server(default_not_found=False)
+
+
+def run(name, app):
+    environ = create_environ(path="/text")
+    start_response = StartResponseMock()
+    with Timer(name):
+        for _request in range(REQUESTS):
+            app(environ, start_response)
+
+
+falcon_app = falcon.API()
+falcon_app.add_route("/text", Resource())
+
+run("falcon", falcon_app)
+run("hug", hug_server(compiled=False))
+run("hug_compiled", hug_server(compiled=True))
@@ -0,0 +1,81 @@
+import base64
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from uuid import UUID, uuid4
+
+import hug
+from hug.json_module import json
+
+ITEMS = 100000
+
+
+class Timer(object):
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        taken = time.perf_counter() - self.start
+        print(
+            "{0} took {1:.3f}s ({2:.2f}us per item)".format(
+                self.name, taken, taken / ITEMS * 1000000
+            )
+        )
+
+
+class Point(object):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+@hug.output_format.json_convert(Point)
+def point_converter(item):
+    return (item.x, item.y)
+
+
+def linear_json_converter(item):
+    """The isinstance scan JSON converters were resolved with before the per type dispatch table"""
+    if hasattr(item, "__native_types__"):
+        return item.__native_types__()
+
+    for kind, transformer in hug.output_format.json_converters.items():
+        if isinstance(item, kind):
+            return transformer(item)
+
+    if isinstance(item, (date, datetime)):
+        return item.isoformat()
+    elif isinstance(item, bytes):
+        try:
+            return item.decode("utf8")
+        except UnicodeDecodeError:
+            return base64.b64encode(item)
+    elif hasattr(item, "__iter__"):
+        return list(item)
+    elif isinstance(item, (Decimal, UUID)):
+        return str(item)
+    elif isinstance(item, timedelta):
+        return item.total_seconds()
+    raise TypeError("Type not serializable")
+
+
+now = datetime.now()
+kinds = (
+    lambda number: Decimal(number) / 100,
+    lambda number: now + timedelta(seconds=number),
+    lambda number: uuid4(),
+    lambda number: timedelta(seconds=number),
+    lambda number: Point(number, number),
+)
+payload = [kinds[number % len(kinds)](number) for number in range(ITEMS)]
+
+for backend in ("json", "orjson"):
+    hug.json_module.use(backend)
+    with Timer("{0}_linear_scan".format(backend)):
+        json.dumps_bytes(payload, default=linear_json_converter)
+
+    with Timer("{0}_type_dispatch".format(backend)):
+        json.dumps_bytes(payload, default=hug.output_format._json_converter)
@@ -0,0 +1,41 @@
+import time
+from collections import namedtuple
+
+import hug
+from hug.json_module import json
+
+ITEMS = 200000
+
+
+class Timer(object):
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        taken = time.perf_counter() - self.start
+        print(
+            "{0} took {1:.3f}s ({2:.2f}us per item)".format(
+                self.name, taken, taken / ITEMS * 1000000
+            )
+        )
+
+
+Point = namedtuple("Point", ("x", "y"))
+
+payloads = {
+    "dicts": [{"id": number, "name": "item", "tags": ["a", "b"]} for number in range(ITEMS)],
+    "namedtuples": [Point(number, number) for number in range(ITEMS)],
+    "nested_namedtuples": [{"id": number, "point": Point(number, number)} for number in range(ITEMS)],
+}
+
+for backend in ("json", "orjson"):
+    hug.json_module.use(backend)
+    for name, payload in payloads.items():
+        with Timer("{0}_{1}_dumps_bytes".format(backend, name)):
+            json.dumps_bytes(payload, default=hug.output_format._json_converter)
+
+        with Timer("{0}_{1}_output_format".format(backend, name)):
+            hug.output_format.json(payload)
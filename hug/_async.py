@@ -0,0 +1,62 @@
+"""hug/_async.py
+
+Defines the long-lived, per process, event loop coroutines are ran within when called from synchronous code
+
+Copyright (C) 2016  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import
+
+import asyncio
+import os
+import threading
+
+_lock = threading.Lock()
+_loop = None
+_loop_pid = None
+
+
+def background_loop():
+    """Returns this process' background event loop, starting it within a daemon thread on first use.
+
+    The loop is recreated if the process has been forked since it was started, as the thread running it
+    does not survive the fork.
+    """
+    global _loop, _loop_pid
+    if _loop is None or _loop_pid != os.getpid():
+        with _lock:
+            if _loop is None or _loop_pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="hug-event-loop", daemon=True
+                ).start()
+                _loop, _loop_pid = loop, os.getpid()
+    return _loop
+
+
+def call(function, *args, **kwargs):
+    """Calls the coroutine function within the background event loop, blocking until its result is available.
+
+    If an event loop is already running within the calling thread the coroutine is returned to be awaited instead.
+    """
+    if asyncio.events._get_running_loop() is not None:
+        return function(*args, **kwargs)
+
+    async def run_function():
+        return await function(*args, **kwargs)
+
+    return asyncio.run_coroutine_threadsafe(run_function(), background_loop()).result()
@@ -22,22 +22,30 @@ OTHER DEALINGS IN THE SOFTWARE.
 from __future__ import absolute_import
 
 import asyncio
+import copy
 import sys
 from collections import OrderedDict, namedtuple
 from distutils.util import strtobool
 from functools import partial
 from itertools import chain
+from string import Formatter
 from types import ModuleType
 from wsgiref.simple_server import make_server
 
 import falcon
 from falcon import HTTP_METHODS
 
+import hug._async
+import hug.asgi
 import hug.defaults
 import hug.output_format
 from hug import introspect
 from hug._version import current
 
+DOCUMENTATION_CACHE_SIZE = 64
+DOCUMENTATION_404_CACHE_SIZE = 64
+IMMUTABLE_DOCUMENTATION_TYPES = (str, int, float, bool)
+
 INTRO = """
 /#######################################################################\\
           `.----``..-------..``.----.
@@ -65,6 +73,44 @@ INTRO = """
 )
 
 
+def copied_documentation(documentation):
+    """Returns a deep copy of the documentation, for a fraction of the cost of copy.deepcopy
+
+    Documentation is mostly dicts, lists and strings: those are copied (or shared, being immutable) directly, anything
+    else (such as the default of a parameter) through copy.deepcopy.
+    """
+    if isinstance(documentation, dict):
+        return type(documentation)(
+            (key, copied_documentation(value)) for key, value in documentation.items()
+        )
+    elif isinstance(documentation, list):
+        return [copied_documentation(value) for value in documentation]
+    elif documentation is None or isinstance(documentation, IMMUTABLE_DOCUMENTATION_TYPES):
+        return documentation
+    return copy.deepcopy(documentation)
+
+
+def prefixed_documentation(documentation, prefix):
+    """Returns a copy of the documentation with the given prefix added to its examples, sharing everything else"""
+    prefixed = OrderedDict(documentation)
+    prefixed["handlers"] = OrderedDict(
+        (
+            url,
+            OrderedDict(
+                (
+                    method,
+                    OrderedDict(doc, examples=[prefix + example for example in doc["examples"]])
+                    if "examples" in doc
+                    else doc,
+                )
+                for method, doc in methods.items()
+            ),
+        )
+        for url, methods in documentation["handlers"].items()
+    )
+    return prefixed
+
+
 class InterfaceAPI(object):
     """Defines the per-interface API which defines all shared information for a specific interface, and how it should
         be exposed
@@ -76,6 +122,81 @@ class InterfaceAPI(object):
         self.api = api
 
 
+class URLTemplate(object):
+    """A routed URL, along with the names of the parameters it needs filled in"""
+
+    __slots__ = ("url", "fields")
+
+    def __init__(self, url):
+        self.url = url
+        self.fields = frozenset(
+            field for _text, field, _spec, _conv in Formatter().parse(url) if field
+        )
+
+    def format(self, **kwargs):
+        return self.url.format(**kwargs)
+
+
+class VersionRouter(object):
+    """Routes requests to the handler for the API version they ask for, using lookups precomputed on creation
+
+    The version is taken from the URL (`/v{api_version}`), the X-API-VERSION header, or the api_version query param.
+    When api_version is False the version is instead found within the requested path, as done for not found handlers.
+    """
+
+    __slots__ = ("handlers", "unversioned", "fallback", "path_versions", "api_version")
+    interface = True
+
+    def __init__(self, versions, not_found=None, api_versions=(), api_version=None):
+        self.fallback = versions.get(None, not_found)
+        self.unversioned = versions.get(False, self.fallback)
+        self.handlers = {}
+        for version, handler in versions.items():
+            if version is not None and version is not False:
+                self.handlers[version] = handler
+                self.handlers[str(version)] = handler
+        self.path_versions = tuple(
+            sorted(
+                (("v{0}".format(version), version) for version in api_versions if version),
+                key=lambda path_version: len(path_version[0]),
+                reverse=True,
+            )
+        )
+        self.api_version = api_version
+
+    def __call__(self, request, response, **kwargs):
+        api_version = kwargs.pop("api_version", self.api_version)
+        self.handler(request, api_version)(request, response, api_version=api_version, **kwargs)
+
+    def handler(self, request, api_version=None):
+        """Returns the handler that should be used for the version being requested"""
+        if api_version is False:
+            api_version = None
+            path = request.path
+            for path_version, version in self.path_versions:
+                if path_version in path:
+                    api_version = version
+                    break
+
+        requested = api_version
+        version_header = request.get_header("X-API-VERSION")
+        version_param = request.get_param("api_version")
+        for version in (version_header or None, version_param):
+            if version is not None:
+                if requested is not None and str(version) != str(requested):
+                    raise ValueError("You are requesting conflicting versions")
+                requested = version
+
+        if not requested:
+            return self.unversioned
+
+        handler = self.handlers.get(requested)
+        if handler is None:
+            requested = int(requested)
+            handler = self.handlers.get(requested, self.fallback) if requested else self.unversioned
+        return handler
+
+
 class HTTPInterfaceAPI(InterfaceAPI):
     """Defines the HTTP interface specific API"""
 
@@ -92,15 +213,25 @@ class HTTPInterfaceAPI(InterfaceAPI):
         "sinks",
         "_not_found",
         "_exception_handlers",
+        "compiled",
+        "revision",
+        "_documentation",
+        "_documentation_404",
+        "_url_index",
     )
 
-    def __init__(self, api, base_url=""):
+    def __init__(self, api, base_url="", compiled=False):
         super().__init__(api)
         self.versions = set()
         self.routes = OrderedDict()
         self.sinks = OrderedDict()
         self.versioned = OrderedDict()
         self.base_url = base_url
+        self.compiled = compiled
+        self.revision = 0
+        self._documentation = {}
+        self._documentation_404 = OrderedDict()
+        self._url_index = None
 
     @property
     def output_format(self):
@@ -109,18 +240,67 @@ class HTTPInterfaceAPI(InterfaceAPI):
     @output_format.setter
     def output_format(self, formatter):
         self._output_format = formatter
+        self.changed()
 
     @property
     def not_found(self):
         """Returns the active not found handler"""
         return getattr(self, "_not_found", self.base_404)
 
+    def changed(self):
+        """Marks the routes of this API as changed, so anything generated from them, such as documentation, is
+           rebuilt
+        """
+        self.revision += 1
+        self._documentation.clear()
+        self._documentation_404.clear()
+        self._url_index = None
+
     def urls(self):
         """Returns a generator of all URLs attached to this API"""
         for base_url, mapping in self.routes.items():
             for url, _ in mapping.items():
                 yield base_url + url
 
+    def url_index(self):
+        """Returns the reverse routing index of this API, built once from its routes and again only when they change
+
+        It maps every (interface, version) pair to the URL templates routed to it, in the order they were added, and
+        (interface, version, parameter names) to the first of those taking exactly the given parameters.
+        """
+        index = self._url_index
+        if index is None:
+            index = {}
+            for _base_url, routes in self.routes.items():
+                for url, methods in routes.items():
+                    for versions in methods.values():
+                        for version, interface in versions.items():
+                            url_template = ("/v{0}".format(version) if version else "") + url
+                            templates = index.setdefault((interface, version), [])
+                            if not any(template.url == url_template for template in templates):
+                                template = URLTemplate(url_template)
+                                templates.append(template)
+                                index.setdefault((interface, version, template.fields), template)
+            self._url_index = index
+        return index
+
+    def url_for(self, handler, version=None, **kwargs):
+        """Returns the URL routed to the handler (an HTTP interface or hug decorated function) for the given version,
+           with the provided URL parameters filled in
+        """
+        interface = getattr(getattr(handler, "interface", None), "http", handler)
+        index = self.url_index()
+        fields = frozenset(kwargs)
+        template = index.get((interface, version, fields))
+        if template is None:
+            for candidate in index.get((interface, version), ()):
+                if fields <= candidate.fields:
+                    template = candidate
+                    break
+            else:
+                raise KeyError("URL that takes all provided parameters not found")
+        return template.format(**kwargs)
+
     def handlers(self):
         """Returns all registered handlers attached to this API"""
         used = []
@@ -210,6 +390,8 @@ class HTTPInterfaceAPI(InterfaceAPI):
             if version not in self.not_found_handlers:
                 self.set_not_found_handler(handler, version)
 
+        self.changed()
+
     @property
     def not_found_handlers(self):
         return getattr(self, "_not_found_handlers", {})
@@ -221,10 +403,51 @@ class HTTPInterfaceAPI(InterfaceAPI):
 
         self.not_found_handlers[version] = handler
 
+    def cached(self, key, build):
+        """Returns what build generates from the routes of this API, only calling it again after the routes change"""
+        cache = self._documentation
+        try:
+            return cache[key]
+        except KeyError:
+            value = build()
+            if len(cache) >= DOCUMENTATION_CACHE_SIZE:
+                cache.clear()
+            cache[key] = value
+            return value
+
+    def cached_404(self, key, build):
+        """Returns the 404 body build encodes for the key, keeping the most recently used bodies until routes change"""
+        cache = self._documentation_404
+        try:
+            value = cache[key]
+            cache.move_to_end(key)
+            return value
+        except KeyError:
+            value = cache[key] = build()
+            while len(cache) > DOCUMENTATION_404_CACHE_SIZE:
+                cache.popitem(last=False)
+            return value
+
     def documentation(self, base_url=None, api_version=None, prefix=""):
+        """Returns documentation for this API endpoint, generated once per base URL and version"""
+        return copied_documentation(self.shared_documentation(base_url, api_version, prefix))
+
+    def shared_documentation(self, base_url=None, api_version=None, prefix=""):
+        """Returns the cached documentation for this API endpoint, which is shared and so must not be modified
+
+        Documentation is cached per base URL and version only, the prefix being applied to the examples of a shallow
+        copy, as it may come from the request (such as its host).
+        """
+        base_url = self.base_url if base_url is None else base_url
+        documentation = self.cached(
+            ("documentation", base_url, api_version),
+            partial(self.generate_documentation, base_url, api_version),
+        )
+        return prefixed_documentation(documentation, prefix) if prefix else documentation
+
+    def generate_documentation(self, base_url, api_version=None, prefix=""):
         """Generates and returns documentation for this API endpoint"""
         documentation = OrderedDict()
-        base_url = self.base_url if base_url is None else base_url
         overview = self.api.doc
         if overview:
             documentation["overview"] = overview
@@ -318,25 +541,33 @@ class HTTPInterfaceAPI(InterfaceAPI):
         """Returns a smart 404 page that contains documentation for the written API"""
         base_url = self.base_url if base_url is None else base_url
 
-        def handle_404(request, response, *args, **kwargs):
-            url_prefix = request.forwarded_uri[:-1]
-            if request.path and request.path != "/":
-                url_prefix = request.forwarded_uri.split(request.path)[0]
-
+        def not_found_body(api_version, prefix):
             to_return = OrderedDict()
             to_return["404"] = (
                 "The API call you tried to make was not defined. "
                 "Here's a definition of the API to help you get going :)"
             )
-            to_return["documentation"] = self.documentation(
-                base_url, self.determine_version(request, False), prefix=url_prefix
-            )
+            to_return["documentation"] = self.shared_documentation(base_url, api_version, prefix)
+            return to_return
 
+        def handle_404(request, response, *args, **kwargs):
+            url_prefix = request.forwarded_uri[:-1]
+            if request.path and request.path != "/":
+                url_prefix = request.forwarded_uri.split(request.path)[0]
+
+            api_version = self.determine_version(request, False)
             if self.output_format == hug.output_format.json:
-                response.data = hug.output_format.json(to_return, indent=4, separators=(",", ": "))
+                response.data = self.cached_404(
+                    (base_url, api_version, url_prefix),
+                    lambda: hug.output_format.json(
+                        not_found_body(api_version, url_prefix), indent=4, separators=(",", ": ")
+                    ),
+                )
                 response.content_type = "application/json; charset=utf-8"
             else:
-                response.data = self.output_format(to_return, request=request, response=response)
+                response.data = self.output_format(
+                    not_found_body(api_version, url_prefix), request=request, response=response
+                )
                 response.content_type = self.output_format.content_type
 
             response.status = falcon.HTTP_NOT_FOUND
@@ -348,16 +579,21 @@ class HTTPInterfaceAPI(InterfaceAPI):
         self, request, response, api_version=None, versions=None, not_found=None, **kwargs
     ):
         """Intelligently routes a request to the correct handler based on the version being requested"""
-        versions = {} if versions is None else versions
-        request_version = self.determine_version(request, api_version)
-        if request_version:
-            request_version = int(request_version)
-        versions.get(request_version or False, versions.get(None, not_found))(
+        self.version_handler(request, api_version, versions, not_found)(
             request, response, api_version=api_version, **kwargs
         )
 
+    def version_handler(self, request, api_version=None, versions=None, not_found=None):
+        """Returns the handler that should be used for the version being requested"""
+        router = VersionRouter({} if versions is None else versions, not_found, self.versions)
+        return router.handler(request, api_version)
+
     def server(self, default_not_found=True, base_url=None):
-        """Returns a WSGI compatible API server for the given Hug API module"""
+        """Returns a WSGI compatible API server for the given Hug API module
+
+        If `compiled` is set on this HTTP API, every route handler is replaced by its precompiled call plan
+        (see `hug.interface.HTTP.compile`); routes should not be changed after the server is created.
+        """
         falcon_api = self.falcon = falcon.API(middleware=self.middleware)
         if not self.api.future:
             falcon_api.req_options.keep_blank_qs_values = False
@@ -373,13 +609,9 @@ class HTTPInterfaceAPI(InterfaceAPI):
             if len(self.not_found_handlers) == 1 and None in self.not_found_handlers:
                 not_found_handler = self.not_found_handlers[None]
             else:
-                not_found_handler = partial(
-                    self.version_router,
-                    api_version=False,
-                    versions=self.not_found_handlers,
-                    not_found=default_not_found,
+                not_found_handler = VersionRouter(
+                    self.not_found_handlers, default_not_found, self.versions, api_version=False
                 )
-                not_found_handler.interface = True
 
         if not_found_handler:
             falcon_api.add_sink(not_found_handler)
@@ -389,16 +621,30 @@ class HTTPInterfaceAPI(InterfaceAPI):
             for url, extra_sink in sinks.items():
                 falcon_api.add_sink(extra_sink, sink_base_url + url + "(?P<path>.*)")
 
+        if self.compiled:
+            compiled_handlers = {}
+
+            def compile_handler(handler):
+                if handler not in compiled_handlers:
+                    compile = getattr(handler, "compile", None)
+                    compiled_handlers[handler] = compile() if compile else handler
+                return compiled_handlers[handler]
+
         for router_base_url, routes in self.routes.items():
             for url, methods in routes.items():
                 router = {}
                 for method, versions in methods.items():
+                    if self.compiled:
+                        versions = {
+                            version: compile_handler(handler)
+                            for version, handler in versions.items()
+                        }
                     method_function = "on_{0}".format(method.lower())
                     if len(versions) == 1 and None in versions.keys():
                         router[method_function] = versions[None]
                     else:
-                        router[method_function] = partial(
-                            self.version_router, versions=versions, not_found=not_found_handler
+                        router[method_function] = VersionRouter(
+                            versions, not_found_handler, self.versions
                         )
 
                 router = namedtuple("Router", router.keys())(**router)
@@ -415,6 +661,24 @@ class HTTPInterfaceAPI(InterfaceAPI):
         falcon_api.set_error_serializer(error_serializer)
         return falcon_api
 
+    def asgi_server(
+        self, default_not_found=True, base_url=None, max_workers=None, max_body_size=None
+    ):
+        """Returns an ASGI compatible API server for the given Hug API module
+
+        The same routes, versions, sinks, not found handlers and middleware as `server()` are exposed.
+        Coroutine endpoints are awaited on the server's event loop, while all other handlers are ran within
+        a thread pool limited to `max_workers` threads. Request bodies larger than `max_body_size` bytes are
+        rejected with 413 Payload Too Large.
+        """
+        return hug.asgi.ASGI(
+            self,
+            default_not_found=default_not_found,
+            base_url=base_url,
+            max_workers=max_workers,
+            max_body_size=max_body_size,
+        )
+
 
 HTTPInterfaceAPI.base_404.interface = True
 
@@ -422,12 +686,17 @@ HTTPInterfaceAPI.base_404.interface = True
 class CLIInterfaceAPI(InterfaceAPI):
     """Defines the CLI interface specific API"""
 
-    __slots__ = ("commands", "error_exit_codes", "_output_format")
+    __slots__ = ("commands", "error_exit_codes", "_output_format", "_usage")
 
     def __init__(self, api, version="", error_exit_codes=False):
         super().__init__(api)
         self.commands = {}
         self.error_exit_codes = error_exit_codes
+        self._usage = None
+
+    def changed(self):
+        """Marks the commands of this API as changed, so the usage description is rebuilt"""
+        self._usage = None
 
     def __call__(self, args=None):
         """Routes to the correct command line tool"""
@@ -459,6 +728,7 @@ class CLIInterfaceAPI(InterfaceAPI):
         else:
             for name, command in cli_api.commands.items():
                 self.commands["{}{}".format(command_prefix, name)] = command
+        self.changed()
 
     @property
     def output_format(self):
@@ -469,14 +739,18 @@ class CLIInterfaceAPI(InterfaceAPI):
         self._output_format = formatter
 
     def __str__(self):
-        output = "{0}\n\nAvailable Commands:\n\n".format(self.api.doc or self.api.name)
-        for command_name, command in self.commands.items():
-            command_string = " - {}{}".format(
-                command_name, ": " + str(command).replace("\n", " ") if str(command) else ""
-            )
-            output += command_string[:77] + "..." if len(command_string) > 80 else command_string
-            output += "\n"
-        return output
+        if self._usage is None:
+            output = "{0}\n\nAvailable Commands:\n\n".format(self.api.doc or self.api.name)
+            for command_name, command in self.commands.items():
+                command_string = " - {}{}".format(
+                    command_name, ": " + str(command).replace("\n", " ") if str(command) else ""
+                )
+                output += (
+                    command_string[:77] + "..." if len(command_string) > 80 else command_string
+                )
+                output += "\n"
+            self._usage = output
+        return self._usage
 
 
 class ModuleSingleton(type):
@@ -523,9 +797,18 @@ class API(object, metaclass=ModuleSingleton):
         "doc",
         "future",
         "cli_error_exit_codes",
+        "background_loop",
     )
 
-    def __init__(self, module=None, name="", doc="", cli_error_exit_codes=False, future=False):
+    def __init__(
+        self,
+        module=None,
+        name="",
+        doc="",
+        cli_error_exit_codes=False,
+        future=False,
+        background_loop=False,
+    ):
         self.module = module
         if module:
             self.name = name or module.__name__ or ""
@@ -536,6 +819,7 @@ class API(object, metaclass=ModuleSingleton):
         self.started = False
         self.cli_error_exit_codes = cli_error_exit_codes
         self.future = future
+        self.background_loop = background_loop
 
     def directives(self):
         """Returns all directives applicable to this Hug API"""
@@ -623,12 +907,15 @@ class API(object, metaclass=ModuleSingleton):
     def _ensure_started(self):
         """Marks the API as started and runs all startup handlers"""
         if not self.started:
+            self.started = True
             async_handlers = [
                 startup_handler
                 for startup_handler in self.startup_handlers
                 if introspect.is_coroutine(startup_handler)
             ]
-            if async_handlers:
+            if async_handlers and self.background_loop:
+                hug._async.call(asyncio.gather, *[handler(self) for handler in async_handlers])
+            elif async_handlers:
                 loop = asyncio.get_event_loop()
                 loop.run_until_complete(
                     asyncio.gather(*[handler(self) for handler in async_handlers])
@@ -637,6 +924,21 @@ class API(object, metaclass=ModuleSingleton):
                 if not startup_handler in async_handlers:
                     startup_handler(self)
 
+    async def _ensure_started_async(self):
+        """Marks the API as started and runs all startup handlers, awaiting the asynchronous ones directly"""
+        if not self.started:
+            self.started = True
+            async_handlers = [
+                startup_handler
+                for startup_handler in self.startup_handlers
+                if introspect.is_coroutine(startup_handler)
+            ]
+            if async_handlers:
+                await asyncio.gather(*[handler(self) for handler in async_handlers])
+            for startup_handler in self.startup_handlers:
+                if not startup_handler in async_handlers:
+                    startup_handler(self)
+
     @property
     def startup_handlers(self):
         return getattr(self, "_startup_handlers", ())
@@ -0,0 +1,362 @@
+"""hug/asgi.py
+
+Defines the ASGI server used to expose a hug API to ASGI compatible servers such as uvicorn, daphne, or hypercorn
+
+Copyright (C) 2016  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import
+
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+import falcon
+from falcon.api import _BODILESS_STATUS_CODES, _TYPELESS_STATUS_CODES
+
+import hug._empty as empty
+import hug.interface
+from hug import introspect
+from hug.exceptions import ClientDisconnected
+
+ZEROCOPY_SEND = "http.response.zerocopysend"
+BODY_MEMORY_THRESHOLD = 1024 * 1024
+
+
+def coroutine_interface(handler):
+    """Returns the HTTP interface behind a routed handler if it exposes a coroutine, otherwise None"""
+    interface = handler if hasattr(handler, "call_async") else getattr(handler, "interface", None)
+    if hasattr(interface, "call_async") and (
+        interface.interface.is_coroutine or introspect.is_async_generator(interface.interface.spec)
+    ):
+        return interface
+    return None
+
+
+def file_region(response):
+    """Returns the (file, offset, count) region a response streams if it can be sent straight from a file descriptor"""
+    stream = response.stream
+    if stream is None or response.body is not None or response.data is not None:
+        return None
+
+    if isinstance(stream, hug.interface.StreamSlice):
+        file, offset, count = stream.stream, stream.stream.tell(), stream.remaining
+    else:
+        file, count = stream, response.content_length
+        try:
+            offset = file.tell()
+        except (AttributeError, OSError, ValueError):
+            return None
+
+    try:
+        file.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+    return (file, offset, int(count)) if count is not None else None
+
+
+class ASGI(object):
+    """Exposes a hug HTTP API as an ASGI application
+
+    Requests are parsed and routed by the same Falcon application `hug.API.http.server()` produces, so all routes,
+    versions, sinks, not found handlers, and middleware behave identically. Coroutine endpoints, asynchronous startup
+    handlers and asynchronous directives are awaited on the running event loop, while synchronous handlers are ran in
+    a bounded thread pool. Middleware is ran on the event loop and should not block.
+
+    Request bodies are received in full before routing, spilling over to disk beyond BODY_MEMORY_THRESHOLD bytes.
+    Bodies larger than max_body_size are answered with 413 Payload Too Large as soon as they exceed it.
+    """
+
+    __slots__ = (
+        "http",
+        "default_not_found",
+        "base_url",
+        "executor",
+        "max_body_size",
+        "falcon",
+        "_starting",
+    )
+
+    def __init__(
+        self, http, default_not_found=True, base_url=None, max_workers=None, max_body_size=None
+    ):
+        self.http = http
+        self.default_not_found = default_not_found
+        self.base_url = base_url
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.max_body_size = max_body_size
+        self.falcon = None
+        self._starting = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        elif scope["type"] != "http":
+            raise ValueError("Unsupported ASGI connection type: {0}".format(scope["type"]))
+
+        await self.startup()
+        falcon_api = self.falcon
+        environ = self.environ(scope, None)
+        try:
+            body = await self.read_body(receive, environ.get("CONTENT_LENGTH"))
+        except ClientDisconnected:
+            return
+        environ["wsgi.input"] = BytesIO() if body is None else body
+        try:
+            request = falcon_api._request_type(environ, options=falcon_api.req_options)
+            response = falcon_api._response_type(options=falcon_api.resp_options)
+            if body is None:
+                falcon_api._handle_exception(
+                    request,
+                    response,
+                    falcon.HTTPPayloadTooLarge(
+                        "Request body too large",
+                        "Request bodies can be at most {0} bytes".format(self.max_body_size),
+                    ),
+                    {},
+                )
+            else:
+                await self.respond(request, response)
+            await self.send_response(request, response, send)
+        finally:
+            environ["wsgi.input"].close()
+
+    async def startup(self):
+        """Runs the APIs startup handlers and builds the underlying Falcon API, exactly once"""
+        if self._starting is None:
+            self._starting = asyncio.ensure_future(self._startup())
+        await self._starting
+
+    async def _startup(self):
+        await self.http.api._ensure_started_async()
+        self.falcon = self.http.server(self.default_not_found, self.base_url)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as exception:
+                    await send({"type": "lifespan.startup.failed", "message": str(exception)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def read_body(self, receive, content_length=None):
+        """Receives the request body, returning None if it's larger than max_body_size
+
+        Raises ClientDisconnected if the client goes away before the whole body is received.
+        """
+        max_body_size = self.max_body_size
+        if max_body_size is not None and content_length and int(content_length) > max_body_size:
+            return None
+
+        body = SpooledTemporaryFile(max_size=BODY_MEMORY_THRESHOLD)
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                body.close()
+                raise ClientDisconnected()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if max_body_size is not None and size > max_body_size:
+                body.close()
+                return None
+            body.write(chunk)
+            more_body = message.get("more_body", False)
+        body.seek(0)
+        return body
+
+    @staticmethod
+    def environ(scope, body):
+        """Returns a WSGI environment equivalent to the given ASGI connection scope"""
+        server = scope.get("server", None) or ("localhost", 80)
+        client = scope.get("client", None)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+            "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": "HTTP/{0}".format(scope.get("http_version", "1.1")),
+            "REMOTE_ADDR": client[0] if client else "",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": body,
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+            "asgi.scope": scope,
+        }
+        for name, value in scope.get("headers", ()):
+            name = name.decode("latin1").upper().replace("-", "_")
+            value = value.decode("latin1")
+            if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                name = "HTTP_{0}".format(name)
+            environ[name] = "{0},{1}".format(environ[name], value) if name in environ else value
+        return environ
+
+    async def respond(self, request, response):
+        """Runs middleware and the routed handler against the request, mirroring falcon.API.__call__"""
+        falcon_api = self.falcon
+        resource = None
+        params = {}
+        dependent_mw_resp_stack = []
+        mw_req_stack, mw_rsrc_stack, mw_resp_stack = falcon_api._middleware
+        req_succeeded = False
+
+        try:
+            try:
+                if falcon_api._independent_middleware:
+                    for process_request in mw_req_stack:
+                        process_request(request, response)
+                        if response.complete:
+                            break
+                else:
+                    for process_request, process_response in mw_req_stack:
+                        if process_request and not response.complete:
+                            process_request(request, response)
+                        if process_response:
+                            dependent_mw_resp_stack.insert(0, process_response)
+
+                if not response.complete:
+                    responder, params, resource, request.uri_template = falcon_api._get_responder(
+                        request
+                    )
+            except Exception as exception:
+                if not falcon_api._handle_exception(request, response, exception, params):
+                    raise
+            else:
+                try:
+                    if resource:
+                        for process_resource in mw_rsrc_stack:
+                            process_resource(request, response, resource, params)
+                            if response.complete:
+                                break
+
+                    if not response.complete:
+                        await self.dispatch(responder, request, response, params)
+
+                    req_succeeded = True
+                except Exception as exception:
+                    if not falcon_api._handle_exception(request, response, exception, params):
+                        raise
+        finally:
+            for process_response in mw_resp_stack or dependent_mw_resp_stack:
+                try:
+                    process_response(request, response, resource, req_succeeded)
+                except Exception as exception:
+                    if not falcon_api._handle_exception(request, response, exception, params):
+                        raise
+
+                    req_succeeded = False
+
+    async def dispatch(self, responder, request, response, params):
+        """Awaits coroutine endpoints directly, running every other handler within the thread pool"""
+        if isinstance(responder, hug.api.VersionRouter):
+            api_version = params.pop("api_version", responder.api_version)
+            responder = responder.handler(request, api_version)
+            params["api_version"] = api_version
+
+        interface = coroutine_interface(responder)
+        if interface:
+            await interface.call_async(request, response, **params)
+        else:
+            await asyncio.get_event_loop().run_in_executor(
+                self.executor, partial(responder, request, response, **params)
+            )
+
+    async def send_response(self, request, response, send):
+        status = response.status
+        media_type = self.falcon._media_type
+        zerocopy = None
+        if request.method == "HEAD" or status in _BODILESS_STATUS_CODES:
+            body = ()
+            if status in _TYPELESS_STATUS_CODES:
+                media_type = None
+        else:
+            if ZEROCOPY_SEND in (request.env["asgi.scope"].get("extensions") or empty.dict):
+                zerocopy = file_region(response)
+            if zerocopy:
+                body = ()
+                response._headers["content-length"] = str(zerocopy[2])
+            else:
+                body, length = self.falcon._get_body(response)
+                if length is not None:
+                    response._headers["content-length"] = str(length)
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": int(status[:3]),
+                "headers": [
+                    (name.encode("latin1"), value.encode("latin1"))
+                    for name, value in response._wsgi_headers(media_type)
+                ],
+            }
+        )
+        if zerocopy:
+            file, offset, count = zerocopy
+            try:
+                await send(
+                    {
+                        "type": ZEROCOPY_SEND,
+                        "file": file,
+                        "offset": offset,
+                        "count": count,
+                        "more_body": False,
+                    }
+                )
+            finally:
+                response.stream.close()
+            return
+
+        if isinstance(body, list):
+            for chunk in body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        elif hasattr(body, "__aiter__"):
+            chunks = body.__aiter__()
+            while True:
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    break
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        else:
+            loop = asyncio.get_event_loop()
+            chunks = iter(body)
+            try:
+                while True:
+                    chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+                    if chunk is None:
+                        break
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            finally:
+                if hasattr(body, "close"):
+                    body.close()
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -28,12 +28,17 @@ cli_output_format = hug.output_format.text
 
 input_format = {
     "application/json": hug.input_format.json,
+    "application/x-ndjson": hug.input_format.ndjson,
     "application/x-www-form-urlencoded": hug.input_format.urlencoded,
     "multipart/form-data": hug.input_format.multipart,
     "text/plain": hug.input_format.text,
     "text/css": hug.input_format.text,
     "text/html": hug.input_format.text,
 }
+if hug.input_format.msgpack_converter:
+    input_format["application/msgpack"] = hug.input_format.msgpack
+if hug.input_format.cbor_converter:
+    input_format["application/cbor"] = hug.input_format.cbor
 
 directives = {
     "timer": hug.directives.Timer,
@@ -83,10 +83,10 @@ def api_version(default=None, api_version=None, **kwargs):
 
 @_built_in_directive
 def documentation(default=None, api_version=None, api=None, **kwargs):
-    """returns documentation for the current api"""
+    """returns documentation for the current api, shared between calls and so not to be modified"""
     api_version = default or api_version
     if api:
-        return api.http.documentation(base_url="", api_version=api_version)
+        return api.http.shared_documentation(base_url="", api_version=api_version)
 
 
 @_built_in_directive
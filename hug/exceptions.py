@@ -38,3 +38,7 @@ class SessionNotFound(StoreKeyNotFound):
     """Should be raised when a session ID has not been found inside a session store"""
 
     pass
+
+
+class ClientDisconnected(Exception):
+    """Should be raised when the client disconnects before its request has been fully received"""
@@ -23,13 +23,44 @@ OTHER DEALINGS IN THE SOFTWARE.
 from __future__ import absolute_import
 
 import re
-from cgi import parse_header
+from functools import lru_cache
 
 from hug import _empty as empty
 
+STREAM_BUFFER_SIZE = 64 * 1024
+NEGOTIATION_CACHE_SIZE = 512
+
 UNDERSCORE = (re.compile("(.)([A-Z][a-z]+)"), re.compile("([a-z0-9])([A-Z])"))
 
 
+def _header_parameters(line):
+    while line[:1] == ";":
+        line = line[1:]
+        end = line.find(";")
+        while end > 0 and (line.count('"', 0, end) - line.count('\\"', 0, end)) % 2:
+            end = line.find(";", end + 1)
+        if end < 0:
+            end = len(line)
+        yield line[:end].strip()
+        line = line[end:]
+
+
+def parse_header(line):
+    """Separates a Content-Type like header into its value and a dictionary of its parameters, unquoting them"""
+    parts = _header_parameters(";" + line)
+    value = next(parts)
+    parameters = {}
+    for part in parts:
+        name, equals, parameter = part.partition("=")
+        if not equals:
+            continue
+        parameter = parameter.strip()
+        if len(parameter) >= 2 and parameter[0] == parameter[-1] == '"':
+            parameter = parameter[1:-1].replace("\\\\", "\\").replace('\\"', '"')
+        parameters[name.strip().lower()] = parameter
+    return value, parameters
+
+
 def parse_content_type(content_type):
     """Separates out the parameters from the content_type and returns both in a tuple (content_type, parameters)"""
     if content_type is not None and ";" in content_type:
@@ -37,6 +68,104 @@ def parse_content_type(content_type):
     return (content_type, empty.dict)
 
 
+@lru_cache(maxsize=NEGOTIATION_CACHE_SIZE)
+def media_ranges(accept):
+    """Parses an Accept header into a tuple of (media_range, quality) pairs, in the order the client listed them"""
+    ranges = []
+    for media_range in accept.split(","):
+        media_range, _, parameters = media_range.partition(";")
+        media_range = media_range.strip().lower()
+        if not media_range:
+            continue
+        elif media_range == "*":
+            media_range = "*/*"
+
+        quality = 1.0
+        for parameter in parameters.split(";"):
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+                break
+        ranges.append((media_range, quality))
+    return tuple(ranges)
+
+
+def specificity(media_range, media_type):
+    """Returns how specifically the media range matches the media type: 2 exactly, 1 by its type (text/*),
+       0 by wildcard (*/*) or -1 if it doesn't match
+    """
+    if media_range == media_type:
+        return 2
+
+    range_type, _, range_subtype = media_range.partition("/")
+    if range_subtype == "*":
+        if range_type == "*":
+            return 0
+        elif media_type.partition("/")[0] == range_type:
+            return 1
+    return -1
+
+
+@lru_cache(maxsize=NEGOTIATION_CACHE_SIZE)
+def negotiate(accept, offered):
+    """Returns which of the offered content types the Accept header prefers, or None if it accepts none of them
+
+    Each offered type takes the quality of the most specific media range that matches it. The highest quality wins,
+    with ties going to the more specific match, then the range the client listed first, then the type offered first.
+    """
+    ranges = media_ranges(accept)
+    chosen = None
+    chosen_rank = None
+    for offered_position, offered_type in enumerate(offered):
+        media_type = parse_content_type(offered_type)[0].lower()
+        rank = None
+        for position, (media_range, quality) in enumerate(ranges):
+            match = specificity(media_range, media_type)
+            if match >= 0 and (rank is None or match > rank[1]):
+                rank = (quality, match, -position, -offered_position)
+
+        if rank is not None and rank[0] > 0 and (chosen_rank is None or rank > chosen_rank):
+            chosen, chosen_rank = offered_type, rank
+    return chosen
+
+
+@lru_cache(maxsize=NEGOTIATION_CACHE_SIZE)
+def match_content_type(content_type, offered):
+    """Returns which of the offered content types, that may be ranges such as text/*, best matches the provided
+       Content-Type header, or None if none of them do
+    """
+    media_type = (parse_content_type(content_type)[0] or "").strip().lower()
+    chosen = None
+    chosen_match = -1
+    for offered_type in offered:
+        match = specificity(offered_type.lower(), media_type)
+        if match > chosen_match:
+            chosen, chosen_match = offered_type, match
+    return chosen
+
+
+def affix_matcher(affixes, suffix=False):
+    """Returns a function that finds the longest of the affixes a piece of text starts with, or ends with if suffix
+       is set, returning None if there are none
+    """
+    if not affixes:
+        return lambda text: None
+
+    affixes = sorted(affixes, key=len, reverse=True)
+    pattern = re.compile("|".join(re.escape(affix[::-1] if suffix else affix) for affix in affixes))
+
+    def match(text):
+        found = pattern.match(text[::-1] if suffix else text)
+        if found is None:
+            return None
+        return found.group()[::-1] if suffix else found.group()
+
+    return match
+
+
 def content_type(content_type):
     """Attaches the supplied content_type to a Hug formatting function"""
 
@@ -47,6 +176,81 @@ def content_type(content_type):
     return decorator
 
 
+def streams(start=b"", separator=b"", end=b""):
+    """Marks a Hug output format as able to render generators incrementally:
+       each item is formatted on its own and written out, divided by separator, between the start and end markers
+    """
+
+    def decorator(method):
+        method.streams = (start, separator, end)
+        return method
+
+    return decorator
+
+
+def iterates(method):
+    """Marks a Hug output format as writing out iterators, including asynchronous ones, incrementally itself:
+       asynchronous iterators are handed to it as they are, rather than being collected into a list first
+    """
+    method.iterates = True
+    return method
+
+
+def stream_chunks(items, render, start=b"", separator=b"", end=b"", buffer_size=STREAM_BUFFER_SIZE):
+    """Renders every item within the provided iterable on its own, yielding the output in bytes chunks"""
+    buffer = bytearray(start)
+    for index, item in enumerate(items):
+        if index:
+            buffer += separator
+        buffer += render(item)
+        if len(buffer) >= buffer_size:
+            yield bytes(buffer)
+            del buffer[:]
+    buffer += end
+    if buffer:
+        yield bytes(buffer)
+
+
+class AsyncStreamChunks(object):
+    """The asynchronous counterpart of stream_chunks, used to stream asynchronous iterators without blocking"""
+
+    __slots__ = ("items", "render", "start", "separator", "end", "buffer_size", "index", "done")
+
+    def __init__(
+        self, items, render, start=b"", separator=b"", end=b"", buffer_size=STREAM_BUFFER_SIZE
+    ):
+        self.items = items
+        self.render = render
+        self.start = start
+        self.separator = separator
+        self.end = end
+        self.buffer_size = buffer_size
+        self.index = 0
+        self.done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.done:
+            raise StopAsyncIteration
+
+        buffer = bytearray(self.start if not self.index else b"")
+        while len(buffer) < self.buffer_size:
+            try:
+                item = await self.items.__anext__()
+            except StopAsyncIteration:
+                buffer += self.end
+                self.done = True
+                break
+
+            if self.index:
+                buffer += self.separator
+            buffer += self.render(item)
+            self.index += 1
+        return bytes(buffer)
+
+
 def underscore(text):
     """Converts text that may be camelcased into an underscored format"""
     return UNDERSCORE[1].sub(r"\1_\2", UNDERSCORE[0].sub(r"\1_\2", text)).lower()
@@ -22,14 +22,29 @@ OTHER DEALINGS IN THE SOFTWARE.
 from __future__ import absolute_import
 
 import re
-from cgi import parse_multipart
+from tempfile import SpooledTemporaryFile
 from urllib.parse import parse_qs as urlencoded_converter
 
+import falcon
 from falcon.util.uri import parse_query_string
 
-from hug.format import content_type, underscore
+from hug.format import content_type, parse_content_type, underscore
 from hug.json_module import json as json_converter
 
+try:
+    import msgpack as msgpack_converter
+except ImportError:  # pragma: no cover
+    msgpack_converter = False
+
+try:
+    import cbor2 as cbor_converter
+except ImportError:  # pragma: no cover
+    cbor_converter = False
+
+MULTIPART_CHUNK_SIZE = 64 * 1024
+MULTIPART_MAX_HEADER_SIZE = 16 * 1024
+MULTIPART_MEMORY_THRESHOLD = 1024 * 1024
+
 
 @content_type("text/plain")
 def text(body, charset="utf-8", **kwargs):
@@ -43,6 +58,33 @@ def json(body, charset="utf-8", **kwargs):
     return json_converter.loads(text(body, charset=charset))
 
 
+@content_type("application/x-ndjson")
+def ndjson(body, charset="utf-8", **kwargs):
+    """Takes newline delimited JSON (JSON Lines) data, lazily converting one line at a time into native Python
+       objects
+    """
+    for line in body:
+        line = line.strip()
+        if line:
+            yield json_converter.loads(line.decode(charset))
+
+
+if msgpack_converter:
+
+    @content_type("application/msgpack")
+    def msgpack(body, **kwargs):
+        """Takes MessagePack formatted data, converting it into native Python objects"""
+        return msgpack_converter.unpackb(body.read(), raw=False)
+
+
+if cbor_converter:
+
+    @content_type("application/cbor")
+    def cbor(body, **kwargs):
+        """Takes CBOR (Concise Binary Object Representation) formatted data, converting it into native Python objects"""
+        return cbor_converter.loads(body.read())
+
+
 def _underscore_dict(dictionary):
     new_dictionary = {}
     for key, value in dictionary.items():
@@ -68,16 +110,196 @@ def urlencoded(body, charset="ascii", **kwargs):
     return parse_query_string(text(body, charset=charset), False)
 
 
+class MultipartFile(SpooledTemporaryFile):
+    """A file uploaded as a part of a multipart form, kept in memory until it grows beyond max_size bytes"""
+
+    def __init__(self, max_size=0, filename=None, content_type=None, headers=None):
+        super().__init__(max_size=max_size)
+        self.filename = filename
+        self.content_type = content_type
+        self.headers = headers if headers is not None else {}
+
+
+class MultipartParser(object):
+    """Incrementally parses a multipart body, reading it from the provided stream one chunk at a time"""
+
+    __slots__ = ("body", "delimiter", "buffer", "chunk_size", "max_body_size", "read", "eof")
+
+    def __init__(self, body, boundary, chunk_size=MULTIPART_CHUNK_SIZE, max_body_size=None):
+        self.body = body
+        self.delimiter = b"\r\n--" + boundary
+        self.buffer = bytearray(b"\r\n")
+        self.chunk_size = chunk_size
+        self.max_body_size = max_body_size
+        self.read = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.body.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return
+
+        self.read += len(chunk)
+        if self.max_body_size is not None and self.read > self.max_body_size:
+            raise falcon.HTTPPayloadTooLarge(
+                "Request body too large",
+                "Multipart bodies can be at most {0} bytes".format(self.max_body_size),
+            )
+        self.buffer += chunk
+
+    def _read_until(self, marker, limit=MULTIPART_MAX_HEADER_SIZE):
+        while True:
+            index = self.buffer.find(marker)
+            if index >= 0:
+                data = bytes(self.buffer[:index])
+                del self.buffer[: index + len(marker)]
+                return data
+            if self.eof or len(self.buffer) > limit:
+                raise falcon.HTTPBadRequest("Invalid multipart body", "Malformed part headers")
+            self._fill()
+
+    def _skip_preamble(self):
+        delimiter = self.delimiter
+        while True:
+            index = self.buffer.find(delimiter)
+            if index >= 0:
+                del self.buffer[: index + len(delimiter)]
+                return True
+            if self.eof:
+                return False
+            del self.buffer[: max(0, len(self.buffer) - len(delimiter) + 1)]
+            self._fill()
+
+    def data(self):
+        """Yields the data of the current part in chunks, up until the next boundary"""
+        delimiter = self.delimiter
+        keep = len(delimiter) - 1
+        while True:
+            index = self.buffer.find(delimiter)
+            if index >= 0:
+                yield bytes(self.buffer[:index])
+                del self.buffer[: index + len(delimiter)]
+                return
+            if self.eof:
+                raise falcon.HTTPBadRequest(
+                    "Invalid multipart body", "The body ended before its closing boundary"
+                )
+            if len(self.buffer) > keep:
+                yield bytes(self.buffer[:-keep])
+                del self.buffer[:-keep]
+            self._fill()
+
+    def __iter__(self):
+        """Yields the headers of every part, the data of which must be consumed through data() before continuing"""
+        if not self._skip_preamble():
+            return
+
+        while True:
+            while len(self.buffer) < 2 and not self.eof:
+                self._fill()
+            if self.buffer[:2] == b"--":
+                return
+
+            self._read_until(b"\r\n")
+            headers = {}
+            while True:
+                line = self._read_until(b"\r\n")
+                if not line:
+                    break
+                name, _separator, value = line.decode("latin1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            yield headers
+
+
 @content_type("multipart/form-data")
-def multipart(body, content_length=0, **header_params):
-    """Converts multipart form data into native Python objects"""
-    header_params.setdefault("CONTENT-LENGTH", content_length)
-    if header_params and "boundary" in header_params:
-        if type(header_params["boundary"]) is str:
-            header_params["boundary"] = header_params["boundary"].encode()
-
-    form = parse_multipart((body.stream if hasattr(body, "stream") else body), header_params)
-    for key, value in form.items():
-        if type(value) is list and len(value) == 1:
-            form[key] = value[0]
+def multipart(body, content_length=0, charset="utf-8", **header_params):
+    """Converts multipart form data into native Python objects, streaming each part through as it's read
+
+    File parts are passed along as file-like MultipartFile objects, which spill over to disk beyond
+    MULTIPART_MEMORY_THRESHOLD bytes. Use limited_multipart to limit the size of bodies and their parts.
+    """
+    return parse_multipart(body, header_params.get("boundary"), content_length, charset)
+
+
+def limited_multipart(
+    memory_threshold=MULTIPART_MEMORY_THRESHOLD, max_part_size=None, max_body_size=None
+):
+    """Returns a multipart input format with its own limits, for use within the inputs of individual endpoints
+
+    The limits are fixed here: parameters of the request's content type never override them.
+    """
+
+    @content_type("multipart/form-data")
+    def multipart_input(body, content_length=0, charset="utf-8", **header_params):
+        return parse_multipart(
+            body,
+            header_params.get("boundary"),
+            content_length,
+            charset,
+            memory_threshold=memory_threshold,
+            max_part_size=max_part_size,
+            max_body_size=max_body_size,
+        )
+
+    return multipart_input
+
+
+def parse_multipart(
+    body,
+    boundary,
+    content_length=0,
+    charset="utf-8",
+    memory_threshold=MULTIPART_MEMORY_THRESHOLD,
+    max_part_size=None,
+    max_body_size=None,
+):
+    """Parses the multipart body delimited by boundary, with the given limits
+
+    Parts spill over to disk beyond memory_threshold bytes. Bodies larger than max_body_size, or with a part larger
+    than max_part_size, are rejected before being read.
+    """
+    if not boundary:
+        raise falcon.HTTPBadRequest("Invalid multipart body", "No multipart boundary was provided")
+    if type(boundary) is str:
+        boundary = boundary.encode()
+    if max_body_size is not None and int(content_length or 0) > max_body_size:
+        raise falcon.HTTPPayloadTooLarge(
+            "Request body too large",
+            "Multipart bodies can be at most {0} bytes".format(max_body_size),
+        )
+
+    form = {}
+    parser = MultipartParser(body, boundary, max_body_size=max_body_size)
+    for headers in parser:
+        disposition, disposition_params = parse_content_type(headers.get("content-disposition", ""))
+        part_type, part_params = parse_content_type(headers.get("content-type"))
+        part = MultipartFile(
+            memory_threshold, disposition_params.get("filename"), part_type, headers
+        )
+        size = 0
+        for chunk in parser.data():
+            size += len(chunk)
+            if max_part_size is not None and size > max_part_size:
+                part.close()
+                raise falcon.HTTPPayloadTooLarge(
+                    "Request body too large",
+                    "Multipart parts can be at most {0} bytes".format(max_part_size),
+                )
+            part.write(chunk)
+        part.seek(0)
+
+        if part.filename is None:
+            value = part.read().decode(part_params.get("charset", charset))
+            part.close()
+        else:
+            value = part
+
+        name = disposition_params.get("name")
+        if name in form:
+            if type(form[name]) is not list:
+                form[name] = [form[name]]
+            form[name].append(value)
+        else:
+            form[name] = value
     return form
@@ -23,21 +23,28 @@ from __future__ import absolute_import
 
 import argparse
 import asyncio
+import inspect
+import mmap
 import os
+import stat
 import sys
 from collections import OrderedDict
-from functools import lru_cache, partial, wraps
+from functools import partial, wraps
+from io import BytesIO
+from uuid import uuid4
 
 import falcon
 from falcon import HTTP_BAD_REQUEST
 
+import hug._async
 import hug._empty as empty
 import hug.api
+import hug.memoize
 import hug.output_format
 import hug.types as types
 from hug import introspect
 from hug.exceptions import InvalidTypeData
-from hug.format import parse_content_type
+from hug.format import STREAM_BUFFER_SIZE, AsyncStreamChunks, parse_content_type, stream_chunks
 from hug.types import (
     MarshmallowInputSchema,
     MarshmallowReturnSchema,
@@ -49,6 +56,7 @@ from hug.types import (
 )
 
 DOC_TYPE_MAP = {str: "String", bool: "Boolean", list: "Multiple", int: "Integer", float: "Float"}
+MAX_RANGES = 32
 
 
 def _doc(kind):
@@ -65,6 +73,168 @@ def asyncio_call(function, *args, **kwargs):
     return function.result()
 
 
+def iterate_async(async_iterator, background_loop=False):
+    """Iterates over an asynchronous iterator from synchronous code, running each step within an event loop"""
+    while True:
+        try:
+            if background_loop:
+                item = hug._async.call(async_iterator.__anext__)
+            else:
+                item = asyncio_call(async_iterator.__anext__)
+        except StopAsyncIteration:
+            return
+        yield item
+
+
+async def awaited(awaitable):
+    return await awaitable
+
+
+def detached_request(request):
+    """Returns a copy of the request, without its body, that stays usable once the original request is finished"""
+    environ = dict(request.env)
+    environ["wsgi.input"] = BytesIO()
+    environ["CONTENT_LENGTH"] = "0"
+    detached = type(request)(environ, options=request.options)
+    detached.context.update(request.context)
+    return detached
+
+
+def content_size(content):
+    """Returns the total size of the given file-like object in bytes, if it can be determined without reading it"""
+    try:
+        status = os.fstat(content.fileno())
+        if stat.S_ISREG(status.st_mode):
+            return status.st_size
+    except (AttributeError, OSError, ValueError):
+        pass
+
+    if isinstance(content, mmap.mmap):
+        return len(content)
+    if hasattr(content, "getbuffer"):
+        with content.getbuffer() as buffer:
+            return buffer.nbytes
+    if hasattr(content, "name") and isinstance(content.name, str) and os.path.isfile(content.name):
+        return os.path.getsize(content.name)
+    return None
+
+
+def requested_ranges(request, response, size):
+    """Returns the satisfiable (start, end) byte ranges a request asks for out of size bytes of content
+
+    None is returned when the complete content should be sent instead, as is the case when no valid Range header is
+    present or when its If-Range validator no longer matches, and an empty tuple when none of the ranges can be met.
+    """
+    header = request.get_header("Range")
+    if not header or not size:
+        return None
+
+    unit, separator, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not separator:
+        return None
+
+    if_range = request.get_header("If-Range")
+    if if_range and not if_range_matches(if_range.strip(), response):
+        return None
+
+    ranges = []
+    specified = 0
+    for spec in specs.split(","):
+        first, dash, last = spec.strip().partition("-")
+        if not (first or last):
+            continue
+        if not dash:
+            return None
+
+        specified += 1
+        try:
+            if not first:
+                suffix = int(last)
+                if suffix > 0:
+                    ranges.append((max(size - suffix, 0), size - 1))
+                continue
+
+            start = int(first)
+            end = int(last) if last else None
+        except ValueError:
+            return None
+        if start < 0 or (end is not None and start > end):
+            return None
+        if start < size:
+            ranges.append((start, size - 1 if end is None else min(end, size - 1)))
+
+    if not specified or len(ranges) > MAX_RANGES:
+        return None
+    return tuple(ranges)
+
+
+def if_range_matches(if_range, response):
+    """Returns True if the If-Range validator still matches the current version of the content being sent"""
+    if if_range.startswith(("W/", '"')):
+        etag = response.get_header("ETag")
+        return etag is not None and not etag.startswith("W/") and if_range == etag
+
+    last_modified = response.get_header("Last-Modified")
+    return last_modified is not None and if_range == last_modified
+
+
+def byteranges(content, ranges, size, content_type, boundary, chunk_size=STREAM_BUFFER_SIZE):
+    """Returns the length and a generator of the multipart/byteranges body containing each range of content"""
+    headers = [
+        "{0}--{1}\r\nContent-Type: {2}\r\nContent-Range: bytes {3}-{4}/{5}\r\n\r\n".format(
+            "\r\n" if index else "", boundary, content_type, start, end, size
+        ).encode("latin1")
+        for index, (start, end) in enumerate(ranges)
+    ]
+    closing = "\r\n--{0}--\r\n".format(boundary).encode("latin1")
+    length = sum(len(header) for header in headers) + len(closing)
+    length += sum(end - start + 1 for start, end in ranges)
+
+    def parts():
+        try:
+            for header, (start, end) in zip(headers, ranges):
+                yield header
+                content.seek(start)
+                remaining = end - start + 1
+                while remaining:
+                    data = content.read(min(chunk_size, remaining))
+                    if not data:
+                        break
+                    remaining -= len(data)
+                    yield data
+            yield closing
+        finally:
+            content.close()
+
+    return length, parts()
+
+
+class StreamSlice(object):
+    """A read only view over length bytes of a file-like object, starting at offset, that is never fully loaded
+
+    The underlying file is exposed so servers supporting it can send the slice straight from the file descriptor.
+    """
+
+    __slots__ = ("stream", "offset", "length", "remaining")
+
+    def __init__(self, stream, offset, length):
+        stream.seek(offset)
+        self.stream = stream
+        self.offset = offset
+        self.length = length
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.stream.read(size) if size else b""
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.stream.close()
+
+
 class Interfaces(object):
     """Defines the per-function singleton applied to hugged functions defining common data needed by all interfaces"""
 
@@ -125,8 +295,14 @@ class Interfaces(object):
 
     def __call__(__hug_internal_self, *args, **kwargs):  # noqa: N805
         """"Calls the wrapped function, uses __hug_internal_self incase self is passed in as a kwarg from the wrapper"""
+        return __hug_internal_self.dispatch(__hug_internal_self.api, *args, **kwargs)
+
+    def dispatch(__hug_internal_self, __hug_internal_api, *args, **kwargs):  # noqa: N805
+        """Calls the wrapped function, running coroutines on the event loop the given API is configured for"""
         if not __hug_internal_self.is_coroutine:
             return __hug_internal_self._function(*args, **kwargs)
+        elif __hug_internal_api.background_loop:
+            return hug._async.call(__hug_internal_self._function, *args, **kwargs)
 
         return asyncio_call(__hug_internal_self._function, *args, **kwargs)
 
@@ -428,7 +604,7 @@ class Local(Interface):
 
         self._rewrite_params(kwargs)
         try:
-            result = self.interface(**kwargs)
+            result = self.interface.dispatch(self.api, **kwargs)
             if self.transform:
                 if hasattr(self.transform, "context"):
                     self.transform.context = context
@@ -547,6 +723,7 @@ class CLI(Interface):
             self.parser.add_argument(*args, **kwargs)
 
         self.api.cli.commands[route.get("name", self.interface.spec.__name__)] = self
+        self.api.cli.changed()
 
     def output(self, data, context):
         """Outputs the provided data using the transformations and output format specified for this CLI endpoint"""
@@ -670,6 +847,10 @@ class HTTP(Interface):
         "private",
         "on_invalid",
         "inputs",
+        "memoize",
+        "coalesce",
+        "vary",
+        "stream",
     )
     AUTO_INCLUDE = {"request", "response"}
 
@@ -681,6 +862,14 @@ class HTTP(Interface):
         self.response_headers = tuple(route.get("response_headers", {}).items())
         self.private = "private" in route
         self.inputs = route.get("inputs", {})
+        self.vary = route.get("vary", None)
+        self.stream = route.get("stream", False)
+        if "memoize" in route:
+            self.require_vary("memoize")
+            self.memoize = hug.memoize.cache(route["memoize"])
+        if route.get("coalesce", False):
+            self.require_vary("coalesce")
+            self.coalesce = hug.memoize.SingleFlight()
 
         if "on_invalid" in route:
             self._params_for_on_invalid = introspect.takes_arguments(
@@ -717,18 +906,23 @@ class HTTP(Interface):
             )
         return self._params_for_transform_state
 
+    def parse_request_body(self, request):
+        """Returns the request body, parsed by the input format registered for its content type if there is one"""
+        body = request.bounded_stream
+        content_type, content_params = parse_content_type(request.content_type)
+        body_formatter = body and self.inputs.get(
+            content_type, self.api.http.input_format(content_type)
+        )
+        if body_formatter:
+            body = body_formatter(body, content_length=request.content_length, **content_params)
+        return body
+
     def gather_parameters(self, request, response, context, api_version=None, **input_parameters):
         """Gathers and returns all parameters that will be used for this endpoint"""
         input_parameters.update(request.params)
 
         if self.parse_body and request.content_length:
-            body = request.bounded_stream
-            content_type, content_params = parse_content_type(request.content_type)
-            body_formatter = body and self.inputs.get(
-                content_type, self.api.http.input_format(content_type)
-            )
-            if body_formatter:
-                body = body_formatter(body, content_length=request.content_length, **content_params)
+            body = self.parse_request_body(request)
             if "body" in self.all_parameters:
                 input_parameters["body"] = body
             if isinstance(body, dict):
@@ -834,8 +1028,165 @@ class HTTP(Interface):
                 key: value for key, value in parameters.items() if key in self.all_parameters
             }
         self._rewrite_params(parameters)
+        return self.interface.dispatch(self.api, **parameters)
 
-        return self.interface(**parameters)
+    async def call_function_async(self, parameters):
+        if not self.interface.takes_kwargs:
+            parameters = {
+                key: value for key, value in parameters.items() if key in self.all_parameters
+            }
+        self._rewrite_params(parameters)
+
+        result = self.interface._function(**parameters)
+        if inspect.isawaitable(result):
+            result = await result
+        if hasattr(result, "__anext__") and not self.streaming():
+            items = []
+            while True:
+                try:
+                    items.append(await result.__anext__())
+                except StopAsyncIteration:
+                    return items
+        return result
+
+    def streaming(self):
+        """Returns True if generators returned by this route are written out incrementally, not collected up front
+
+        Output formats that write out iterators themselves (such as json_stream) always do, those marked with @streams
+        only for routes that opt in with stream.
+        """
+        return getattr(self.outputs, "iterates", False) or bool(
+            self.stream and getattr(self.outputs, "streams", None)
+        )
+
+    def require_vary(self, option):
+        """Ensures endpoints sharing results between requests can't share them between different callers
+
+        Directives, and the request and response, are left out of request keys, so endpoints taking them must give a
+        vary function identifying what about the request their result depends on.
+        """
+        if self.vary is None and (
+            self.directives or self.AUTO_INCLUDE.intersection(self.all_parameters)
+        ):
+            raise ValueError(
+                "{0} can not {1} as it takes the request, response or directives, which aren't part of the key "
+                "requests are identified by: give a vary function returning what about the request its result "
+                "depends on".format(self.interface.name, option)
+            )
+
+    def request_key(self, parameters, request, api_version=None, negotiated=True):
+        """Returns a key identifying the call the request makes, or None if its parameters can't be made hashable
+
+        The key is made up of the validated parameters, excluding directives, request and response, along with the API
+        version, the path, the value the route's vary function returns for the request, and, when negotiated is set
+        and the output format negotiates with the request, its accept and content type headers.
+        """
+        try:
+            key = (
+                api_version,
+                request.path,
+                tuple(
+                    sorted(
+                        (name, hug.memoize.freeze(value))
+                        for name, value in self.key_parameters(parameters).items()
+                    )
+                ),
+            )
+            if self.vary is not None:
+                key += (hug.memoize.freeze(self.vary(request)),)
+        except TypeError:
+            return None
+        if negotiated and "request" in self._params_for_outputs:
+            key += (request.accept, request.content_type)
+        return key
+
+    def memoize_key(self, parameters, request, api_version=None):
+        """Returns the key the rendered response to this request is memoized under, or None if it isn't memoized"""
+        if getattr(self, "memoize", None) is None:
+            return None
+        return self.request_key(parameters, request, api_version)
+
+    def call_coalesced(self, parameters, request, api_version=None):
+        """Calls the wrapped function, sharing the result of an identical call in flight if coalescing is enabled"""
+        coalesce = getattr(self, "coalesce", None)
+        key = coalesce and self.request_key(parameters, request, api_version, negotiated=False)
+        if key is None:
+            return self.call_function(parameters)
+        return coalesce.call(key, self.call_function, parameters)
+
+    async def call_coalesced_async(self, parameters, request, api_version=None):
+        """Awaits the wrapped function, sharing the result of an identical call in flight if coalescing is enabled"""
+        coalesce = getattr(self, "coalesce", None)
+        key = coalesce and self.request_key(parameters, request, api_version, negotiated=False)
+        if key is None:
+            return await self.call_function_async(parameters)
+        return await coalesce.call_async(key, self.call_function_async, parameters)
+
+    def key_parameters(self, parameters):
+        """Returns the validated parameters that identify a call: all of them apart from directives, request and
+           response
+        """
+        return {
+            name: value
+            for name, value in parameters.items()
+            if name not in self.directives and name not in self.AUTO_INCLUDE
+        }
+
+    def respond_memoized(self, key, parameters, request, response, api_version=None):
+        """Answers the request from the memoized responses if possible, returning True if it was"""
+        cached, refresh = self.memoize.get(key)
+        if cached is None:
+            return False
+
+        if refresh:
+            self.memoize.refresh(
+                key,
+                partial(
+                    self.render_memoized,
+                    key,
+                    self.key_parameters(parameters),
+                    detached_request(request),
+                    api_version,
+                ),
+            )
+        cached.respond(response)
+        return True
+
+    def render_memoized(self, key, inputs, request, api_version=None):
+        """Renders and memoizes a fresh response for the key, outside of any request being served
+
+        The call is made with the validated inputs of the request that found the response stale, along with a
+        response, and directives, of its own.
+        """
+        response = falcon.Response()
+        context = self.api.context_factory(
+            response=response,
+            request=request,
+            api=self.api,
+            api_version=api_version,
+            interface=self,
+        )
+        parameters = {}
+        try:
+            parameters = self.gather_parameters(request, response, context, api_version)
+            parameters.update(inputs)
+            for parameter in self.directives:
+                if inspect.isawaitable(parameters[parameter]):
+                    parameters[parameter] = hug._async.call(awaited, parameters[parameter])
+
+            self.set_response_defaults(response, request)
+            if self.interface.is_coroutine:
+                result = hug._async.call(self.call_function_async, parameters)
+            else:
+                result = self.call_function(parameters)
+            self.render_content(result, context, request, response)
+            self.memoize.set(key, response)
+        except Exception as exception:
+            self.cleanup_parameters(parameters, exception=exception)
+            self.api.delete_context(context, exception=exception)
+            raise
+        self.cleanup_parameters(parameters)
+        self.api.delete_context(context)
 
     def render_content(self, content, context, request, response, **kwargs):
         if hasattr(content, "interface") and (
@@ -848,29 +1199,51 @@ class HTTP(Interface):
             return
 
         content = self.transform_data(content, request, response, context)
+        if hasattr(content, "__anext__") and "asgi.scope" not in getattr(
+            request, "env", empty.dict
+        ):
+            content = iterate_async(content, self.api.background_loop)
+        streams = self.stream and getattr(self.outputs, "streams", None)
+        if streams and (inspect.isgenerator(content) or hasattr(content, "__anext__")):
+            render = partial(
+                self.outputs, **self._arguments(self._params_for_outputs, request, response)
+            )
+            stream = AsyncStreamChunks if hasattr(content, "__anext__") else stream_chunks
+            response.stream = stream(content, render, *streams)
+            return
+
         content = self.outputs(
             content, **self._arguments(self._params_for_outputs, request, response)
         )
-        if hasattr(content, "read"):
-            size = None
-            if hasattr(content, "name") and os.path.isfile(content.name):
-                size = os.path.getsize(content.name)
-            if request.range and size:
-                start, end = request.range
-                if end < 0:
-                    end = size + end
-                end = min(end, size)
-                length = end - start + 1
-                content.seek(start)
-                response.data = content.read(length)
-                response.status = falcon.HTTP_206
-                response.content_range = (start, end, size)
-                content.close()
-            else:
+        if inspect.isgenerator(content) or hasattr(content, "__anext__"):
+            response.stream = content
+        elif hasattr(content, "read"):
+            size = content_size(content)
+            ranges = requested_ranges(request, response, size)
+            if size:
+                response.accept_ranges = "bytes"
+            if ranges is None:
                 if size:
                     response.set_stream(content, size)
                 else:
                     response.stream = content  # pragma: no cover
+            elif not ranges:
+                content.close()
+                response.status = falcon.HTTP_416
+                response.set_header("Content-Range", "bytes */{0}".format(size))
+                response.data = b""
+            elif len(ranges) == 1:
+                start, end = ranges[0]
+                length = end - start + 1
+                response.set_stream(StreamSlice(content, start, length), length)
+                response.status = falcon.HTTP_206
+                response.content_range = (start, end, size)
+            else:
+                boundary = uuid4().hex
+                length, parts = byteranges(content, ranges, size, response.content_type, boundary)
+                response.content_type = "multipart/byteranges; boundary={0}".format(boundary)
+                response.set_stream(parts, length)
+                response.status = falcon.HTTP_206
         else:
             response.data = content
 
@@ -887,12 +1260,11 @@ class HTTP(Interface):
             api_version = int(api_version)
         else:
             api_version = None
-        if not self.catch_exceptions:
-            exception_types = ()
-        else:
-            exception_types = self.api.http.exception_handlers(api_version)
-            exception_types = tuple(exception_types.keys()) if exception_types else ()
+        exception_types = self.exception_types(api_version)
         input_parameters = {}
+        preset = (
+            dict(response._headers) if getattr(self, "memoize", None) is not None else empty.dict
+        )
         try:
             self.set_response_defaults(response, request)
             lacks_requirement = self.check_requirements(request, response, context)
@@ -912,9 +1284,19 @@ class HTTP(Interface):
                 self.api.delete_context(context, errors=errors)
                 return self.render_errors(errors, request, response)
 
-            self.render_content(
-                self.call_function(input_parameters), context, request, response, **kwargs
-            )
+            memoize_key = self.memoize_key(input_parameters, request, api_version)
+            if memoize_key is None or not self.respond_memoized(
+                memoize_key, input_parameters, request, response, api_version
+            ):
+                self.render_content(
+                    self.call_coalesced(input_parameters, request, api_version),
+                    context,
+                    request,
+                    response,
+                    **kwargs
+                )
+                if memoize_key is not None:
+                    self.memoize.set(memoize_key, response, preset)
         except falcon.HTTPNotFound as exception:
             self.cleanup_parameters(input_parameters, exception=exception)
             self.api.delete_context(context, exception=exception)
@@ -922,23 +1304,82 @@ class HTTP(Interface):
         except exception_types as exception:
             self.cleanup_parameters(input_parameters, exception=exception)
             self.api.delete_context(context, exception=exception)
-            handler = None
-            exception_type = type(exception)
-            if exception_type in exception_types:
-                handler = self.api.http.exception_handlers(api_version)[exception_type][0]
-            else:
-                for match_exception_type, exception_handlers in tuple(
-                    self.api.http.exception_handlers(api_version).items()
-                )[::-1]:
-                    if isinstance(exception, match_exception_type):
-                        for potential_handler in exception_handlers:
-                            if not isinstance(exception, potential_handler.exclude):
-                                handler = potential_handler
-
-            if not handler:
-                raise exception
+            self.handle_exception(
+                exception, exception_types, request, response, api_version, **kwargs
+            )
+        except Exception as exception:
+            self.cleanup_parameters(input_parameters, exception=exception)
+            self.api.delete_context(context, exception=exception)
+            raise exception
+        self.cleanup_parameters(input_parameters)
+        self.api.delete_context(context)
 
-            handler(request=request, response=response, exception=exception, **kwargs)
+    async def call_async(self, request, response, api_version=None, **kwargs):
+        """Call the wrapped function over HTTP from within a running event loop,
+           awaiting coroutine endpoints and asynchronous directives directly
+        """
+        context = self.api.context_factory(
+            response=response,
+            request=request,
+            api=self.api,
+            api_version=api_version,
+            interface=self,
+        )
+        if isinstance(api_version, str) and api_version.isdigit():
+            api_version = int(api_version)
+        else:
+            api_version = None
+        exception_types = self.exception_types(api_version)
+        input_parameters = {}
+        preset = (
+            dict(response._headers) if getattr(self, "memoize", None) is not None else empty.dict
+        )
+        try:
+            self.set_response_defaults(response, request)
+            lacks_requirement = self.check_requirements(request, response, context)
+            if lacks_requirement:
+                response.data = self.outputs(
+                    lacks_requirement,
+                    **self._arguments(self._params_for_outputs, request, response)
+                )
+                self.api.delete_context(context, lacks_requirement=lacks_requirement)
+                return
+
+            input_parameters = self.gather_parameters(
+                request, response, context, api_version, **kwargs
+            )
+            for parameter in self.directives:
+                if inspect.isawaitable(input_parameters.get(parameter, None)):
+                    input_parameters[parameter] = await input_parameters[parameter]
+
+            errors = self.validate(input_parameters, context)
+            if errors:
+                self.api.delete_context(context, errors=errors)
+                return self.render_errors(errors, request, response)
+
+            memoize_key = self.memoize_key(input_parameters, request, api_version)
+            if memoize_key is None or not self.respond_memoized(
+                memoize_key, input_parameters, request, response, api_version
+            ):
+                self.render_content(
+                    await self.call_coalesced_async(input_parameters, request, api_version),
+                    context,
+                    request,
+                    response,
+                    **kwargs
+                )
+                if memoize_key is not None:
+                    self.memoize.set(memoize_key, response, preset)
+        except falcon.HTTPNotFound as exception:
+            self.cleanup_parameters(input_parameters, exception=exception)
+            self.api.delete_context(context, exception=exception)
+            return self.api.http.not_found(request, response, **kwargs)
+        except exception_types as exception:
+            self.cleanup_parameters(input_parameters, exception=exception)
+            self.api.delete_context(context, exception=exception)
+            self.handle_exception(
+                exception, exception_types, request, response, api_version, **kwargs
+            )
         except Exception as exception:
             self.cleanup_parameters(input_parameters, exception=exception)
             self.api.delete_context(context, exception=exception)
@@ -946,6 +1387,213 @@ class HTTP(Interface):
         self.cleanup_parameters(input_parameters)
         self.api.delete_context(context)
 
+    def exception_types(self, api_version=None):
+        """Returns the exception types that have a registered handler for the given version of this endpoint"""
+        if not self.catch_exceptions:
+            return ()
+
+        exception_types = self.api.http.exception_handlers(api_version)
+        return tuple(exception_types.keys()) if exception_types else ()
+
+    def handle_exception(
+        self, exception, exception_types, request, response, api_version=None, **kwargs
+    ):
+        """Routes a raised exception to the most specific exception handler registered for it"""
+        handler = None
+        exception_type = type(exception)
+        if exception_type in exception_types:
+            handler = self.api.http.exception_handlers(api_version)[exception_type][0]
+        else:
+            for match_exception_type, exception_handlers in tuple(
+                self.api.http.exception_handlers(api_version).items()
+            )[::-1]:
+                if isinstance(exception, match_exception_type):
+                    for potential_handler in exception_handlers:
+                        if not isinstance(exception, potential_handler.exclude):
+                            handler = potential_handler
+
+        if not handler:
+            raise exception
+
+        handler(request=request, response=response, exception=exception, **kwargs)
+
+    def _compile_gather_parameters(self):
+        parse_body = self.parse_body
+        takes_body = "body" in self.all_parameters
+        takes_request = "request" in self.all_parameters
+        takes_response = "response" in self.all_parameters
+        takes_api_version = "api_version" in self.all_parameters
+        directives = tuple(
+            (
+                parameter,
+                directive,
+                (self.defaults[parameter],) if parameter in self.defaults else (),
+            )
+            for parameter, directive in self.directives.items()
+        )
+        api = self.api
+
+        def gather_parameters(request, response, context, api_version, url_parameters):
+            input_parameters = dict(url_parameters)
+            input_parameters.update(request.params)
+            if parse_body and request.content_length:
+                body = self.parse_request_body(request)
+                if takes_body:
+                    input_parameters["body"] = body
+                if isinstance(body, dict):
+                    input_parameters.update(body)
+            elif takes_body:
+                input_parameters["body"] = None
+
+            if takes_request:
+                input_parameters["request"] = request
+            if takes_response:
+                input_parameters["response"] = response
+            if takes_api_version:
+                input_parameters["api_version"] = api_version
+            for parameter, directive, arguments in directives:
+                input_parameters[parameter] = directive(
+                    *arguments,
+                    response=response,
+                    request=request,
+                    api=api,
+                    api_version=api_version,
+                    context=context,
+                    interface=self
+                )
+            return input_parameters
+
+        return gather_parameters
+
+    def _compile_call_function(self):
+        function = self.interface._function
+        if self.interface.is_coroutine:
+            function = partial(self.interface.dispatch, self.api)
+        map_params = tuple(self.map_params.items())
+        all_parameters = self.all_parameters
+        takes_kwargs = self.interface.takes_kwargs
+
+        if takes_kwargs and not map_params:
+            return lambda parameters: function(**parameters)
+
+        def call_function(parameters):
+            if not takes_kwargs:
+                parameters = {
+                    key: value for key, value in parameters.items() if key in all_parameters
+                }
+            for interface_name, internal_name in map_params:
+                if interface_name in parameters:
+                    parameters[internal_name] = parameters.pop(interface_name)
+            return function(**parameters)
+
+        return call_function
+
+    def compile(self):
+        """Returns a call plan specialised to this endpoint, used in place of the interface when serving a compiled API
+
+        Everything that can't change once the API is being served (exception handlers per version, response defaults,
+        which parameters, directives and validation steps the endpoint uses) is resolved here, once, so that each
+        request only runs the steps this endpoint actually needs. Memoized and coalesced endpoints are served by the
+        interface itself.
+        """
+        if (
+            getattr(self, "memoize", None) is not None
+            or getattr(self, "coalesce", None) is not None
+        ):
+            return self
+
+        api = self.api
+        context_factory = api.context_factory
+        delete_context = api.delete_context
+        cleanup_parameters = self.cleanup_parameters
+        render_content = self.render_content
+        exception_types_by_version = {
+            version: self.exception_types(version) for version in api.http.versions | {None}
+        }
+
+        response_headers = self.response_headers
+        set_status = self.set_status
+        outputs = self.outputs
+        output_arguments = self._params_for_outputs
+        content_type = None if callable(outputs.content_type) else outputs.content_type
+
+        check_requirements = self.check_requirements if self.requires else None
+        gather_parameters = self._compile_gather_parameters()
+        validate = (
+            self.validate
+            if self.input_transformations
+            or self.required
+            or getattr(self, "validate_function", False)
+            else None
+        )
+        call_function = self._compile_call_function()
+
+        def call(request, response, api_version=None, **kwargs):
+            context = context_factory(
+                response=response, request=request, api=api, api_version=api_version, interface=self
+            )
+            if isinstance(api_version, str) and api_version.isdigit():
+                api_version = int(api_version)
+            else:
+                api_version = None
+            exception_types = exception_types_by_version.get(api_version, None)
+            if exception_types is None:
+                exception_types = self.exception_types(api_version)
+
+            input_parameters = {}
+            try:
+                for header_name, header_value in response_headers:
+                    response.set_header(header_name, header_value)
+                if set_status:
+                    response.status = set_status
+                response.content_type = (
+                    content_type
+                    if content_type is not None
+                    else self.content_type(request, response)
+                )
+
+                if check_requirements:
+                    lacks_requirement = check_requirements(request, response, context)
+                    if lacks_requirement:
+                        response.data = outputs(
+                            lacks_requirement,
+                            **self._arguments(output_arguments, request, response)
+                        )
+                        delete_context(context, lacks_requirement=lacks_requirement)
+                        return
+
+                input_parameters = gather_parameters(
+                    request, response, context, api_version, kwargs
+                )
+                if validate:
+                    errors = validate(input_parameters, context)
+                    if errors:
+                        delete_context(context, errors=errors)
+                        return self.render_errors(errors, request, response)
+
+                render_content(
+                    call_function(input_parameters), context, request, response, **kwargs
+                )
+            except falcon.HTTPNotFound as exception:
+                cleanup_parameters(input_parameters, exception=exception)
+                delete_context(context, exception=exception)
+                return api.http.not_found(request, response, **kwargs)
+            except exception_types as exception:
+                cleanup_parameters(input_parameters, exception=exception)
+                delete_context(context, exception=exception)
+                self.handle_exception(
+                    exception, exception_types, request, response, api_version, **kwargs
+                )
+            except Exception as exception:
+                cleanup_parameters(input_parameters, exception=exception)
+                delete_context(context, exception=exception)
+                raise exception
+            cleanup_parameters(input_parameters)
+            delete_context(context)
+
+        call.interface = self
+        return call
+
     def documentation(self, add_to=None, version=None, prefix="", base_url="", url=""):
         """Returns the documentation specific to an HTTP interface"""
         doc = OrderedDict() if add_to is None else add_to
@@ -971,28 +1619,13 @@ class HTTP(Interface):
 
         return doc
 
-    @lru_cache()
     def urls(self, version=None):
         """Returns all URLS that are mapped to this interface"""
-        urls = []
-        for _base_url, routes in self.api.http.routes.items():
-            for url, methods in routes.items():
-                for _method, versions in methods.items():
-                    for interface_version, interface in versions.items():
-                        if interface_version == version and interface == self:
-                            if not url in urls:
-                                urls.append(("/v{0}".format(version) if version else "") + url)
-        return urls
+        return [template.url for template in self.api.http.url_index().get((self, version), ())]
 
     def url(self, version=None, **kwargs):
         """Returns the first matching URL found for the specified arguments"""
-        for url in self.urls(version):
-            if [key for key in kwargs.keys() if not "{" + key + "}" in url]:
-                continue
-
-            return url.format(**kwargs)
-
-        raise KeyError("URL that takes all provided parameters not found")
+        return self.api.http.url_for(self, version, **kwargs)
 
 
 class ExceptionRaised(HTTP):
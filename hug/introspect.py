@@ -35,6 +35,11 @@ def is_coroutine(function):
     return function.__code__.co_flags & 0x0080 or getattr(function, "_is_coroutine", False)
 
 
+def is_async_generator(function):
+    """Returns True if the passed in function is an asynchronous generator"""
+    return bool(getattr(function, "__code__", None) and function.__code__.co_flags & 0x0200)
+
+
 def name(function):
     """Returns the name of a function"""
     return function.__name__
@@ -1,28 +1,181 @@
+"""hug/json_module.py
+
+Defines the backend hug encodes and decodes JSON with: orjson, ujson or the standard library's json module
+
+The backend is chosen by the HUG_JSON_BACKEND environment variable, or at runtime using `use`. Whichever backend is in
+use, objects it can not natively serialize are converted through the provided default, so every converter registered
+with `hug.output_format.json_convert` keeps applying. ujson writes Decimals out as numbers itself, without consulting
+the default, so it is only used when asked for explicitly (HUG_JSON_BACKEND=ujson, or HUG_USE_UJSON=1).
+
+Copyright (C) 2016  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import
+
+import json as stdlib_json
 import os
+from enum import Enum
+from uuid import UUID
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = False
+
+try:
+    import ujson
+
+    UJSON_DEFAULT = int(ujson.__version__.split(".")[0]) >= 5
+except ImportError:  # pragma: no cover
+    ujson = False
+
+HUG_USE_UJSON = bool(os.environ.get("HUG_USE_UJSON", ""))
+HUG_JSON_BACKEND = os.environ.get("HUG_JSON_BACKEND", "ujson" if HUG_USE_UJSON else "json")
+BACKENDS = ("orjson", "ujson", "json")
+ORJSON_NATIVE_TYPES = (UUID, Enum)
+
+
+def stdlib_dumps_bytes(content, **kwargs):
+    """Encodes the content as UTF-8 JSON bytes using the standard library's json module"""
+    return stdlib_json.dumps(content, **kwargs).encode("utf8")
+
+
+if orjson:
+    ORJSON_OPTIONS = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+    def orjson_dumps_bytes(
+        content, default=None, ensure_ascii=False, indent=None, sort_keys=False, option=0, **kwargs
+    ):
+        """Encodes the content as UTF-8 JSON bytes using orjson, with any additional orjson option flags given
+
+        Dates and dataclasses are passed through to the default so registered converters decide their form, but
+        UUIDs and enums (ORJSON_NATIVE_TYPES) are always written natively: callers converting those must use the
+        standard library instead. Output orjson can't produce (ASCII escaping, indents other than 2, custom
+        separators) and values it can't hold (integers beyond 64 bits) are encoded by the standard library instead.
+        """
+        if ensure_ascii or indent not in (None, 2) or kwargs:
+            return stdlib_dumps_bytes(
+                content,
+                default=default,
+                ensure_ascii=ensure_ascii,
+                indent=indent,
+                sort_keys=sort_keys,
+                **kwargs
+            )
 
-HUG_USE_UJSON = bool(os.environ.get("HUG_USE_UJSON", 1))
-try:  # pragma: no cover
-    if HUG_USE_UJSON:
-        import ujson as json
-
-        class dumps_proxy:  # noqa: N801
-            """Proxies the call so non supported kwargs are skipped
-            and it enables escape_forward_slashes to simulate built-in json
-            """
-
-            _dumps = json.dumps
-
-            def __call__(self, *args, **kwargs):
-                kwargs.pop("default", None)
-                kwargs.pop("separators", None)
-                kwargs.update(escape_forward_slashes=False)
-                try:
-                    return self._dumps(*args, **kwargs)
-                except Exception as exc:
-                    raise TypeError("Type[ujson] is not Serializable", exc)
-
-        json.dumps = dumps_proxy()
-    else:
-        import json
+        option |= ORJSON_OPTIONS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+
+        converter_failed = []
+
+        def convert(item):
+            try:
+                return default(item)
+            except Exception:
+                converter_failed.append(item)
+                raise
+
+        try:
+            return orjson.dumps(content, default=default and convert, option=option)
+        except TypeError:
+            if converter_failed:
+                raise
+            return stdlib_dumps_bytes(content, default=default, sort_keys=sort_keys, indent=indent)
+
+    def orjson_dumps(content, **kwargs):
+        return orjson_dumps_bytes(content, **kwargs).decode("utf8")
+
+
+if ujson:
+
+    def ujson_dumps(content, default=None, **kwargs):
+        """Encodes the content using ujson, converting what it can't serialize through the default
+
+        Decimals are written out as numbers by ujson itself, bypassing the default. Versions of ujson without a
+        default hook fall back to the standard library when it is needed.
+        """
+        options = {key: value for key, value in kwargs.items() if key != "separators"}
+        try:
+            if default is not None and UJSON_DEFAULT:
+                return ujson.dumps(content, default=default, escape_forward_slashes=False, **options)
+            return ujson.dumps(content, escape_forward_slashes=False, **options)
+        except Exception as exception:
+            if default is None:
+                raise TypeError("Type[ujson] is not Serializable", exception)
+            return stdlib_json.dumps(content, default=default, **kwargs)
+
+    def ujson_dumps_bytes(content, **kwargs):
+        return ujson_dumps(content, **kwargs).encode("utf8")
+
+
+class Backend(object):
+    """The JSON backend in use, exposing the interface of the json module along with dumps_bytes
+
+    A single instance is shared, and updated in place when the backend changes, so references held by other modules
+    always see the current backend.
+    """
+
+    __slots__ = ("name", "loads", "dumps", "dumps_bytes")
+
+    def __init__(self, name):
+        self.use(name)
+
+    def use(self, name):
+        """Switches to the named backend: one of orjson, ujson or json"""
+        if name == "orjson" and orjson:
+            self.loads, self.dumps, self.dumps_bytes = (
+                orjson.loads,
+                orjson_dumps,
+                orjson_dumps_bytes,
+            )
+        elif name == "ujson" and ujson:
+            self.loads, self.dumps, self.dumps_bytes = ujson.loads, ujson_dumps, ujson_dumps_bytes
+        elif name == "json":
+            self.loads, self.dumps, self.dumps_bytes = (
+                stdlib_json.loads,
+                stdlib_json.dumps,
+                stdlib_dumps_bytes,
+            )
+        elif name in BACKENDS:
+            raise ImportError("The {0} JSON backend is not installed".format(name))
+        else:
+            raise ValueError(
+                "Unknown JSON backend {0}, expected one of: {1}".format(name, ", ".join(BACKENDS))
+            )
+        self.name = name
+
+    def __getattr__(self, name):
+        return getattr(stdlib_json, name)
+
+
+try:
+    json = Backend(HUG_JSON_BACKEND)
 except ImportError:  # pragma: no cover
-    import json
+    json = Backend("json")
+
+
+def use(name):
+    """Switches every JSON encode and decode hug performs, for every API in the process, over to the named backend:
+       one of orjson, ujson or json
+    """
+    json.use(name)
+    return json
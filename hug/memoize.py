@@ -0,0 +1,278 @@
+"""hug/memoize.py
+
+Defines the in-memory cache of rendered responses used to memoize HTTP endpoints, and the single-flight
+coalescing of identical concurrent calls
+
+Copyright (C) 2016  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+from __future__ import absolute_import
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from hug import _empty as empty
+
+UNCACHED_HEADERS = frozenset(("set-cookie",))
+
+
+def freeze(value):
+    """Returns a hashable equivalent of the given parameter value, raising TypeError if there isn't one"""
+    if isinstance(value, dict):
+        return (dict, tuple(sorted((key, freeze(item)) for key, item in value.items())))
+    elif isinstance(value, (list, tuple)):
+        return (type(value), tuple(freeze(item) for item in value))
+    elif isinstance(value, (set, frozenset)):
+        return (frozenset, frozenset(freeze(item) for item in value))
+    elif hasattr(value, "read"):
+        raise TypeError("Streams can not be memoized")
+
+    hash(value)
+    return value
+
+
+def cache(memoize):
+    """Returns the ResponseCache defined by a routes memoize setting: True, a TTL in seconds, or a dict of options"""
+    if isinstance(memoize, ResponseCache):
+        return memoize
+    elif memoize is True:
+        return ResponseCache()
+    elif isinstance(memoize, (int, float)):
+        return ResponseCache(ttl=memoize)
+    return ResponseCache(**memoize)
+
+
+class CachedResponse(object):
+    """A rendered response, along with when it expires"""
+
+    __slots__ = ("status", "headers", "data", "expires")
+
+    def __init__(self, status, headers, data, expires):
+        self.status = status
+        self.headers = headers
+        self.data = data
+        self.expires = expires
+
+    def respond(self, response):
+        """Applies the cached status, headers and body to the given response"""
+        response.status = self.status
+        response._headers.update(self.headers)
+        response.data = self.data
+
+
+class ResponseCache(object):
+    """A thread safe, in-memory, least recently used cache of rendered responses
+
+    Entries are fresh for ttl seconds. For a further stale_while_revalidate seconds they are still served, while a
+    single background thread renders a fresh copy. The cache holds at most max_entries responses and max_bytes of
+    response bodies.
+    """
+
+    __slots__ = (
+        "ttl",
+        "max_entries",
+        "max_bytes",
+        "stale_while_revalidate",
+        "entries",
+        "size",
+        "refreshing",
+        "lock",
+    )
+
+    def __init__(
+        self, ttl=60, max_entries=1024, max_bytes=64 * 1024 * 1024, stale_while_revalidate=0
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_while_revalidate = stale_while_revalidate
+        self.entries = OrderedDict()
+        self.size = 0
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the (response, needs_refresh) pair cached for the key, with a response of None if there is none"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None, False
+
+            if now < entry.expires:
+                self.entries.move_to_end(key)
+                return entry, False
+            elif now < entry.expires + self.stale_while_revalidate:
+                self.entries.move_to_end(key)
+                if key in self.refreshing:
+                    return entry, False
+                self.refreshing.add(key)
+                return entry, True
+
+            self._remove(key)
+            return None, False
+
+    def set(self, key, response, preset=empty.dict):
+        """Caches the rendered response for the key, if it has a successful, complete, body
+
+        Only the headers the endpoint produced are cached: those not already set, to the same value, in preset (the
+        headers of the response before the endpoint was called, such as those set by middleware), and never cookies.
+        """
+        data = response.data if response.body is None else response.body
+        if isinstance(data, str):
+            data = data.encode("utf8")
+        if (
+            data is None
+            or response.stream is not None
+            or not response.status.startswith("2")
+            or len(data) > self.max_bytes
+        ):
+            return
+
+        headers = {
+            name: value
+            for name, value in response._headers.items()
+            if name not in UNCACHED_HEADERS and preset.get(name) != value
+        }
+        entry = CachedResponse(response.status, headers, data, time.monotonic() + self.ttl)
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = entry
+            self.size += len(data)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def refresh(self, key, render):
+        """Renders a fresh response for the key in the background, using the provided function"""
+
+        def run_refresh():
+            try:
+                render()
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+        threading.Thread(target=run_refresh, name="hug-memoize-refresh", daemon=True).start()
+
+    def clear(self):
+        """Removes every cached response"""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry.data)
+
+
+class Flight(object):
+    """A call in progress, that followers with the same key wait on"""
+
+    __slots__ = ("done", "value", "exception", "shareable")
+
+    def __init__(self, done):
+        self.done = done
+        self.value = None
+        self.exception = None
+        self.shareable = True
+
+    def finish(self, value=None, exception=None):
+        self.value = value
+        self.exception = exception
+        self.shareable = not (hasattr(value, "__next__") or hasattr(value, "__anext__"))
+
+
+class SingleFlight(object):
+    """Coalesces concurrent calls that share a key, so only the first runs and the others receive its result
+
+    Threads calling through call wait on the leading thread, while coroutines calling through call_async await the
+    leading coroutine running within the same event loop. Results that can only be consumed once, such as generators,
+    aren't shared, nor are calls interrupted without a result (such as cancelled coroutines): waiting callers make
+    their own call instead.
+    """
+
+    __slots__ = ("calls", "async_calls", "lock")
+
+    def __init__(self):
+        self.calls = {}
+        self.async_calls = {}
+        self.lock = threading.Lock()
+
+    def call(self, key, function, *args, **kwargs):
+        """Calls the function, or waits for and returns the result of an identical call already in flight"""
+        with self.lock:
+            flight = self.calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.calls[key] = Flight(threading.Event())
+
+        if not leader:
+            flight.done.wait()
+            return self._result(flight, function, *args, **kwargs)
+
+        try:
+            value = function(*args, **kwargs)
+        except Exception as exception:
+            flight.finish(exception=exception)
+            raise
+        except BaseException:
+            flight.shareable = False
+            raise
+        else:
+            flight.finish(value)
+            return value
+        finally:
+            with self.lock:
+                del self.calls[key]
+            flight.done.set()
+
+    async def call_async(self, key, function, *args, **kwargs):
+        """Awaits the coroutine function, or the result of an identical call already in flight within this loop"""
+        loop = asyncio.get_event_loop()
+        flight = self.async_calls.get((loop, key))
+        if flight is not None:
+            await asyncio.shield(flight.done)
+            if flight.shareable:
+                return self._result(flight, function)
+            return await function(*args, **kwargs)
+
+        flight = self.async_calls[(loop, key)] = Flight(loop.create_future())
+        try:
+            value = await function(*args, **kwargs)
+        except Exception as exception:
+            flight.finish(exception=exception)
+            raise
+        except BaseException:
+            flight.shareable = False
+            raise
+        else:
+            flight.finish(value)
+            return value
+        finally:
+            del self.async_calls[(loop, key)]
+            flight.done.set_result(None)
+
+    @staticmethod
+    def _result(flight, function, *args, **kwargs):
+        if not flight.shareable:
+            return function(*args, **kwargs)
+        elif flight.exception is not None:
+            raise flight.exception
+        return flight.value
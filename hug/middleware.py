@@ -19,20 +19,108 @@ OTHER DEALINGS IN THE SOFTWARE.
 """
 from __future__ import absolute_import
 
+import atexit
 import logging
+import os
+import random
 import re
+import threading
+import time
 import uuid
+import weakref
+import zlib
+from collections import deque
+from collections.abc import MutableMapping
 from datetime import datetime
+from functools import partial
+
+from hug.exceptions import StoreKeyNotFound
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = False
+
+PREFLIGHT_CACHE_SIZE = 1024
+IMMUTABLE_SESSION_TYPES = (str, bytes, int, float, complex, type(None), tuple, frozenset)
+RE_URL_PARAMETER = re.compile(r"{[^{}]+}")
+
+
+class Session(MutableMapping):
+    """The session data of a single request, loaded from the store the first time it is accessed
+
+    Assigning or deleting keys marks the session as modified, and only modified sessions are written back. As values
+    that can be changed in place (such as lists and dicts) may be changed once read, reading one marks the session as
+    modified too, while reading immutable values (strings, numbers, tuples) doesn't.
+    """
+
+    __slots__ = ("store", "sid", "new", "modified", "_data")
+
+    def __init__(self, store, sid=None):
+        self.store = store
+        self.sid = sid
+        self.new = sid is None
+        self.modified = False
+        self._data = None
+
+    @property
+    def loaded(self):
+        """Returns True if the session data has been loaded from the store"""
+        return self._data is not None
+
+    @property
+    def data(self):
+        """The session data, loaded from the store if it hasn't been yet"""
+        if self._data is None:
+            self._data = {}
+            if not self.new:
+                try:
+                    self._data = self.store.get(self.sid)
+                except StoreKeyNotFound:
+                    self.new = True
+        return self._data
+
+    def __getitem__(self, key):
+        value = self.data[key]
+        if not isinstance(value, IMMUTABLE_SESSION_TYPES):
+            self.modified = True
+        return value
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self.modified = True
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return "{0}({1!r})".format(self.__class__.__name__, self.data)
+
+    def __native_types__(self):
+        return dict(self.data)
 
 
 class SessionMiddleware(object):
     """Simple session middleware.
 
-    Injects a session dictionary into the context of a request, sets a session cookie,
+    Injects a session into the context of a request, sets a session cookie,
     and stores/restores data via a coupled store object.
 
+    The session is loaded from the store the first time the request accesses it, and only written back (along with
+    the cookie) when it has been modified, so requests that leave the session alone don't touch the store at all.
+
     A session store object must implement the following methods:
-    * get(session_id) - return session data
+    * get(session_id) - return session data, raising hug.exceptions.StoreKeyNotFound if it doesn't exist
     * exists(session_id) - return boolean if session ID exists or not
     * set(session_id, session_data) - save session data for given session ID
 
@@ -79,23 +167,28 @@ class SessionMiddleware(object):
         return str(uuid.uuid4())
 
     def process_request(self, request, response):
-        """Get session ID from cookie, load corresponding session data from coupled store and inject session data into
+        """Get session ID from cookie and inject a session, loaded from the coupled store on first access, into
             the request context.
         """
         sid = request.cookies.get(self.cookie_name, None)
-        data = {}
-        if sid is not None:
-            if self.store.exists(sid):
-                data = self.store.get(sid)
-        request.context.update({self.context_name: data})
+        request.context.update({self.context_name: Session(self.store, sid)})
 
     def process_response(self, request, response, resource, req_succeeded):
-        """Save request context in coupled store object. Set cookie containing a session ID."""
-        sid = request.cookies.get(self.cookie_name, None)
-        if sid is None or not self.store.exists(sid):
+        """Save a modified session in coupled store object. Set cookie containing a session ID."""
+        session = request.context.get(self.context_name, {})
+        if isinstance(session, Session):
+            if not session.modified:
+                return
+            sid = None if session.new else session.sid
+            session = session.data
+        else:
+            sid = request.cookies.get(self.cookie_name, None)
+            if sid is not None and not self.store.exists(sid):
+                sid = None
+        if sid is None:
             sid = self.generate_sid()
 
-        self.store.set(sid, request.context.get(self.context_name, {}))
+        self.store.set(sid, session)
         response.set_cookie(
             self.cookie_name,
             sid,
@@ -143,14 +236,138 @@ class LogMiddleware(object):
         self.logger.info(self._generate_combined_log(request, response))
 
 
+def _flush_queued_logs(reference):
+    middleware = reference()
+    if middleware is not None:
+        middleware.flush()
+
+
+def _write_queued_logs(reference, wake, flush_interval):
+    """Drains the records queued by a QueuedLogMiddleware in batches, waking every flush_interval or as soon as a full
+       batch is queued, until the middleware is garbage collected
+    """
+    while True:
+        wake.wait(flush_interval)
+        wake.clear()
+        middleware = reference()
+        if middleware is None:
+            return
+        middleware.flush()
+        del middleware
+
+
+class QueuedLogMiddleware(LogMiddleware):
+    """A LogMiddleware that keeps logging off the request thread
+
+    Each response is recorded as a single structured access record (method, path, route, status, size and latency in
+    milliseconds) appended to a bounded queue, which a background thread drains and logs in batches. When the queue is
+    full the oldest records are dropped, rather than the request ever waiting on a log handler.
+
+    sample_rates optionally maps status classes ("2xx", "3xx", "4xx", "5xx") to the fraction of those responses that
+    are recorded, any class not given being recorded in full.
+
+    The background thread is started with the first response, and again within each process forked afterwards, as
+    threads don't survive a fork (such as that of pre-forking servers' workers).
+    """
+
+    __slots__ = (
+        "records",
+        "batch_size",
+        "flush_interval",
+        "sample_rates",
+        "_wake",
+        "_lock",
+        "_writer_pid",
+        "__weakref__",
+    )
+
+    message = "%(method)s %(path)s %(status)s %(size)s %(latency).2fms"
+    context_key = "_hug_log_started"
+
+    def __init__(
+        self,
+        logger=None,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        max_queued: int = 65536,
+        sample_rates: dict = None,
+    ):
+        super().__init__(logger=logger)
+        self.records = deque(maxlen=max_queued)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_rates = {
+            status_class[0]: rate for status_class, rate in (sample_rates or {}).items()
+        }
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._writer_pid = None
+
+    def start_writer(self):
+        """Starts the background thread logging queued records, if it isn't running within this process already"""
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            if self._writer_pid is None:
+                atexit.register(_flush_queued_logs, weakref.ref(self))
+            self._writer_pid = os.getpid()
+            threading.Thread(
+                target=_write_queued_logs,
+                args=(weakref.ref(self), self._wake, self.flush_interval),
+                name="hug-access-log",
+                daemon=True,
+            ).start()
+
+    def flush(self):
+        """Logs every queued record"""
+        popleft = self.records.popleft
+        while True:
+            try:
+                record = popleft()
+            except IndexError:
+                return
+            self.logger.info(self.message, record)
+
+    def process_request(self, request, response):
+        """Notes when the request started, so its latency can be recorded"""
+        request.context[self.context_key] = time.perf_counter()
+
+    def process_response(self, request, response, resource, req_succeeded):
+        """Queues an access record for the response, subject to the sample rate of its status class"""
+        if self._writer_pid != os.getpid():
+            self.start_writer()
+
+        status = response.status
+        rate = self.sample_rates.get(status[0], 1)
+        if rate < 1 and random.random() >= rate:
+            return
+
+        started = request.context.get(self.context_key)
+        self.records.append(
+            {
+                "method": request.method,
+                "path": request.path,
+                "route": getattr(request, "uri_template", None),
+                "status": status[:3],
+                "size": "-" if response.data is None else len(response.data),
+                "latency": 0.0 if started is None else (time.perf_counter() - started) * 1000,
+            }
+        )
+        if len(self.records) >= self.batch_size:
+            self._wake.set()
+
+
 class CORSMiddleware(object):
     """A middleware for allowing cross-origin request sharing (CORS)
 
     Adds appropriate Access-Control-* headers to the HTTP responses returned from the hug API,
     especially for HTTP OPTIONS responses used in CORS preflighting.
+
+    The routes of the API are compiled into a single matcher, rebuilt only when they change, and the full set of
+    preflight headers is cached per route, origin and requested headers.
     """
 
-    __slots__ = ("api", "allow_origins", "allow_credentials", "max_age")
+    __slots__ = ("api", "allow_origins", "allow_credentials", "max_age", "_routes", "_preflights")
 
     def __init__(
         self, api, allow_origins: list = None, allow_credentials: bool = True, max_age: int = None
@@ -161,45 +378,255 @@ class CORSMiddleware(object):
         self.allow_origins = allow_origins
         self.allow_credentials = allow_credentials
         self.max_age = max_age
+        self._routes = None
+        self._preflights = {}
+
+    def routes(self):
+        """Returns the (revision, exact, pattern, routes) matcher for the routes of the API, compiling it if they've
+           changed: exact maps static paths, and pattern's numbered groups the rest, to (route, allowed methods) pairs
+        """
+        http = self.api.http
+        compiled = self._routes
+        if compiled is None or compiled[0] != http.revision:
+            exact = {}
+            patterns = []
+            routes = []
+            for base_url, base_routes in http.routes.items():
+                for url, methods in base_routes.items():
+                    route = (url, ", ".join(sorted(set(methods) | {"OPTIONS"})))
+                    exact.setdefault(base_url + url, route)
+                    patterns.append(
+                        "(?P<route{0}>{1}(?:/v[^/]+)?{2})".format(
+                            len(routes),
+                            re.escape(base_url),
+                            "[^/]+".join(re.escape(part) for part in RE_URL_PARAMETER.split(url)),
+                        )
+                    )
+                    routes.append(route)
+
+            compiled = self._routes = (
+                http.revision,
+                exact,
+                re.compile("|".join(patterns)) if patterns else None,
+                routes,
+            )
+            self._preflights = {}
+        return compiled
+
+    def find_route(self, reqpath):
+        """Returns the (route, allowed methods) pair for the request path, or None if no route matches it"""
+        _revision, exact, pattern, routes = self.routes()
+        route = exact.get(reqpath)
+        if route is None and pattern is not None:
+            found = pattern.fullmatch(reqpath)
+            if found is not None:
+                route = routes[int(found.lastgroup[5:])]
+        return route
 
     def match_route(self, reqpath):
         """Match a request with parameter to it's corresponding route"""
-        route_dicts = [routes for _, routes in self.api.http.routes.items()][0]
-        routes = [route for route, _ in route_dicts.items()]
-        if reqpath not in routes:
-            for route in routes:  # replace params in route with regex
-                reqpath = re.sub(r"^(/v\d*/?)", "/", reqpath)
-                base_url = getattr(self.api.http, "base_url", "")
-                reqpath = reqpath.replace(base_url, "", 1) if base_url else reqpath
-                if re.match(re.sub(r"/{[^{}]+}", ".+", route) + "$", reqpath, re.DOTALL):
-                    return route
-
-        return reqpath
+        route = self.find_route(reqpath)
+        return reqpath if route is None else route[0]
 
     def process_response(self, request, response, resource, req_succeeded):
         """Add CORS headers to the response"""
-        response.set_header("Access-Control-Allow-Credentials", str(self.allow_credentials).lower())
-
         origin = request.get_header("ORIGIN")
-        if origin and (origin in self.allow_origins) or ("*" in self.allow_origins):
-            response.set_header("Access-Control-Allow-Origin", origin)
-
-        if request.method == "OPTIONS":  # check if we are handling a preflight request
-            allowed_methods = set(
-                method
-                for _, routes in self.api.http.routes.items()
-                for method, _ in routes[self.match_route(request.path)].items()
+        if request.method != "OPTIONS":
+            response.set_header(
+                "Access-Control-Allow-Credentials", str(self.allow_credentials).lower()
             )
-            allowed_methods.add("OPTIONS")
+            if origin and (origin in self.allow_origins or "*" in self.allow_origins):
+                response.set_header("Access-Control-Allow-Origin", origin)
+            return
+
+        # preflight requests get the full set of headers, cached per route, origin and requested headers
+        route = self.find_route(request.path)
+        requested_headers = request.get_header("Access-Control-Request-Headers")
+        key = (route, origin, requested_headers)
+        headers = self._preflights.get(key)
+        if headers is None:
+            allowed_methods = "OPTIONS" if route is None else route[1]
+            headers = [
+                ("Access-Control-Allow-Credentials", str(self.allow_credentials).lower()),
+                ("Access-Control-Allow-Methods", allowed_methods),
+                ("Allow", allowed_methods),
+                ("Access-Control-Allow-Headers", requested_headers or ""),
+            ]
+            if origin and (origin in self.allow_origins or "*" in self.allow_origins):
+                headers.append(("Access-Control-Allow-Origin", origin))
+            if self.max_age:
+                headers.append(("Access-Control-Max-Age", str(self.max_age)))
 
-            # return allowed methods
-            response.set_header("Access-Control-Allow-Methods", ", ".join(allowed_methods))
-            response.set_header("Allow", ", ".join(allowed_methods))
+            if len(self._preflights) >= PREFLIGHT_CACHE_SIZE:
+                self._preflights.clear()
+            self._preflights[key] = headers
+        response.set_headers(headers)
 
-            # get all requested headers and echo them back
-            requested_headers = request.get_header("Access-Control-Request-Headers")
-            response.set_header("Access-Control-Allow-Headers", requested_headers or "")
 
-            # return valid caching time
-            if self.max_age:
-                response.set_header("Access-Control-Max-Age", self.max_age)
+class CompressionMiddleware(object):
+    """A middleware that compresses response bodies for clients that accept it, through gzip, deflate, or brotli
+
+    Responses smaller than minimum_size bytes, already encoded responses, and content types that are compressed
+    already (images, video, audio, and archives) are sent as is. Streamed responses are compressed incrementally
+    as they are sent. level sets the zlib compression level used for gzip and deflate, brotli_level the brotli
+    quality, trading CPU time for bandwidth.
+
+    Strong ETags of compressed responses are weakened, as the bytes sent no longer match those they validate.
+    """
+
+    __slots__ = (
+        "level",
+        "brotli_level",
+        "minimum_size",
+        "encodings",
+        "excluded_types",
+        "chunk_size",
+    )
+
+    def __init__(
+        self,
+        level=6,
+        brotli_level=5,
+        minimum_size=500,
+        encodings=("br", "gzip", "deflate"),
+        excluded_types=(
+            "image/",
+            "video/",
+            "audio/",
+            "application/zip",
+            "application/gzip",
+            "application/x-gzip",
+            "application/x-mpegURL",
+            "multipart/byteranges",
+        ),
+        chunk_size=64 * 1024,
+    ):
+        self.level = level
+        self.brotli_level = brotli_level
+        self.minimum_size = minimum_size
+        self.encodings = tuple(encoding for encoding in encodings if encoding != "br" or brotli)
+        self.excluded_types = tuple(excluded_types)
+        self.chunk_size = chunk_size
+
+    def negotiate(self, accept_encoding):
+        """Returns the supported encoding the client prefers, given the value of its Accept-Encoding header"""
+        qualities = {}
+        for accepted in accept_encoding.split(","):
+            encoding, _separator, parameters = accepted.partition(";")
+            quality = 1.0
+            if parameters:
+                name, _separator, value = parameters.strip().partition("=")
+                if name.strip() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            qualities[encoding.strip().lower()] = quality
+
+        wildcard = qualities.get("*", 0.0)
+        best, best_quality = None, 0.0
+        for encoding in self.encodings:
+            quality = qualities.get(encoding, wildcard)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def compressor(self, encoding):
+        """Returns a (compress, finish) pair of functions for incrementally compressing data with the encoding"""
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=self.brotli_level)
+            return compressor.process, compressor.finish
+
+        window_bits = zlib.MAX_WBITS | 16 if encoding == "gzip" else zlib.MAX_WBITS
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, window_bits)
+        return compressor.compress, compressor.flush
+
+    def compress_stream(self, stream, encoding):
+        """Yields the compressed contents of the given iterable or file-like stream as it's read"""
+        compress, finish = self.compressor(encoding)
+        try:
+            if hasattr(stream, "read"):
+                chunks = iter(partial(stream.read, self.chunk_size), b"")
+            else:
+                chunks = stream
+            for chunk in chunks:
+                compressed = compress(chunk)
+                if compressed:
+                    yield compressed
+            yield finish()
+        finally:
+            if hasattr(stream, "close"):
+                stream.close()
+
+    def process_response(self, request, response, resource, req_succeeded):
+        """Compresses the response body if the client accepts a supported encoding and it's worth compressing"""
+        status = int(response.status[:3])
+        if (
+            request.method == "HEAD"
+            or status < 200
+            or status in (204, 206, 304, 416)
+            or response.get_header("Content-Encoding")
+            or (response.content_type or "").startswith(self.excluded_types)
+        ):
+            return
+
+        response.append_header("Vary", "Accept-Encoding")
+        encoding = self.negotiate(request.get_header("Accept-Encoding") or "")
+        if not encoding:
+            return
+
+        data = response.body if response.body is not None else response.data
+        if data is not None:
+            if isinstance(data, str):
+                data = data.encode("utf8")
+            if len(data) < self.minimum_size:
+                return
+
+            compress, finish = self.compressor(encoding)
+            response.body = None
+            response.data = compress(data) + finish()
+        elif response.stream is not None:
+            length = response.content_length
+            if length is not None and int(length) < self.minimum_size:
+                return
+
+            if hasattr(response.stream, "__aiter__"):
+                response.stream = AsyncCompressedStream(response.stream, *self.compressor(encoding))
+            else:
+                response.stream = self.compress_stream(response.stream, encoding)
+            response.content_length = None
+        else:
+            return
+        response.set_header("Content-Encoding", encoding)
+
+        etag = response.get_header("ETag")
+        if etag and not etag.startswith("W/"):
+            response.set_header("ETag", "W/" + etag)
+
+
+class AsyncCompressedStream(object):
+    """Incrementally compresses an asynchronous stream of chunks, such as those sent by the ASGI server"""
+
+    __slots__ = ("chunks", "compress", "finish", "done")
+
+    def __init__(self, stream, compress, finish):
+        self.chunks = stream.__aiter__()
+        self.compress = compress
+        self.finish = finish
+        self.done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self.done:
+            try:
+                chunk = await self.chunks.__anext__()
+            except StopAsyncIteration:
+                self.done = True
+                return self.finish()
+
+            compressed = self.compress(chunk)
+            if compressed:
+                return compressed
+        raise StopAsyncIteration
@@ -28,17 +28,45 @@ import re
 import tempfile
 from datetime import date, datetime, timedelta
 from decimal import Decimal
-from functools import wraps
+from functools import lru_cache, partial, wraps
 from io import BytesIO
-from operator import itemgetter
+from operator import attrgetter
 from uuid import UUID
 
 import falcon
 from falcon import HTTP_NOT_FOUND
 
 from hug import introspect
-from hug.format import camelcase, content_type
+from hug.format import (
+    AsyncStreamChunks,
+    affix_matcher,
+    camelcase,
+    content_type,
+    iterates,
+    match_content_type,
+    negotiate,
+    stream_chunks,
+    streams,
+)
+from hug.json_module import ORJSON_NATIVE_TYPES
 from hug.json_module import json as json_converter
+from hug.json_module import stdlib_dumps_bytes
+from hug.types import Schema
+
+try:
+    import dataclasses
+except ImportError:  # pragma: no cover
+    dataclasses = False
+
+try:
+    import msgpack as msgpack_converter
+except ImportError:  # pragma: no cover
+    msgpack_converter = False
+
+try:
+    import cbor2 as cbor_converter
+except ImportError:  # pragma: no cover
+    cbor_converter = False
 
 try:
     import numpy
@@ -95,33 +123,185 @@ VIDEO_TYPES = (
 )
 RE_ACCEPT_QUALITY = re.compile("q=(?P<quality>[^;]+)")
 json_converters = {}
+record_encoders = {}
+json_dispatch = {}
+json_native_dispatch = {}
+JSON_DISPATCH_SIZE = 1024
 stream = tempfile.NamedTemporaryFile if "UWSGI_ORIGINAL_PROC_NAME" in os.environ else BytesIO
 
 
-def _json_converter(item):
-    if hasattr(item, "__native_types__"):
-        return item.__native_types__()
-
-    for kind, transformer in json_converters.items():
-        if isinstance(item, kind):
-            return transformer(item)
-
-    if isinstance(item, (date, datetime)):
-        return item.isoformat()
-    elif isinstance(item, bytes):
-        try:
-            return item.decode("utf8")
-        except UnicodeDecodeError:
-            return base64.b64encode(item)
-    elif hasattr(item, "__iter__"):
-        return list(item)
-    elif isinstance(item, (Decimal, UUID)):
-        return str(item)
-    elif isinstance(item, timedelta):
-        return item.total_seconds()
+def _defines(kind, attribute):
+    return any(attribute in vars(base) for base in kind.__mro__)
+
+
+def _native_types(item):
+    return item.__native_types__()
+
+
+def _isoformat(item):
+    return item.isoformat()
+
+
+def _decode_bytes(item):
+    try:
+        return item.decode("utf8")
+    except UnicodeDecodeError:
+        return base64.b64encode(item)
+
+
+def _total_seconds(item):
+    return item.total_seconds()
+
+
+def _not_serializable(item):
     raise TypeError("Type not serializable")
 
 
+def _registered_json_converter(kind):
+    """Returns the converter registered for the type, or the nearest of its bases, if there is one"""
+    if _defines(kind, "__native_types__"):
+        return _native_types
+
+    for base in kind.__mro__:
+        if base in json_converters:
+            return json_converters[base]
+
+    for registered, transformer in json_converters.items():
+        if issubclass(kind, registered):
+            return transformer
+    return None
+
+
+def _record_fields(kind):
+    """Returns the field names of a record type: a namedtuple, dataclass or hug.types.Schema, or None for other types"""
+    if issubclass(kind, tuple):
+        return getattr(kind, "_fields", None)
+    elif dataclasses and dataclasses.is_dataclass(kind):
+        return tuple(field.name for field in dataclasses.fields(kind))
+    elif issubclass(kind, Schema):
+        fields = []
+        for base in reversed(kind.__mro__):
+            fields.extend(field for field in vars(base).get("_types", ()) if field not in fields)
+        return tuple(fields)
+    return None
+
+
+def _record_dict(fields):
+    if any("." in field for field in fields):
+        return lambda item: {field: getattr(item, field) for field in fields}
+
+    getter = attrgetter(*fields)
+    if len(fields) == 1:
+        return lambda item: {fields[0]: getter(item)}
+    return lambda item: dict(zip(fields, getter(item)))
+
+
+def record_encoder(kind):
+    """Returns the function that converts instances of the record type into dicts, or None if the type isn't a record
+
+    The function is built the first time a type is seen, reading every field at once rather than introspecting
+    every instance.
+    """
+    if kind in record_encoders:
+        return record_encoders[kind]
+
+    fields = _record_fields(kind)
+    if fields is None:
+        encoder = None
+    elif not fields:
+        encoder = lambda item: {}  # noqa: E731
+    else:
+        encoder = _record_dict(fields)
+
+    if len(record_encoders) >= JSON_DISPATCH_SIZE:
+        record_encoders.clear()
+    record_encoders[kind] = encoder
+    return encoder
+
+
+def _is_namedtuple(item):
+    return isinstance(item, tuple) and bool(getattr(item, "_fields", None))
+
+
+def _json_record_fields(converted):
+    for key, value in converted.items():
+        if _is_namedtuple(value):
+            converted[key] = _json_record(value)
+    return converted
+
+
+def _json_record(item):
+    """Converts the namedtuple into a dict, along with any namedtuples held directly within its fields"""
+    return _json_record_fields(record_encoder(type(item))(item))
+
+
+def _json_records(content):
+    """Converts a top-level namedtuple, or the namedtuples directly within a top-level list, into dicts
+
+    Nothing deeper is walked, so namedtuples nested within other dicts, lists and tuples are written out as arrays,
+    the same way by every backend: natively by those that write tuples out themselves, as lists by the default for
+    those (such as orjson) that hand it namedtuples.
+    """
+    if isinstance(content, tuple):
+        return _json_record(content) if _is_namedtuple(content) else content
+    elif isinstance(content, list):
+        for index, item in enumerate(content):
+            if isinstance(item, tuple) and _is_namedtuple(item):
+                return content[:index] + [
+                    _json_record(item) if _is_namedtuple(item) else item
+                    for item in content[index:]
+                ]
+    return content
+
+
+def _json_record_converter(encoder):
+    def convert(item):
+        return _json_record_fields(encoder(item))
+
+    return convert
+
+
+def _resolve_json_converter(kind):
+    """Returns the function that converts instances of the type into JSON serializable values"""
+    converter = _registered_json_converter(kind)
+    if converter is not None:
+        return converter
+    elif not issubclass(kind, tuple) and record_encoder(kind) is not None:
+        return _json_record_converter(record_encoder(kind))
+    elif issubclass(kind, date):
+        return _isoformat
+    elif issubclass(kind, bytes):
+        return _decode_bytes
+    elif _defines(kind, "__iter__"):
+        return list
+    elif issubclass(kind, (Decimal, UUID)):
+        return str
+    elif issubclass(kind, timedelta):
+        return _total_seconds
+    return _not_serializable
+
+
+def _json_converter(item):
+    kind = type(item)
+    try:
+        converter = json_dispatch[kind]
+    except KeyError:
+        if len(json_dispatch) >= JSON_DISPATCH_SIZE:
+            json_dispatch.clear()
+        converter = json_dispatch[kind] = _resolve_json_converter(kind)
+    return converter(item)
+
+
+@lru_cache(maxsize=1)
+def _converts_orjson_native():
+    """Returns True if a registered converter applies to types orjson writes out natively, bypassing the default"""
+    return any(
+        issubclass(kind, ORJSON_NATIVE_TYPES)
+        or any(issubclass(native, kind) for native in ORJSON_NATIVE_TYPES)
+        for kind in json_converters
+    )
+
+
 def json_convert(*kinds):
     """Registers the wrapped method as a JSON converter for the provided types.
 
@@ -131,6 +311,9 @@ def json_convert(*kinds):
     def register_json_converter(function):
         for kind in kinds:
             json_converters[kind] = function
+        json_dispatch.clear()
+        json_native_dispatch.clear()
+        _converts_orjson_native.cache_clear()
         return function
 
     return register_json_converter
@@ -163,17 +346,107 @@ if numpy:
         return float(item)
 
 
+def _json_encode(content, ensure_ascii=False, **kwargs):
+    dumps_bytes = json_converter.dumps_bytes
+    if json_converter.name == "orjson" and _converts_orjson_native():
+        dumps_bytes = stdlib_dumps_bytes
+    return dumps_bytes(
+        _json_records(content), default=_json_converter, ensure_ascii=ensure_ascii, **kwargs
+    )
+
+
+@streams(b"[", b",", b"]")
 @content_type("application/json; charset=utf-8")
 def json(content, request=None, response=None, ensure_ascii=False, **kwargs):
     """JSON (Javascript Serialized Object Notation)"""
     if hasattr(content, "read"):
         return content
 
-    if isinstance(content, tuple) and getattr(content, "_fields", None):
-        content = {field: getattr(content, field) for field in content._fields}
-    return json_converter.dumps(
-        content, default=_json_converter, ensure_ascii=ensure_ascii, **kwargs
-    ).encode("utf8")
+    return _json_encode(content, ensure_ascii=ensure_ascii, **kwargs)
+
+
+def _json_native(content):
+    kind = type(content)
+    try:
+        converter = json_native_dispatch[kind]
+    except KeyError:
+        if len(json_native_dispatch) >= JSON_DISPATCH_SIZE:
+            json_native_dispatch.clear()
+        converter = json_native_dispatch[kind] = _registered_json_converter(kind)
+    return content if converter is None else converter(content)
+
+
+def _json_iterable(content):
+    return (
+        hasattr(content, "__iter__")
+        and not isinstance(content, (str, bytes, dict))
+        and not _is_namedtuple(content)
+    )
+
+
+def _json_line(content, **kwargs):
+    return _json_encode(content, **kwargs) + b"\n"
+
+
+@iterates
+@content_type("application/json; charset=utf-8")
+def json_stream(content, request=None, response=None, ensure_ascii=False, **kwargs):
+    """JSON (Javascript Serialized Object Notation) written out incrementally, one array element at a time"""
+    if hasattr(content, "read"):
+        return content
+
+    render = partial(_json_encode, ensure_ascii=ensure_ascii, **kwargs)
+    if hasattr(content, "__anext__"):
+        return AsyncStreamChunks(content, render, b"[", b",", b"]")
+
+    content = _json_native(content)
+    if not _json_iterable(content):
+        return render(content)
+    return stream_chunks(content, render, b"[", b",", b"]")
+
+
+@iterates
+@content_type("application/x-ndjson; charset=utf-8")
+def ndjson(content, request=None, response=None, ensure_ascii=False, **kwargs):
+    """Newline delimited JSON (JSON Lines), written out incrementally with one record per line"""
+    if hasattr(content, "read"):
+        return content
+
+    render = partial(_json_line, ensure_ascii=ensure_ascii, **kwargs)
+    if hasattr(content, "__anext__"):
+        return AsyncStreamChunks(content, render)
+
+    content = _json_native(content)
+    if not _json_iterable(content):
+        return render(content)
+    return stream_chunks(content, render)
+
+
+if msgpack_converter:
+
+    @content_type("application/msgpack")
+    def msgpack(content, request=None, response=None, **kwargs):
+        """MessagePack, a compact binary format for JSON's data model, applying the registered JSON converters"""
+        if hasattr(content, "read"):
+            return content
+
+        return msgpack_converter.packb(
+            _json_records(content), default=_json_converter, use_bin_type=True, **kwargs
+        )
+
+
+if cbor_converter:
+
+    def _cbor_converter(encoder, item):
+        encoder.encode(_json_converter(item))
+
+    @content_type("application/cbor")
+    def cbor(content, request=None, response=None, **kwargs):
+        """CBOR (Concise Binary Object Representation), applying the registered JSON converters"""
+        if hasattr(content, "read"):
+            return content
+
+        return cbor_converter.dumps(_json_records(content), default=_cbor_converter, **kwargs)
 
 
 def on_valid(valid_content_type, on_invalid=json):
@@ -203,6 +476,7 @@ def on_valid(valid_content_type, on_invalid=json):
     return wrapper
 
 
+@streams()
 @content_type("text/plain; charset=utf-8")
 def text(content, **kwargs):
     """Free form UTF-8 text"""
@@ -212,6 +486,7 @@ def text(content, **kwargs):
     return str(content).encode("utf8")
 
 
+@streams()
 @content_type("text/html; charset=utf-8")
 def html(content, **kwargs):
     """HTML (Hypertext Markup Language)"""
@@ -338,8 +613,11 @@ def on_content_type(
             }
     """
 
+    offered = tuple(handlers.keys())
+
     def output_type(data, request, response):
-        handler = handlers.get(request.content_type.split(";")[0], default)
+        matched = match_content_type(request.content_type, offered)
+        handler = default if matched is None else handlers[matched]
         if not handler:
             raise falcon.HTTPNotAcceptable(error)
 
@@ -376,18 +654,15 @@ def accept(
             }
     """
 
+    offered = tuple(handlers.keys())
+
     def output_type(data, request, response):
         accept = request.accept
-        if accept in ("", "*", "/"):
+        if not accept or accept in ("*", "/", "*/*"):
             handler = default or handlers and next(iter(handlers.values()))
         else:
-            handler = default
-            accepted = [accept_quality(accept_type) for accept_type in accept.split(",")]
-            accepted.sort(key=itemgetter(0))
-            for _quality, accepted_content_type in reversed(accepted):
-                if accepted_content_type in handlers:
-                    handler = handlers[accepted_content_type]
-                    break
+            negotiated = negotiate(accept, offered)
+            handler = default if negotiated is None else handlers[negotiated]
 
         if not handler:
             raise falcon.HTTPNotAcceptable(error)
@@ -413,13 +688,11 @@ def suffix(
             }
     """
 
+    matcher = affix_matcher(handlers.keys(), suffix=True)
+
     def output_type(data, request, response):
-        path = request.path
-        handler = default
-        for suffix_test, suffix_handler in handlers.items():
-            if path.endswith(suffix_test):
-                handler = suffix_handler
-                break
+        matched = matcher(request.path)
+        handler = default if matched is None else handlers[matched]
 
         if not handler:
             raise falcon.HTTPNotAcceptable(error)
@@ -445,13 +718,11 @@ def prefix(
             }
     """
 
+    matcher = affix_matcher(handlers.keys())
+
     def output_type(data, request, response):
-        path = request.path
-        handler = default
-        for prefix_test, prefix_handler in handlers.items():
-            if path.startswith(prefix_test):
-                handler = prefix_handler
-                break
+        matched = matcher(request.path)
+        handler = default if matched is None else handlers[matched]
 
         if not handler:
             raise falcon.HTTPNotAcceptable(error)
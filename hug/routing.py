@@ -22,10 +22,16 @@ OTHER DEALINGS IN THE SOFTWARE.
 """
 from __future__ import absolute_import
 
+import calendar
 import os
 import re
+import stat
+import threading
+import time
 from collections import OrderedDict
+from datetime import datetime
 from functools import wraps
+from io import BytesIO
 from urllib.parse import urljoin
 
 import falcon
@@ -226,6 +232,10 @@ class HTTPRouter(InternalValidation):
         response_headers=None,
         private=False,
         inputs=None,
+        memoize=None,
+        coalesce=False,
+        vary=None,
+        stream=False,
         **kwargs
     ):
         if defaults is None:
@@ -252,6 +262,14 @@ class HTTPRouter(InternalValidation):
             self.route["private"] = private
         if inputs:
             self.route["inputs"] = inputs
+        if memoize:
+            self.route["memoize"] = memoize
+        if coalesce:
+            self.route["coalesce"] = coalesce
+        if vary:
+            self.route["vary"] = vary
+        if stream:
+            self.route["stream"] = stream
 
     def versions(self, supported, **overrides):
         """Sets the versions that this route should be compatiable with"""
@@ -273,6 +291,47 @@ class HTTPRouter(InternalValidation):
         """Sets the custom defaults that will be used for custom parameters"""
         return self.where(defaults=defaults, **overrides)
 
+    def memoize(
+        self,
+        ttl=60,
+        max_entries=1024,
+        max_bytes=64 * 1024 * 1024,
+        stale_while_revalidate=0,
+        vary=None,
+        **overrides
+    ):
+        """Caches the rendered responses of this route server side, so repeated requests skip the function and output
+
+        Routes taking the request, response or directives must give a vary function, returning what about the request
+        their response depends on, such as the header identifying the caller.
+        """
+        if vary is not None:
+            overrides["vary"] = vary
+        return self.where(
+            memoize={
+                "ttl": ttl,
+                "max_entries": max_entries,
+                "max_bytes": max_bytes,
+                "stale_while_revalidate": stale_while_revalidate,
+            },
+            **overrides
+        )
+
+    def coalesce(self, enabled=True, **overrides):
+        """Shares the result of a call to this route among identical requests made while it's still in progress
+
+        As with memoize, routes taking the request, response or directives must give a vary function.
+        """
+        return self.where(coalesce=enabled, **overrides)
+
+    def stream(self, enabled=True, **overrides):
+        """Writes the generators this route returns out incrementally, one item at a time, if its output format can
+
+        The response is sent before the generator is done, so exceptions it raises can no longer be handled (such as
+        by exception handlers) and instead cut the response short.
+        """
+        return self.where(stream=enabled, **overrides)
+
     def _create_interface(self, api, api_function, catch_exceptions=True):
         interface = hug.interface.HTTP(self.route, api_function, catch_exceptions)
         return (interface, api_function)
@@ -373,41 +432,180 @@ class SinkRouter(HTTPRouter):
         return callable_method
 
 
+class StaticFile(object):
+    """A resolved static file, along with the validators used to answer conditional requests for it"""
+
+    __slots__ = ("path", "size", "etag", "last_modified", "modified", "data")
+
+    def __init__(self, path, status):
+        self.path = path
+        self.size = status.st_size
+        self.modified = int(status.st_mtime)
+        self.etag = '"{0:x}-{1:x}"'.format(int(status.st_mtime * 1000000), status.st_size)
+        self.last_modified = falcon.util.dt_to_http(datetime.utcfromtimestamp(self.modified))
+        self.data = None
+
+    def not_modified(self, request):
+        """Returns True if the requests conditional headers show the client already has this version of the file"""
+        if_none_match = request.get_header("If-None-Match")
+        if if_none_match:
+            etags = (etag.strip() for etag in if_none_match.split(","))
+            return any(etag in ("*", self.etag, "W/" + self.etag) for etag in etags)
+
+        if_modified_since = request.get_header("If-Modified-Since")
+        if if_modified_since:
+            try:
+                since = falcon.util.http_date_to_dt(if_modified_since)
+            except ValueError:
+                return False
+            return self.modified <= calendar.timegm(since.timetuple())
+        return False
+
+
+class StaticFiles(object):
+    """Resolves files within a set of static directories, caching path lookups and the contents of small hot files
+
+    Resolved paths, including failed lookups, are reused for revalidate_after seconds before the file is checked again
+    and any cached contents whose modification time or size has since changed are dropped. Files up to max_file_size
+    bytes are kept in memory, least recently used first, up to a total of max_bytes.
+    """
+
+    __slots__ = (
+        "directories",
+        "max_file_size",
+        "max_bytes",
+        "max_paths",
+        "revalidate_after",
+        "paths",
+        "files",
+        "cached_bytes",
+        "lock",
+    )
+
+    def __init__(
+        self,
+        directories,
+        max_file_size=256 * 1024,
+        max_bytes=32 * 1024 * 1024,
+        max_paths=4096,
+        revalidate_after=1.0,
+    ):
+        self.directories = tuple(os.path.abspath(directory) for directory in directories)
+        self.max_file_size = max_file_size
+        self.max_bytes = max_bytes
+        self.max_paths = max_paths
+        self.revalidate_after = revalidate_after
+        self.paths = OrderedDict()
+        self.files = OrderedDict()
+        self.cached_bytes = 0
+        self.lock = threading.Lock()
+
+    def resolve(self, filename):
+        """Returns the StaticFile the given relative filename points to, checking the disk directly"""
+        for directory in self.directories:
+            path = os.path.abspath(os.path.join(directory, filename))
+            if not path.startswith(directory):
+                return None
+
+            try:
+                status = os.stat(path)
+                if stat.S_ISDIR(status.st_mode):
+                    path = os.path.join(path, "index.html")
+                    status = os.stat(path)
+            except OSError:
+                continue
+            if stat.S_ISREG(status.st_mode):
+                return StaticFile(path, status)
+        return None
+
+    def lookup(self, filename):
+        """Returns the StaticFile the given relative filename points to, or None if there isn't one"""
+        now = time.monotonic()
+        with self.lock:
+            cached = self.paths.get(filename)
+            if cached is not None and now - cached[0] < self.revalidate_after:
+                self.paths.move_to_end(filename)
+                return cached[1]
+
+        static_file = self.resolve(filename)
+        with self.lock:
+            self.paths[filename] = (now, static_file)
+            self.paths.move_to_end(filename)
+            while len(self.paths) > self.max_paths:
+                self.paths.popitem(last=False)
+        return static_file
+
+    def read(self, static_file):
+        """Returns the contents of the file from memory when small enough to cache, otherwise its path"""
+        if static_file.size > self.max_file_size or static_file.size > self.max_bytes:
+            return static_file.path
+
+        with self.lock:
+            cached = self.files.get(static_file.path)
+            if cached is not None and cached[0] == static_file.etag:
+                self.files.move_to_end(static_file.path)
+                return cached[1]
+
+        try:
+            with open(static_file.path, "rb") as open_file:
+                data = open_file.read()
+        except OSError:
+            return static_file.path
+
+        with self.lock:
+            previous = self.files.pop(static_file.path, None)
+            if previous is not None:
+                self.cached_bytes -= len(previous[1])
+            self.files[static_file.path] = (static_file.etag, data)
+            self.cached_bytes += len(data)
+            while self.cached_bytes > self.max_bytes:
+                self.cached_bytes -= len(self.files.popitem(last=False)[1][1])
+        return data
+
+    def serve(self, request, response, filename):
+        """Returns the requested file for output, or raises the appropriate not found or not modified status"""
+        static_file = self.lookup(filename)
+        if static_file is None:
+            hug.redirect.not_found()
+
+        response.set_header("ETag", static_file.etag)
+        response.set_header("Last-Modified", static_file.last_modified)
+        if request is not None and static_file.not_modified(request):
+            raise falcon.http_status.HTTPStatus(falcon.HTTP_304)
+
+        content = self.read(static_file)
+        if isinstance(content, bytes):
+            content = BytesIO(content)
+            content.name = static_file.path
+        return content
+
+
 class StaticRouter(SinkRouter):
     """Provides a chainable router that can be used to return static files automatically from a set of directories"""
 
     __slots__ = ("route",)
 
-    def __init__(self, urls=None, output=hug.output_format.file, cache=False, **kwargs):
+    def __init__(
+        self, urls=None, output=hug.output_format.file, cache=False, file_cache=True, **kwargs
+    ):
         super().__init__(urls=urls, output=output, **kwargs)
         if cache is True:
             self.cache()
         elif cache is not False:
             self.cache(**cache)
+        if file_cache is False:
+            self.route["file_cache"] = {"max_bytes": 0, "revalidate_after": 0}
+        elif file_cache is not True:
+            self.route["file_cache"] = file_cache
 
     def __call__(self, api_function):
-        directories = []
-        for directory in api_function():
-            path = os.path.abspath(directory)
-            directories.append(path)
+        static_files = StaticFiles(api_function(), **self.route.get("file_cache", {}))
 
         api = self.route.get("api", hug.api.from_object(api_function))
         for base_url in self.route.get("urls", ("/{0}".format(api_function.__name__),)):
 
-            def read_file(request=None, path=""):
-                filename = path.lstrip("/")
-                for directory in directories:
-                    path = os.path.abspath(os.path.join(directory, filename))
-                    if not path.startswith(directory):
-                        hug.redirect.not_found()
-                    if os.path.isdir(path):
-                        new_path = os.path.join(path, "index.html")
-                        if os.path.exists(new_path) and os.path.isfile(new_path):
-                            path = new_path
-                    if os.path.exists(path) and os.path.isfile(path):
-                        return path
-
-                hug.redirect.not_found()
+            def read_file(request=None, response=None, path=""):
+                return static_files.serve(request, response, path.lstrip("/"))
 
             api.http.add_sink(self._create_interface(api, read_file)[0], base_url)
         return api_function
@@ -506,6 +704,7 @@ class URLRouter(HTTPRouter):
                         ] = callable_method
 
         interface.examples = use_examples
+        api.http.changed()
         return callable_method
 
     def urls(self, *urls, **overrides):
@@ -19,6 +19,12 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 OTHER DEALINGS IN THE SOFTWARE.
 
 """
+import sys
+import time
+from collections import OrderedDict
+from itertools import islice
+from threading import Lock
+
 from hug.exceptions import StoreKeyNotFound
 
 
@@ -27,7 +33,7 @@ class InMemoryStore:
     Naive store class which can be used for the session middleware and unit tests.
     It is not thread-safe and no data will survive the lifecycle of the hug process.
     Regard this as a blueprint for more useful and probably more complex store implementations, for example stores
-    which make use of databases like Redis, PostgreSQL or others.
+    which make use of databases like Redis, PostgreSQL or others, or use BoundedInMemoryStore.
     """
 
     def __init__(self):
@@ -53,3 +59,196 @@ class InMemoryStore:
         """Delete data for given store key."""
         if key in self._data:
             del self._data[key]
+
+
+def deep_sizeof(data):
+    """Returns the memory used by the data in bytes, including that of every item within dicts, lists, tuples and
+       sets
+    """
+    size = 0
+    seen = set()
+    pending = [data]
+    while pending:
+        item = pending.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            pending.extend(item)
+    return size
+
+
+class StoreShard(object):
+    """A single lock guarded partition of a BoundedInMemoryStore, its entries kept in least recently used order"""
+
+    __slots__ = (
+        "lock",
+        "entries",
+        "size",
+        "next_sweep",
+        "hits",
+        "misses",
+        "evictions",
+        "expirations",
+    )
+
+    def __init__(self):
+        self.lock = Lock()
+        self.entries = OrderedDict()
+        self.size = 0
+        self.next_sweep = 0
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def remove(self, key):
+        """Removes the given key, which must be present"""
+        self.size -= self.entries.pop(key)[1]
+
+    def sweep(self, now, limit):
+        """Removes the expired entries among the limit least recently used, returning True if all of them were"""
+        expired = [
+            key
+            for key, (expires, _, _) in islice(self.entries.items(), limit)
+            if expires is not None and expires <= now
+        ]
+        for key in expired:
+            self.remove(key)
+        self.expirations += len(expired)
+        return len(expired) == limit
+
+
+class BoundedInMemoryStore:
+    """
+    Thread-safe store which keeps its data in the memory of the hug process, bounded in both size and lifetime.
+
+    Keys are spread over a number of shards, each with its own lock, so concurrent requests rarely contend. Entries
+    expire ttl seconds after they are set (never, if ttl is None), which can be overridden per key.
+
+    Limits are enforced per shard: when a shard grows beyond its share of max_entries or max_bytes (the limit divided
+    by the number of shards, of which there are never more than max_entries), its least recently used entries are
+    evicted. Keys that hash unevenly can so cause evictions while the store as a whole is below its limits.
+
+    Expired entries are removed when read, and swept out of a shard as it is written to: at most once every
+    sweep_interval seconds, each write examines up to sweep_batch of its least recently used entries, carrying on with
+    the next write while every entry examined has expired. Writes never scan a whole shard.
+
+    The size of an entry, for max_bytes, is measured by sizeof: deep_sizeof unless given, which counts the containers
+    of the data (such as a session's dict) along with everything they hold.
+    """
+
+    __slots__ = (
+        "ttl",
+        "shards",
+        "max_entries",
+        "max_bytes",
+        "sizeof",
+        "sweep_interval",
+        "sweep_batch",
+    )
+
+    def __init__(
+        self,
+        ttl: float = None,
+        max_entries: int = None,
+        max_bytes: int = None,
+        shards: int = 16,
+        sizeof=None,
+        sweep_interval: float = 60,
+        sweep_batch: int = 64,
+    ):
+        self.ttl = ttl
+        if max_entries:
+            shards = min(shards, max_entries)
+        self.shards = tuple(StoreShard() for _ in range(shards))
+        self.max_entries = max_entries and max(max_entries // shards, 1)
+        self.max_bytes = max_bytes and max(max_bytes // shards, 1)
+        self.sizeof = deep_sizeof if sizeof is None else sizeof
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+
+    def shard(self, key):
+        """Returns the shard responsible for the given key"""
+        return self.shards[hash(key) % len(self.shards)]
+
+    def get(self, key):
+        """Get data for given store key. Raise hug.exceptions.StoreKeyNotFound if key does not exist."""
+        shard = self.shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is not None:
+                if entry[0] is None or entry[0] > time.monotonic():
+                    shard.entries.move_to_end(key)
+                    shard.hits += 1
+                    return entry[2]
+                shard.remove(key)
+                shard.expirations += 1
+            shard.misses += 1
+        raise StoreKeyNotFound(key)
+
+    def exists(self, key):
+        """Return whether key exists or not."""
+        entry = self.shard(key).entries.get(key)
+        return entry is not None and (entry[0] is None or entry[0] > time.monotonic())
+
+    def set(self, key, data, ttl=None):
+        """Set data object for given store key, optionally expiring after a ttl other than the store's own."""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.monotonic()
+        size = self.sizeof(data) if self.max_bytes else 0
+        shard = self.shard(key)
+        with shard.lock:
+            if key in shard.entries:
+                shard.remove(key)
+            shard.entries[key] = (None if ttl is None else now + ttl, size, data)
+            shard.size += size
+
+            if now >= shard.next_sweep and not shard.sweep(now, self.sweep_batch):
+                shard.next_sweep = now + self.sweep_interval
+
+            entries = shard.entries
+            while len(entries) > 1 and (
+                (self.max_entries and len(entries) > self.max_entries)
+                or (self.max_bytes and shard.size > self.max_bytes)
+            ):
+                shard.remove(next(iter(entries)))
+                shard.evictions += 1
+
+    def delete(self, key):
+        """Delete data for given store key."""
+        shard = self.shard(key)
+        with shard.lock:
+            if key in shard.entries:
+                shard.remove(key)
+
+    def clear(self):
+        """Delete all data from the store."""
+        for shard in self.shards:
+            with shard.lock:
+                shard.entries.clear()
+                shard.size = 0
+
+    def __len__(self):
+        return sum(len(shard.entries) for shard in self.shards)
+
+    @property
+    def hits(self):
+        """The number of gets that found their key"""
+        return sum(shard.hits for shard in self.shards)
+
+    @property
+    def misses(self):
+        """The number of gets for keys that didn't exist or had expired"""
+        return sum(shard.misses for shard in self.shards)
+
+    @property
+    def evictions(self):
+        """The number of entries removed to keep the store within max_entries and max_bytes"""
+        return sum(shard.evictions for shard in self.shards)
+
+    @property
+    def expirations(self):
+        """The number of entries removed because their ttl had passed"""
+        return sum(shard.expirations for shard in self.shards)
@@ -22,6 +22,7 @@ OTHER DEALINGS IN THE SOFTWARE.
 from __future__ import absolute_import
 
 from hug.decorators import auto_kwargs
+from hug.format import affix_matcher, match_content_type
 
 
 def content_type(transformers, default=None):
@@ -39,9 +40,11 @@ def content_type(transformers, default=None):
         for content_type, transformer in transformers.items()
     }
     default = default and auto_kwargs(default)
+    offered = tuple(transformers.keys())
 
     def transform(data, request):
-        transformer = transformers.get(request.content_type.split(";")[0], default)
+        matched = match_content_type(request.content_type, offered)
+        transformer = default if matched is None else transformers[matched]
         if not transformer:
             return data
 
@@ -65,14 +68,11 @@ def suffix(transformers, default=None):
         for suffix, transformer in transformers.items()
     }
     default = default and auto_kwargs(default)
+    matcher = affix_matcher(transformers.keys(), suffix=True)
 
     def transform(data, request):
-        path = request.path
-        transformer = default
-        for suffix_test, suffix_transformer in transformers.items():
-            if path.endswith(suffix_test):
-                transformer = suffix_transformer
-                break
+        matched = matcher(request.path)
+        transformer = default if matched is None else transformers[matched]
 
         return transformer(data) if transformer else data
 
@@ -94,14 +94,11 @@ def prefix(transformers, default=None):
         for prefix, transformer in transformers.items()
     }
     default = default and auto_kwargs(default)
+    matcher = affix_matcher(transformers.keys())
 
     def transform(data, request=None, response=None):
-        path = request.path
-        transformer = default
-        for prefix_test, prefix_transformer in transformers.items():
-            if path.startswith(prefix_test):
-                transformer = prefix_transformer
-                break
+        matched = matcher(request.path)
+        transformer = default if matched is None else transformers[matched]
 
         return transformer(data) if transformer else data
 
@@ -95,7 +95,13 @@ class Service(object):
 
 
 class HTTP(Service):
-    __slots__ = ("endpoint", "session", "json_transport")
+    """Consumes a service over HTTP, sending parameters as JSON, as query parameters, or through a transport.
+
+    A transport is any hug output format, such as hug.output_format.msgpack, used to encode the parameters sent.
+    It's also requested for the response, which is decoded using the matching hug input format.
+    """
+
+    __slots__ = ("endpoint", "session", "json_transport", "transport")
 
     def __init__(
         self,
@@ -106,6 +112,7 @@ class HTTP(Service):
         timeout=None,
         raise_on=(500,),
         json_transport=True,
+        transport=None,
         **kwargs
     ):
         super().__init__(timeout=timeout, raise_on=raise_on, version=version, **kwargs)
@@ -114,12 +121,19 @@ class HTTP(Service):
         self.session.auth = auth
         self.session.headers.update(headers)
         self.json_transport = json_transport
+        self.transport = transport
+        if transport and "Accept" not in headers:
+            self.session.headers["Accept"] = transport.content_type
 
     def request(
         self, method, url, url_params=empty.dict, headers=empty.dict, timeout=None, **params
     ):
         url = "{0}/{1}".format(self.version, url.lstrip("/")) if self.version else url
-        kwargs = {"json" if self.json_transport else "params": params}
+        if self.transport:
+            headers = dict({"Content-Type": self.transport.content_type}, **headers)
+            kwargs = {"data": self.transport(params)}
+        else:
+            kwargs = {"json" if self.json_transport else "params": params}
         response = self.session.request(
             method, self.endpoint + url.format(url_params), headers=headers, **kwargs
         )
@@ -97,6 +97,38 @@ def test_api_routes(hug_api):
     ]
 
 
+def test_version_router(hug_api):
+    """Ensure requests are dispatched to the handler for the version asked for by URL, header or query param"""
+
+    @hug.get("/echo", versions=range(1, 12), api=hug_api, output=hug.output_format.json)
+    def echo(text, hug_api_version):
+        return "{0}: {1}".format(hug_api_version, text)
+
+    @hug.get("/echo", versions=12, api=hug_api, output=hug.output_format.json)
+    def echo_twelve(text):
+        return "twelve: {0}".format(text)
+
+    @hug.not_found(versions=11, api=hug_api)
+    def not_found_eleven():
+        return "eleven not found"
+
+    hug_api.http.server()
+    assert hug.test.get(hug_api, "v3/echo", text="hi").data == "3: hi"
+    assert hug.test.get(hug_api, "v12/echo", text="hi").data == "twelve: hi"
+    assert hug.test.get(hug_api, "echo", text="hi", api_version=12).data == "twelve: hi"
+    assert (
+        hug.test.get(hug_api, "echo", text="hi", headers={"X-API-VERSION": "012"}).data
+        == "twelve: hi"
+    )
+    assert hug.test.get(hug_api, "v2/echo", text="hi", api_version="2").data == "2: hi"
+    with pytest.raises(ValueError):
+        hug.test.get(hug_api, "v2/echo", text="hi", api_version=3)
+
+    assert hug.test.get(hug_api, "/v11/missing").data == "eleven not found"
+    assert hug.test.get(hug_api, "/v1/missing").status == "404 Not Found"
+    assert isinstance(hug_api.http.not_found, hug.api.VersionRouter)
+
+
 def test_cli_interface_api_with_exit_codes(hug_api_error_exit_codes_enabled):
     api = hug_api_error_exit_codes_enabled
 
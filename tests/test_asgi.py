@@ -0,0 +1,371 @@
+"""tests/test_asgi.py.
+
+Tests the ASGI server hug provides alongside its WSGI one
+
+Copyright (C) 2016  Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+import asyncio
+import json
+import os
+
+import hug
+
+from .constants import BASE_DIRECTORY
+
+loop = asyncio.get_event_loop()
+
+
+async def asgi_call(app, method, path, query_string=b"", headers=(), body=b""):
+    """Simulates a round-trip ASGI call, returning the status, headers and body sent back"""
+    messages = []
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": method,
+        "path": path,
+        "query_string": query_string,
+        "headers": [(name.encode(), value.encode()) for name, value in headers],
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = messages[0]
+    return (
+        start["status"],
+        {name.decode(): value.decode() for name, value in start["headers"]},
+        b"".join(message.get("body", b"") for message in messages[1:]),
+    )
+
+
+def test_asgi_server(hug_api):
+    """Test to ensure the ASGI server exposes the same routes and behaviour as the WSGI one"""
+
+    @hug.get(api=hug_api)
+    def synchronous(name: hug.types.text):
+        return "Hello {0}".format(name)
+
+    @hug.get(api=hug_api)
+    async def asynchronous(number: hug.types.number):
+        await asyncio.sleep(0)
+        return number * 2
+
+    @hug.get("/versioned", versions=1, api=hug_api)
+    async def versioned_1():
+        return 1
+
+    @hug.get("/versioned", versions=2, api=hug_api)
+    def versioned_2():
+        return 2
+
+    @hug.post(api=hug_api)
+    def echo(body):
+        return body
+
+    app = hug_api.http.asgi_server()
+    status, headers, body = loop.run_until_complete(
+        asgi_call(app, "GET", "/synchronous", b"name=Tim")
+    )
+    assert status == 200
+    assert headers["content-type"] == "application/json; charset=utf-8"
+    assert json.loads(body.decode()) == "Hello Tim"
+
+    status, headers, body = loop.run_until_complete(
+        asgi_call(app, "GET", "/asynchronous", b"number=21")
+    )
+    assert json.loads(body.decode()) == 42
+
+    status, headers, body = loop.run_until_complete(asgi_call(app, "GET", "/asynchronous"))
+    assert status == 400
+    assert "errors" in json.loads(body.decode())
+
+    assert loop.run_until_complete(asgi_call(app, "GET", "/v1/versioned"))[2] == b"1"
+    assert loop.run_until_complete(asgi_call(app, "GET", "/v2/versioned"))[2] == b"2"
+
+    status, headers, body = loop.run_until_complete(
+        asgi_call(
+            app,
+            "POST",
+            "/echo",
+            headers=(("content-type", "application/json"), ("content-length", "13")),
+            body=b'{"data": "a"}',
+        )
+    )
+    assert json.loads(body.decode()) == {"data": "a"}
+
+    status, headers, body = loop.run_until_complete(asgi_call(app, "GET", "/not_defined"))
+    assert status == 404
+    assert "documentation" in json.loads(body.decode())
+
+
+def test_asgi_max_body_size(hug_api):
+    """Test to ensure the ASGI server rejects request bodies larger than its max_body_size"""
+
+    @hug.post(api=hug_api)
+    def echo(body):
+        return body
+
+    app = hug_api.http.asgi_server(max_body_size=16)
+    json_type = ("content-type", "application/json")
+    status, headers, body = loop.run_until_complete(
+        asgi_call(
+            app,
+            "POST",
+            "/echo",
+            headers=(json_type, ("content-length", "13")),
+            body=b'{"data": "a"}',
+        )
+    )
+    assert status == 200
+    assert json.loads(body.decode()) == {"data": "a"}
+
+    large = b'{"data": "' + b"a" * 32 + b'"}'
+    status, headers, body = loop.run_until_complete(
+        asgi_call(
+            app,
+            "POST",
+            "/echo",
+            headers=(json_type, ("content-length", str(len(large)))),
+            body=large,
+        )
+    )
+    assert status == 413
+    assert (
+        loop.run_until_complete(asgi_call(app, "POST", "/echo", headers=(json_type,), body=large))[
+            0
+        ]
+        == 413
+    )
+
+
+def test_asgi_disconnect(hug_api):
+    """Test to ensure requests whose client disconnects before sending the whole body are abandoned"""
+    called = []
+
+    @hug.post(api=hug_api)
+    def echo(body):
+        called.append(body)
+        return body
+
+    app = hug_api.http.asgi_server()
+    messages = [
+        {"type": "http.request", "body": b'{"data": ', "more_body": True},
+        {"type": "http.disconnect"},
+    ]
+    sent = []
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/echo",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+    }
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    loop.run_until_complete(app(scope, receive, send))
+    assert not called
+    assert not sent
+
+
+def test_asgi_concurrency(hug_api):
+    """Test to ensure coroutine endpoints are awaited on the event loop instead of blocking it"""
+    release = asyncio.Event()
+
+    @hug.get(api=hug_api)
+    async def wait():
+        await release.wait()
+        return "released"
+
+    @hug.get(api=hug_api)
+    async def trigger():
+        release.set()
+        return "triggered"
+
+    app = hug_api.http.asgi_server(max_workers=1)
+    waiting, triggered = loop.run_until_complete(
+        asyncio.gather(asgi_call(app, "GET", "/wait"), asgi_call(app, "GET", "/trigger"))
+    )
+    assert waiting[2] == b'"released"'
+    assert triggered[2] == b'"triggered"'
+
+
+def test_asgi_lifespan_and_middleware(hug_api):
+    """Test to ensure startup handlers run once through the lifespan protocol and middleware is applied"""
+    started = []
+
+    @hug.startup(api=hug_api)
+    async def on_startup(api):
+        started.append(api)
+
+    @hug.response_middleware(api=hug_api)
+    def add_header(request, response, resource):
+        response.set_header("X-Middleware", "ran")
+
+    @hug.get(api=hug_api)
+    def hello():
+        return "hi"
+
+    app = hug_api.http.asgi_server()
+    messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    loop.run_until_complete(app({"type": "lifespan"}, receive, send))
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+    assert started == [hug_api]
+
+    app = hug_api.http.asgi_server()
+    status, headers, body = loop.run_until_complete(asgi_call(app, "GET", "/hello"))
+    assert headers["x-middleware"] == "ran"
+    assert started == [hug_api]
+
+
+def test_asgi_streaming(hug_api):
+    """Test to ensure async generators are streamed chunk by chunk without blocking the event loop"""
+
+    @hug.get(api=hug_api, output=hug.output_format.json, stream=True)
+    async def rows():
+        for number in range(3):
+            await asyncio.sleep(0)
+            yield {"number": number}
+
+    @hug.get(api=hug_api, output=hug.output_format.pretty_json)
+    async def collected():
+        yield 1
+        yield 2
+
+    @hug.get(api=hug_api, output=hug.output_format.json)
+    def synchronous_rows():
+        return (number for number in range(3))
+
+    app = hug_api.http.asgi_server()
+    status, headers, body = loop.run_until_complete(asgi_call(app, "GET", "/rows"))
+    assert status == 200
+    assert "content-length" not in headers
+    assert json.loads(body.decode()) == [{"number": number} for number in range(3)]
+
+    assert json.loads(loop.run_until_complete(asgi_call(app, "GET", "/collected"))[2].decode()) == [
+        1,
+        2,
+    ]
+    status, headers, body = loop.run_until_complete(asgi_call(app, "GET", "/synchronous_rows"))
+    assert json.loads(body.decode()) == [0, 1, 2]
+
+
+async def asgi_progress(app, path, produced):
+    """Simulates an ASGI call, returning how many items had been produced when each part of the body was sent"""
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": []}
+    progress = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message.get("body"):
+            progress.append((len(produced), message["body"]))
+
+    await app(scope, receive, send)
+    return progress
+
+
+def test_asgi_streaming_json_stream(hug_api):
+    """Test to ensure async generators are streamed incrementally by hug.output_format.json_stream"""
+    produced = []
+    padding = "x" * hug.format.STREAM_BUFFER_SIZE
+
+    @hug.get(api=hug_api, output=hug.output_format.json_stream)
+    async def rows():
+        for number in range(3):
+            await asyncio.sleep(0)
+            produced.append(number)
+            yield {"number": number, "padding": padding}
+
+    progress = loop.run_until_complete(asgi_progress(hug_api.http.asgi_server(), "/rows", produced))
+    assert [count for count, body in progress] == [1, 2, 3, 3]
+    assert json.loads(b"".join(body for count, body in progress).decode()) == [
+        {"number": number, "padding": padding} for number in range(3)
+    ]
+
+
+def test_asgi_streaming_ndjson(hug_api):
+    """Test to ensure async generators are streamed incrementally by hug.output_format.ndjson"""
+    produced = []
+    padding = "x" * hug.format.STREAM_BUFFER_SIZE
+
+    @hug.get(api=hug_api, output=hug.output_format.ndjson)
+    async def rows():
+        for number in range(3):
+            await asyncio.sleep(0)
+            produced.append(number)
+            yield {"number": number, "padding": padding}
+
+    progress = loop.run_until_complete(asgi_progress(hug_api.http.asgi_server(), "/rows", produced))
+    assert [count for count, body in progress] == [1, 2, 3]
+    lines = b"".join(body for count, body in progress).decode().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"number": number, "padding": padding} for number in range(3)
+    ]
+
+
+def test_asgi_zerocopy_send(hug_api):
+    """Test to ensure file responses are handed to servers supporting the zero copy send extension"""
+
+    @hug.get(api=hug_api, output=hug.output_format.file)
+    def logo():
+        return os.path.join(BASE_DIRECTORY, "artwork", "logo.png")
+
+    app = hug_api.http.asgi_server()
+    messages = []
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/logo",
+        "headers": [(b"range", b"bytes=10-19")],
+        "extensions": {"http.response.zerocopysend": {}},
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.zerocopysend":
+            message["file"].seek(message["offset"])
+            message["body"] = message["file"].read(message["count"])
+        messages.append(message)
+
+    loop.run_until_complete(app(scope, receive, send))
+    assert messages[0]["status"] == 206
+    assert (b"content-length", b"10") in messages[0]["headers"]
+    assert messages[1]["type"] == "http.response.zerocopysend"
+    with open(os.path.join(BASE_DIRECTORY, "artwork", "logo.png"), "rb") as logo_file:
+        assert messages[1]["body"] == logo_file.read()[10:20]
+    assert len(messages) == 2
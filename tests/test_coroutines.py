@@ -20,6 +20,7 @@ OTHER DEALINGS IN THE SOFTWARE.
 
 """
 import asyncio
+import threading
 
 import hug
 
@@ -96,3 +97,28 @@ def test_basic_call_on_method_registering_without_decorator_coroutine():
 
     assert loop.run_until_complete(api_instance.hello_world_method()) == "Hello World!"
     assert hug.test.get(api, "/hello_world_method").data == "Hello World!"
+
+
+def test_background_loop_coroutine(hug_api):
+    """Test to ensure coroutines share one long-lived event loop when an API opts into using a background loop"""
+    hug_api.background_loop = True
+    loops = []
+
+    @hug.startup(api=hug_api)
+    async def on_startup(api):
+        loops.append(asyncio.get_event_loop())
+
+    @hug.get(api=hug_api)
+    async def current_loop():
+        loops.append(asyncio.get_event_loop())
+        return "Hello World!"
+
+    assert hug.test.get(hug_api, "/current_loop").data == "Hello World!"
+    thread = threading.Thread(target=hug.test.get, args=(hug_api, "/current_loop"))
+    thread.start()
+    thread.join()
+
+    assert len(loops) == 3
+    assert loops[0] is loops[1] is loops[2] is hug._async.background_loop()
+    assert loops[0] is not loop
+    assert loops[0].is_running()
@@ -21,8 +21,10 @@ OTHER DEALINGS IN THE SOFTWARE.
 """
 import asyncio
 import json
+import mmap
 import os
 import sys
+from io import BytesIO
 from collections import namedtuple
 from unittest import mock
 
@@ -257,6 +259,100 @@ def test_range_request():
     assert hug.test.get(api, "image", headers={"range": "bytes=0--1"})
 
 
+def test_file_responses(hug_api):
+    """Test to ensure file responses are streamed with a known length, and ranges without loading the file"""
+
+    @hug.get(api=hug_api, output=hug.output_format.file)
+    def logo():
+        return os.path.join(BASE_DIRECTORY, "artwork", "logo.png")
+
+    @hug.get(api=hug_api, output=hug.output_format.file)
+    def in_memory():
+        return BytesIO(b"0123456789")
+
+    with open(os.path.join(BASE_DIRECTORY, "artwork", "logo.png"), "rb") as logo_file:
+        logo_data = logo_file.read()
+
+    response = hug.test.get(hug_api, "logo", headers={"range": "bytes=10-19"})
+    assert response.status == falcon.HTTP_206
+    assert response.headers_dict["content-length"] == "10"
+    assert response.headers_dict["content-range"] == "bytes 10-19/{0}".format(len(logo_data))
+
+    server = hug_api.http.server()
+    result = server(
+        create_environ(path="/logo", headers={"range": "bytes=10-19"}), StartResponseMock()
+    )
+    assert b"".join(result) == logo_data[10:20]
+
+    response = hug.test.get(hug_api, "in_memory")
+    assert response.headers_dict["content-length"] == "10"
+    response = hug.test.get(hug_api, "in_memory", headers={"range": "bytes=2-4"})
+    assert response.status == falcon.HTTP_206
+    assert response.data == "234"
+
+    stream = BytesIO(b"0123456789")
+    view = hug.interface.StreamSlice(stream, 3, 4)
+    assert view.read(2) == b"34"
+    assert view.read() == b"56"
+    assert view.read() == b""
+    assert stream.tell() == 7
+
+
+def test_range_request_forms(hug_api, tmpdir):
+    """Test to ensure suffix, open ended, multiple, and conditional ranges are handled as RFC 7233 describes"""
+    data_file = tmpdir.join("data.txt")
+    data_file.write("0123456789")
+
+    @hug.get(api=hug_api, output=hug.output_format.file)
+    def data():
+        return str(data_file)
+
+    @hug.get(api=hug_api, output=hug.output_format.file)
+    def mapped(response):
+        response.set_header("ETag", '"mapped"')
+        with open(str(data_file), "rb") as open_file:
+            return mmap.mmap(open_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get(url, headers):
+        response = hug.test.get(hug_api, url, headers=headers)
+        return response.status, response.headers_dict, response.data
+
+    status, headers, body = get("data", {"range": "bytes=-3"})
+    assert (status, headers["content-range"], body) == (falcon.HTTP_206, "bytes 7-9/10", "789")
+    status, headers, body = get("data", {"range": "bytes=8-"})
+    assert (status, headers["content-range"], body) == (falcon.HTTP_206, "bytes 8-9/10", "89")
+    assert get("data", {"range": "bytes=5-100"})[2] == "56789"
+    assert get("data", {"range": "bytes=-100"})[2] == "0123456789"
+
+    status, headers, body = get("data", {"range": "bytes=20-30"})
+    assert (status, headers["content-range"]) == (falcon.HTTP_416, "bytes */10")
+    status, headers, body = get("data", {"range": "bytes=100-"})
+    assert (status, headers["content-range"]) == (falcon.HTTP_416, "bytes */10")
+    assert get("data", {"range": "bytes=10-"})[0] == falcon.HTTP_416
+    status, headers, body = get("data", {"range": "bytes=0-4,100-"})
+    assert (status, headers["content-range"], body) == (falcon.HTTP_206, "bytes 0-4/10", "01234")
+    status, headers, body = get("data", {"range": "bytes=5-2"})
+    assert (status, body) == (falcon.HTTP_200, "0123456789")
+    assert headers["accept-ranges"] == "bytes"
+    assert get("data", {"range": "items=0-1"})[0] == falcon.HTTP_200
+
+    status, headers, body = get("data", {"range": "bytes=0-1, 8-"})
+    assert status == falcon.HTTP_206
+    content_type, boundary = headers["content-type"].split("; boundary=")
+    assert content_type == "multipart/byteranges"
+    assert int(headers["content-length"]) == len(body)
+    assert body == (
+        "--{0}\r\nContent-Type: text/plain\r\nContent-Range: bytes 0-1/10\r\n\r\n01\r\n"
+        "--{0}\r\nContent-Type: text/plain\r\nContent-Range: bytes 8-9/10\r\n\r\n89\r\n"
+        "--{0}--\r\n"
+    ).format(boundary)
+
+    assert get("mapped", {"range": "bytes=2-3"})[2] == "23"
+    assert get("mapped", {"range": "bytes=2-3", "if-range": '"mapped"'})[2] == "23"
+    status, headers, body = get("mapped", {"range": "bytes=2-3", "if-range": '"old"'})
+    assert (status, body) == (falcon.HTTP_200, "0123456789")
+
+
 def test_parameters_override():
     """Test to ensure the parameters override is handled as expected"""
 
@@ -1390,6 +1486,51 @@ def test_static_file_support():
     assert "404" in hug.test.get(api, "/static/NOT_IN_EXISTANCE.md").status
 
 
+def test_static_file_caching(hug_api, tmpdir):
+    """Test to ensure static files are cached in memory and conditional requests are answered with 304"""
+    hot_file = tmpdir.join("hot.txt")
+    hot_file.write("hot")
+    tmpdir.join("large.txt").write("large" * 100)
+
+    @hug.static("/static", api=hug_api, file_cache={"max_file_size": 100, "revalidate_after": 60})
+    def my_static_dirs():
+        return (str(tmpdir),)
+
+    response = hug.test.get(hug_api, "/static/hot.txt")
+    assert response.data == "hot"
+    assert response.headers_dict["content-type"] == "text/plain"
+    etag = response.headers_dict["etag"]
+    last_modified = response.headers_dict["last-modified"]
+
+    hot_file.remove()
+    response = hug.test.get(hug_api, "/static/hot.txt", headers={"If-None-Match": etag})
+    assert response.status == falcon.HTTP_304
+    assert response.headers_dict["etag"] == etag
+    response = hug.test.get(
+        hug_api, "/static/hot.txt", headers={"If-Modified-Since": last_modified}
+    )
+    assert response.status == falcon.HTTP_304
+    assert hug.test.get(hug_api, "/static/hot.txt").data == "hot"
+    assert hug.test.get(hug_api, "/static/hot.txt", headers={"If-None-Match": '"other"'}).data == (
+        "hot"
+    )
+    assert hug.test.get(hug_api, "/static/large.txt").data == "large" * 100
+
+    assert "404" in hug.test.get(hug_api, "/static/new.txt").status
+    tmpdir.join("new.txt").write("new")
+    assert "404" in hug.test.get(hug_api, "/static/new.txt").status
+
+    static_files = hug.routing.StaticFiles((str(tmpdir),), revalidate_after=0)
+    static_file = static_files.lookup("new.txt")
+    assert static_files.read(static_file) == b"new"
+    assert static_files.cached_bytes == 3
+    tmpdir.join("new.txt").write("changed")
+    static_file = static_files.lookup("new.txt")
+    assert static_files.read(static_file) == b"changed"
+    assert static_files.cached_bytes == 7
+    assert static_files.lookup("../outside.txt") is None
+
+
 def test_static_jailed():
     """Test to ensure we can't serve from outside static dir"""
 
@@ -1726,7 +1867,7 @@ def test_multipart():
 
     @hug.post()
     def test_multipart_post(**kwargs):
-        return kwargs
+        return {key: value.read() for key, value in kwargs.items()}
 
     with open(os.path.join(BASE_DIRECTORY, "artwork", "logo.png"), "rb") as logo:
         prepared_request = requests.Request(
@@ -1944,3 +2085,77 @@ def test_multiple_cli(hug_api):
         return items
 
     hug_api.cli([None, "multiple", "-i", "one", "-i", "two"])
+
+
+def test_streaming_generators(hug_api):
+    """Test to ensure generators are rendered incrementally by output formats that support streaming"""
+
+    @hug.get(api=hug_api, output=hug.output_format.json, stream=True)
+    def rows(count: hug.types.number = 3):
+        for number in range(count):
+            yield {"number": number}
+
+    @hug.get(api=hug_api, output=hug.output_format.json, stream=True)
+    async def async_rows():
+        for number in range(3):
+            await asyncio.sleep(0)
+            yield number
+
+    @hug.get(api=hug_api, output=hug.output_format.text, stream=True)
+    def lines():
+        yield "one\n"
+        yield "two\n"
+
+    @hug.get(api=hug_api, output=hug.output_format.pretty_json, stream=True)
+    def not_streamed():
+        yield 1
+        yield 2
+
+    @hug.get(api=hug_api, output=hug.output_format.json)
+    def collected():
+        yield 1
+        yield 2
+
+    server = hug_api.http.server()
+    response = StartResponseMock()
+    result = server(create_environ(path="/rows", query_string="count=2"), response)
+    assert not isinstance(result, list)
+    assert json.loads(b"".join(result).decode("utf8")) == [{"number": 0}, {"number": 1}]
+    assert "content-length" not in response.headers_dict
+
+    assert hug.test.get(hug_api, "rows").data == [{"number": number} for number in range(3)]
+    assert hug.test.get(hug_api, "rows", count=0).data == []
+    assert hug.test.get(hug_api, "async_rows").data == [0, 1, 2]
+    assert hug.test.get(hug_api, "lines").data == "one\ntwo\n"
+    assert hug.test.get(hug_api, "not_streamed").data == [1, 2]
+
+    result = server(create_environ(path="/collected"), StartResponseMock())
+    assert isinstance(result, list)
+    assert json.loads(b"".join(result).decode("utf8")) == [1, 2]
+
+
+def test_streaming_generator_errors(hug_api):
+    """Test to ensure exceptions raised by generators reach exception handlers unless the route opts in to streaming"""
+
+    @hug.exception(ValueError, api=hug_api)
+    def handle_value_error(exception):
+        return "handled"
+
+    @hug.get(api=hug_api, output=hug.output_format.json)
+    def collected():
+        yield 1
+        raise ValueError("mid stream")
+
+    @hug.get(api=hug_api, output=hug.output_format.json, stream=True)
+    def streamed():
+        yield 1
+        raise ValueError("mid stream")
+
+    assert hug.test.get(hug_api, "collected").data == "handled"
+
+    server = hug_api.http.server()
+    response = StartResponseMock()
+    result = server(create_environ(path="/streamed"), response)
+    assert response.status == "200 OK"
+    with pytest.raises(ValueError):
+        b"".join(result)
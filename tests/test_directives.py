@@ -78,6 +78,7 @@ def test_api():
 def test_documentation():
     """Test documentation directive"""
     assert "handlers" in hug.directives.documentation(api=api)
+    assert hug.directives.documentation(api=api) is hug.directives.documentation(api=api)
 
 
 def test_api_version():
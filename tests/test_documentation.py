@@ -194,3 +194,91 @@ def test_map_params_documentation_preserves_type():
 
     doc = api.http.documentation()
     assert doc["handlers"]["/map_params_test"]["GET"]["inputs"]["from"]["type"] == "A whole number"
+
+
+def test_documentation_cache(hug_api):
+    """Ensure generated documentation is reused until the routes of the API change"""
+    hug_api.http.output_format = hug.output_format.json
+
+    @hug.get(api=hug_api)
+    def first():
+        """The first endpoint"""
+
+    @hug.cli(api=hug_api)
+    def command():
+        """A command"""
+
+    generated = []
+    generate_documentation = hug.api.HTTPInterfaceAPI.generate_documentation
+
+    def counted(self, *args, **kwargs):
+        generated.append(args)
+        return generate_documentation(self, *args, **kwargs)
+
+    with mock.patch.object(hug.api.HTTPInterfaceAPI, "generate_documentation", counted):
+        documentation = hug_api.http.documentation()
+        assert "/first" in documentation["handlers"]
+        documentation["handlers"].clear()
+        assert "/first" in hug_api.http.documentation()["handlers"]
+        assert len(generated) == 1
+
+        missing = hug.test.get(hug_api, "/missing")
+        assert missing.status == "404 Not Found"
+        assert hug.test.get(hug_api, "/also_missing").data == missing.data
+        for host in ("one.example.com", "two.example.com"):
+            elsewhere = hug.test.get(hug_api, "/missing", headers={"Host": host}).data
+            assert elsewhere["documentation"]["handlers"].keys() == {"/first"}
+        assert len(generated) == 1
+
+        with mock.patch.object(hug.output_format, "_json_encode", side_effect=AssertionError):
+            assert hug.test.get(hug_api, "/missing").data == missing.data
+        assert len(hug_api.http._documentation_404) == 3
+
+        @hug.get(api=hug_api, examples="value=1")
+        def second():
+            """The second endpoint"""
+
+        assert "/second" in hug_api.http.documentation()["handlers"]
+        handlers = hug.test.get(hug_api, "/missing").data["documentation"]["handlers"]
+        assert handlers["/second"]["GET"]["examples"] == [
+            "http://falconframework.org/second?value=1"
+        ]
+        assert hug_api.http.documentation()["handlers"]["/second"]["GET"]["examples"] == [
+            "/second?value=1"
+        ]
+        assert len(generated) == 2
+
+        hug_api.http.documentation(api_version=1)
+        assert len(generated) == 3
+
+    usage = str(hug_api.cli)
+    assert str(hug_api.cli) is usage
+    assert "command" in usage
+
+    @hug.cli(api=hug_api)
+    def other_command():
+        """Another command"""
+
+    assert "other_command" in str(hug_api.cli)
+
+
+def test_documentation_copies(hug_api):
+    """Ensure the documentation returned can be modified without changing the documentation cached"""
+
+    @hug.get(api=hug_api, examples="tags=a")
+    def tagged(tags: hug.types.multiple = ["default"]):
+        """Tagged"""
+
+    documentation = hug_api.http.documentation()
+    handler = documentation["handlers"]["/tagged"]["GET"]
+    handler["examples"].append("/tagged?tags=b")
+    handler["inputs"]["tags"]["default"].append("changed")
+    handler["usage"] = "changed"
+
+    assert hug_api.http.documentation() == hug_api.http.shared_documentation()
+    assert hug_api.http.documentation()["handlers"]["/tagged"]["GET"] == {
+        "usage": "Tagged",
+        "examples": ["/tagged?tags=a"],
+        "outputs": handler["outputs"],
+        "inputs": {"tags": {"type": handler["inputs"]["tags"]["type"], "default": ["default"]}},
+    }
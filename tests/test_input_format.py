@@ -20,12 +20,14 @@ OTHER DEALINGS IN THE SOFTWARE.
 
 """
 import os
-from cgi import parse_header
 from io import BytesIO
 
+import falcon
+import pytest
 import requests
 
 import hug
+from hug.format import parse_header
 
 from .constants import BASE_DIRECTORY
 
@@ -42,6 +44,59 @@ def test_json():
     assert hug.input_format.json(test_data) == {"a": "b"}
 
 
+def test_ndjson(hug_api):
+    """Ensure that the ndjson input format lazily yields one record per line"""
+    test_data = BytesIO(b'{"a": "b"}\n\n[1, 2]\n"last"')
+    records = hug.input_format.ndjson(test_data)
+    assert next(records) == {"a": "b"}
+    assert test_data.tell() < len(test_data.getvalue())
+    assert list(records) == [[1, 2], "last"]
+
+    @hug.post(api=hug_api)
+    def count(body):
+        return sum(record["value"] for record in body)
+
+    assert (
+        hug.test.post(
+            hug_api,
+            "count",
+            body='{"value": 1}\n{"value": 2}\n',
+            headers={"content-type": "application/x-ndjson"},
+        ).data
+        == 3
+    )
+
+
+def test_msgpack(hug_api):
+    """Ensure that MessagePack formatted bodies are converted into native Python objects"""
+    msgpack = pytest.importorskip("msgpack")
+    data = {"values": [1, 2.5, "three", None], "raw": b"\x00\x01"}
+    assert hug.input_format.msgpack(BytesIO(msgpack.packb(data))) == data
+    assert hug.defaults.input_format["application/msgpack"] is hug.input_format.msgpack
+
+    @hug.post(api=hug_api)
+    def total(values):
+        return sum(values)
+
+    assert (
+        hug.test.post(
+            hug_api,
+            "total",
+            body=msgpack.packb({"values": [1, 2, 3]}),
+            headers={"content-type": "application/msgpack"},
+        ).data
+        == 6
+    )
+
+
+def test_cbor():
+    """Ensure that CBOR formatted bodies are converted into native Python objects"""
+    cbor2 = pytest.importorskip("cbor2")
+    data = {"values": [1, 2.5, "three", None], "raw": b"\x00\x01"}
+    assert hug.input_format.cbor(BytesIO(cbor2.dumps(data))) == data
+    assert hug.defaults.input_format["application/cbor"] is hug.input_format.cbor
+
+
 def test_json_underscore():
     """Ensure that camelCase keys can be converted into under_score for easier use within Python"""
     test_data = BytesIO(b'{"CamelCase": {"becauseWeCan": "ValueExempt"}}')
@@ -72,4 +127,80 @@ def test_multipart():
         file_content = hug.input_format.multipart(BytesIO(prepared_request.body), **headers)[
             "koala"
         ]
-        assert file_content == koala.read()
+        assert file_content.filename == "koala.png"
+        assert file_content.read() == koala.read()
+
+
+def test_multipart_streaming(hug_api):
+    """Ensure multipart form data is parsed incrementally, spooling large parts and enforcing size limits"""
+    prepared_request = requests.Request(
+        "POST",
+        "http://localhost/",
+        data={"name": "Timothy", "tags": ["one", "two"]},
+        files={"upload": ("data.bin", b"\r\n-" * 10000, "application/octet-stream")},
+    ).prepare()
+    headers = parse_header(prepared_request.headers["Content-Type"])[1]
+    body = prepared_request.body
+
+    form = hug.input_format.limited_multipart(memory_threshold=1024)(BytesIO(body), **headers)
+    assert form["name"] == "Timothy"
+    assert form["tags"] == ["one", "two"]
+    assert form["upload"].filename == "data.bin"
+    assert form["upload"].content_type == "application/octet-stream"
+    assert form["upload"]._rolled
+    assert form["upload"].read() == b"\r\n-" * 10000
+    parser = hug.input_format.MultipartParser(
+        BytesIO(body), headers["boundary"].encode(), chunk_size=7
+    )
+    parts = [(part_headers, b"".join(parser.data())) for part_headers in parser]
+    assert [data for part_headers, data in parts] == [b"Timothy", b"one", b"two", b"\r\n-" * 10000]
+    assert 'filename="data.bin"' in parts[-1][0]["content-disposition"]
+
+    with pytest.raises(falcon.HTTPPayloadTooLarge):
+        hug.input_format.limited_multipart(max_part_size=1024)(BytesIO(body), **headers)
+    with pytest.raises(falcon.HTTPPayloadTooLarge):
+        hug.input_format.limited_multipart(max_body_size=1024)(
+            BytesIO(body), content_length=len(body), **headers
+        )
+    with pytest.raises(falcon.HTTPBadRequest):
+        hug.input_format.multipart(BytesIO(body[:-100]), **headers)
+
+    @hug.post(
+        api=hug_api,
+        inputs={"multipart/form-data": hug.input_format.limited_multipart(max_body_size=1024)},
+    )
+    def upload(upload):
+        return upload.read()
+
+    response = hug.test.post(hug_api, "upload", body=body, headers=prepared_request.headers)
+    assert response.status == falcon.HTTP_413
+
+
+def test_multipart_limits_ignore_content_type_parameters(hug_api):
+    """Ensure clients can't override the multipart limits of the server through their content type's parameters"""
+    prepared_request = requests.Request(
+        "POST", "http://localhost/", files={"upload": ("data.bin", b"data")}
+    ).prepare()
+    body = prepared_request.body
+
+    @hug.post(
+        api=hug_api,
+        inputs={"multipart/form-data": hug.input_format.limited_multipart(max_body_size=1024)},
+    )
+    def limited(upload):
+        return upload.read().decode("utf8")
+
+    @hug.post(api=hug_api)
+    def unlimited(upload):
+        return upload.read().decode("utf8")
+
+    for override in ("max_body_size=5", "max_part_size=1", "memory_threshold=abc"):
+        headers = {
+            "content-type": "{0}; {1}".format(prepared_request.headers["Content-Type"], override)
+        }
+        assert hug.test.post(hug_api, "limited", body=body, headers=headers).data == "data"
+        assert hug.test.post(hug_api, "unlimited", body=body, headers=headers).data == "data"
+
+    headers = {"content-type": prepared_request.headers["Content-Type"] + "; max_body_size=999999"}
+    response = hug.test.post(hug_api, "limited", body=body * 100, headers=headers)
+    assert response.status == falcon.HTTP_413
@@ -48,6 +48,35 @@ class TestHTTP(object):
         with pytest.raises(KeyError):
             namer.interface.http.url(version=10)
 
+    def test_url_for(self, hug_api):
+        """Test to ensure URLs are built through the reverse routing index, which is rebuilt when routes change"""
+
+        @hug.get(("/items/{item_id}/{detail}", "/items/{item_id}", "/items"), api=hug_api)
+        def item(item_id=None, detail=None):
+            return item_id
+
+        http = hug_api.http
+        index = http.url_index()
+        assert http.url_for(item, item_id=1) == "/items/1"
+        assert http.url_for(item.interface.http, item_id=1, detail="x") == "/items/1/x"
+        assert http.url_for(item) == "/items"
+        assert item.interface.http.url(detail="x", item_id=2) == "/items/2/x"
+        assert item.interface.http.urls() == [
+            "/items/{item_id}/{detail}",
+            "/items/{item_id}",
+            "/items",
+        ]
+        with pytest.raises(KeyError):
+            http.url_for(item, unknown=1)
+        assert http.url_index() is index
+
+        @hug.get("/items/{item_id}/related/{other}", api=hug_api)
+        def related(item_id, other):
+            return other
+
+        assert http.url_index() is not index
+        assert related.interface.http.url(item_id=1, other=2) == "/items/1/related/2"
+
     def test_gather_parameters(self):
         """Test to ensure gathering parameters works in the expected way"""
 
@@ -62,6 +91,38 @@ class TestHTTP(object):
             == None
         )
 
+    def test_compile(self, hug_api):
+        """Test to ensure compiled call plans behave exactly like the interfaces they are compiled from"""
+        hug_api.http.compiled = True
+
+        @hug.get(api=hug_api, map_params={"from": "from_date"})
+        def dates(from_date: hug.types.number, request, hug_api_version=None):
+            assert request is not None
+            return from_date
+
+        @hug.get(api=hug_api, versions=(1, 2))
+        def versioned(api_version):
+            return api_version
+
+        @hug.exception(ValueError, api=hug_api)
+        def handle_value_error(exception):
+            return "handled"
+
+        @hug.get(api=hug_api)
+        def raises():
+            raise ValueError("bad")
+
+        compiled = dates.interface.http.compile()
+        assert compiled.interface is dates.interface.http
+        assert hug.test.get(hug_api, "dates", **{"from": 1}).data == 1
+        assert "errors" in hug.test.get(hug_api, "dates", **{"from": "not a number"}).data
+        assert "errors" in hug.test.get(hug_api, "dates").data
+        assert hug.test.get(hug_api, "/v2/versioned").data == 2
+        assert hug.test.get(hug_api, "raises").data == "handled"
+
+        server = hug_api.http.server()
+        assert server._router.find("/dates")[0].on_get is not dates.interface.http
+
 
 class TestLocal(object):
     """Test to ensure hug.interface.Local functionality works as expected"""
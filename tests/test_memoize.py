@@ -0,0 +1,379 @@
+"""tests/test_memoize.py.
+
+Tests the server side memoization of rendered HTTP responses
+
+Copyright (C) 2016 Timothy Edmund Crosley
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and
+to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all copies or
+substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED
+TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF
+CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+import asyncio
+import threading
+import time
+from io import BytesIO
+
+import falcon
+import pytest
+
+import hug
+from hug.memoize import Flight, ResponseCache, SingleFlight, freeze
+
+
+def test_freeze():
+    """Test to ensure parameter values are turned into hashable equivalents"""
+    assert freeze({"b": [1, 2], "a": {3}}) == freeze({"a": {3}, "b": [1, 2]})
+    assert freeze([1, 2]) != freeze((1, 2))
+    with pytest.raises(TypeError):
+        freeze(BytesIO())
+    with pytest.raises(TypeError):
+        freeze(bytearray())
+
+
+def test_response_cache():
+    """Test to ensure rendered responses are cached with a TTL, and evicted least recently used first"""
+    cache = ResponseCache(ttl=60, max_entries=2, max_bytes=10)
+
+    def response(data, status=falcon.HTTP_200):
+        response = falcon.Response()
+        response.status = status
+        response.data = data
+        response.set_header("X-Data", data.decode("utf8"))
+        return response
+
+    cache.set("one", response(b"1"))
+    cache.set("two", response(b"22"))
+    assert cache.get("one")[0].data == b"1"
+    cache.set("three", response(b"333"))
+    assert cache.get("two") == (None, False)
+    assert cache.size == 4
+    cache.set("large", response(b"12345678901"))
+    cache.set("error", response(b"4", falcon.HTTP_500))
+    assert cache.get("large") == cache.get("error") == (None, False)
+
+    cache.set("four", response(b"4444444"))
+    assert cache.get("one") == (None, False)
+    assert cache.size == 10
+
+    restored = falcon.Response()
+    cache.get("four")[0].respond(restored)
+    assert (restored.data, restored.get_header("X-Data")) == (b"4444444", "4444444")
+
+    cache = ResponseCache(ttl=0, stale_while_revalidate=60)
+    cache.set("stale", response(b"old"))
+    assert cache.get("stale") == (cache.entries["stale"], True)
+    assert cache.get("stale") == (cache.entries["stale"], False)
+    cache.clear()
+    assert not cache.entries and not cache.size
+
+
+def test_memoized_endpoints(hug_api):
+    """Test to ensure memoized endpoints skip calling the function when a rendered response is cached"""
+    calls = []
+
+    @hug.get(api=hug_api, memoize=60, versions=(1, 2), vary=lambda request: None)
+    def add(number_1: hug.types.number, number_2: hug.types.number, hug_timer):
+        calls.append((number_1, number_2))
+        return number_1 + number_2
+
+    @hug.get(
+        api=hug_api,
+        memoize=True,
+        output=hug.output_format.accept(
+            {"application/json": hug.output_format.json, "text/plain": hug.output_format.text}
+        ),
+    )
+    def negotiated():
+        calls.append("negotiated")
+        return "value"
+
+    @hug_api.route.http.get().memoize(ttl=60)
+    def body_failure():
+        calls.append("failure")
+        raise falcon.HTTPBadRequest("failed")
+
+    assert hug.test.get(hug_api, "/v1/add", number_1=1, number_2=2).data == 3
+    assert hug.test.get(hug_api, "/v1/add", number_2="2", number_1="1").data == 3
+    assert calls == [(1, 2)]
+    assert hug.test.get(hug_api, "/v2/add", number_1=1, number_2=2).data == 3
+    assert hug.test.get(hug_api, "/v1/add", number_1=2, number_2=2).data == 4
+    assert len(calls) == 3
+    assert "errors" in hug.test.get(hug_api, "/v1/add", number_1="one", number_2=2).data
+
+    assert hug.test.get(hug_api, "negotiated", headers={"Accept": "text/plain"}).data == "value"
+    assert hug.test.get(hug_api, "negotiated", headers={"Accept": "text/plain"}).data == "value"
+    response = hug.test.get(hug_api, "negotiated", headers={"Accept": "application/json"})
+    assert response.content_type == "application/json; charset=utf-8"
+    assert calls.count("negotiated") == 2
+
+    hug.test.get(hug_api, "body_failure")
+    hug.test.get(hug_api, "body_failure")
+    assert calls.count("failure") == 2
+
+    hug_api.http.compiled = True
+    assert hug.test.get(hug_api, "/v1/add", number_1=1, number_2=2).data == 3
+    assert len([call for call in calls if isinstance(call, tuple)]) == 3
+
+
+def test_memoized_headers(hug_api):
+    """Test to ensure only the headers an endpoint produces are replayed from its memoized responses"""
+    request_ids = iter(range(100))
+
+    @hug.request_middleware(api=hug_api)
+    def request_id(request, response):
+        response.set_header("X-Request-Id", str(next(request_ids)))
+
+    @hug.get(api=hug_api, memoize=60, vary=lambda request: None)
+    def greeting(response):
+        response.set_header("X-Greeting", "hello")
+        response.set_cookie("visited", "yes")
+        return "hello"
+
+    first = hug.test.get(hug_api, "greeting")
+    second = hug.test.get(hug_api, "greeting")
+    assert (first.data, second.data) == ("hello", "hello")
+    assert (first.headers_dict["x-request-id"], second.headers_dict["x-request-id"]) == ("0", "1")
+    assert second.headers_dict["x-greeting"] == "hello"
+    assert "set-cookie" in first.headers_dict and "set-cookie" not in second.headers_dict
+
+    cached = next(iter(greeting.interface.http.memoize.entries.values()))
+    assert set(cached.headers) == {"x-greeting", "content-type"}
+
+
+def test_memoized_stale_while_revalidate(hug_api):
+    """Test to ensure stale responses are served while a fresh one is rendered in the background"""
+    values = iter(range(10))
+
+    @hug.get(api=hug_api, memoize={"ttl": 0, "stale_while_revalidate": 60})
+    def counter():
+        return next(values)
+
+    assert hug.test.get(hug_api, "counter").data == 0
+    assert hug.test.get(hug_api, "counter").data == 0
+    for _attempt in range(100):
+        if hug.test.get(hug_api, "counter").data == 1:
+            break
+        time.sleep(0.01)
+    else:
+        raise AssertionError("The memoized response was never refreshed")
+
+
+def test_memoized_endpoints_vary(hug_api):
+    """Test to ensure endpoints depending on the caller are only memoized per what the vary function identifies"""
+
+    @hug.directive(apply_globally=False, api=hug_api)
+    def who(default=None, request=None, **kwargs):
+        return request.get_header("X-User")
+
+    with pytest.raises(ValueError):
+
+        @hug.get(api=hug_api, memoize=60)
+        def directed(hug_who):
+            return hug_who
+
+    with pytest.raises(ValueError):
+
+        @hug.get(api=hug_api, coalesce=True)
+        def requested(request):
+            return request.get_header("X-User")
+
+    @hug.get(api=hug_api, memoize=60, vary=lambda request: request.get_header("X-User"))
+    def greet(hug_who):
+        return "Hello {0}".format(hug_who)
+
+    @hug_api.route.http.get().memoize(ttl=60, vary=lambda request: request.get_header("X-User"))
+    def caller(request):
+        return request.get_header("X-User")
+
+    for user in ("alice", "bob", "alice"):
+        headers = {"X-User": user}
+        assert hug.test.get(hug_api, "greet", headers=headers).data == "Hello " + user
+        assert hug.test.get(hug_api, "caller", headers=headers).data == user
+
+
+def test_memoized_refresh_directives(hug_api):
+    """Test to ensure background refreshes get directives of their own, cleaned up once they're done"""
+    directives = []
+
+    class Resource(object):
+        def __init__(self, user):
+            self.user = user
+            self.closed = False
+            directives.append(self)
+
+        def cleanup(self, exception=None):
+            self.closed = True
+
+    @hug.directive(apply_globally=False, api=hug_api)
+    def resource(default=None, request=None, **kwargs):
+        return Resource(request.get_header("X-User"))
+
+    @hug.get(
+        api=hug_api,
+        memoize={"ttl": 0, "stale_while_revalidate": 60},
+        vary=lambda request: request.get_header("X-User"),
+    )
+    def counter(hug_resource):
+        assert not hug_resource.closed
+        return "{0} {1}".format(hug_resource.user, len(directives))
+
+    headers = {"X-User": "alice"}
+    assert hug.test.get(hug_api, "counter", headers=headers).data == "alice 1"
+    assert hug.test.get(hug_api, "counter", headers=headers).data == "alice 1"
+    for _attempt in range(100):
+        if hug.test.get(hug_api, "counter", headers=headers).data != "alice 1":
+            break
+        time.sleep(0.01)
+    else:
+        raise AssertionError("The memoized response was never refreshed")
+    assert directives[1].user == "alice"
+    for _attempt in range(100):
+        if all(directive.closed for directive in directives):
+            break
+        time.sleep(0.01)
+    else:
+        raise AssertionError("The directives of the refresh were never cleaned up")
+
+
+def test_single_flight():
+    """Test to ensure concurrent identical calls are coalesced into one, in threads and in coroutines"""
+    single_flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def slow(value):
+        calls.append(value)
+        release.wait()
+        return value * 2
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(single_flight.call("key", slow, 21)))
+        for _thread in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    while "key" not in single_flight.calls:
+        time.sleep(0.001)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == [42] * 5
+    assert calls == [21]
+    assert not single_flight.calls
+
+    def fails():
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        single_flight.call("key", fails)
+
+    flight = Flight(threading.Event())
+    flight.finish(iter(()))
+    assert not flight.shareable
+    assert SingleFlight._result(flight, slow, 0) == 0
+
+    async def slow_async(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def call_concurrently():
+        return await asyncio.gather(
+            *(single_flight.call_async("key", slow_async, 1) for _call in range(5))
+        )
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(call_concurrently())
+    finally:
+        loop.close()
+    assert results == [2] * 5
+    assert calls == [21, 0, 1]
+
+    async def cancelled_leader():
+        leader = asyncio.ensure_future(single_flight.call_async("cancelled", slow_async, 2))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(single_flight.call_async("cancelled", slow_async, 3))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(cancelled_leader()) == 6
+    finally:
+        loop.close()
+    assert not single_flight.async_calls
+
+    class Interrupted(BaseException):
+        pass
+
+    release = threading.Event()
+
+    def interrupted_leader():
+        release.wait()
+        raise Interrupted()
+
+    def lead():
+        try:
+            single_flight.call("interrupted", interrupted_leader)
+        except Interrupted:
+            results.append("interrupted")
+
+    results = []
+    leader = threading.Thread(target=lead)
+    leader.start()
+    while "interrupted" not in single_flight.calls:
+        time.sleep(0.001)
+    follower = threading.Thread(
+        target=lambda: results.append(single_flight.call("interrupted", lambda: "own call"))
+    )
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join()
+    follower.join()
+    assert sorted(results) == ["interrupted", "own call"]
+
+
+def test_coalesced_endpoints(hug_api):
+    """Test to ensure identical requests to coalesced endpoints made concurrently share a single call"""
+    calls = []
+    release = threading.Event()
+
+    @hug.get(api=hug_api, coalesce=True)
+    def expensive(value: hug.types.number):
+        calls.append(value)
+        release.wait()
+        return value
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(hug.test.get(hug_api, "expensive", value=1).data)
+        )
+        for _thread in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == [1] * 4
+    assert calls == [1]
+    assert hug.test.get(hug_api, "expensive", value=2).data == 2
+    assert calls == [1, 2]
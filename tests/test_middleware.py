@@ -17,15 +17,31 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 OTHER DEALINGS IN THE SOFTWARE.
 
 """
+import copy
+import gc
+import gzip
+import os
+import threading
+import weakref
+import zlib
 from http.cookies import SimpleCookie
 
 import pytest
+from falcon.testing import StartResponseMock, create_environ
 
 import hug
 from hug.exceptions import SessionNotFound
-from hug.middleware import CORSMiddleware, LogMiddleware, SessionMiddleware
+from hug.middleware import (
+    CompressionMiddleware,
+    CORSMiddleware,
+    LogMiddleware,
+    QueuedLogMiddleware,
+    SessionMiddleware,
+)
 from hug.store import InMemoryStore
 
+from .constants import BASE_DIRECTORY
+
 api = hug.API(__name__)
 
 # Fix flake8 undefined names (F821)
@@ -73,6 +89,78 @@ def test_session_middleware():
     assert cookies["test-sid"] != "foobarfoo"
 
 
+def test_session_middleware_lazy(hug_api):
+    calls = []
+
+    class Store(InMemoryStore):
+        def get(self, key):
+            calls.append(("get", key))
+            return copy.deepcopy(super().get(key))
+
+        def exists(self, key):
+            calls.append(("exists", key))
+            return super().exists(key)
+
+        def set(self, key, data):
+            calls.append(("set", key))
+            super().set(key, data)
+
+    session_store = Store()
+    session_store.set("known", {"name": "hug"})
+    del calls[:]
+    hug_api.http.add_middleware(SessionMiddleware(session_store, cookie_name="sid"))
+
+    @hug.get(api=hug_api)
+    def untouched():
+        return "untouched"
+
+    @hug.get(api=hug_api)
+    def read(request):
+        return request.context["session"].get("name")
+
+    @hug.get(api=hug_api)
+    def write(request):
+        request.context["session"]["name"] = "python"
+
+    @hug.get(api=hug_api)
+    def add_to_cart(request):
+        request.context["session"].setdefault("cart", []).append("item")
+
+    headers = {"Cookie": "sid=known"}
+    response = hug.test.get(hug_api, "/untouched", headers=headers)
+    assert "set-cookie" not in response.headers_dict
+    assert not calls
+
+    response = hug.test.get(hug_api, "/read", headers=headers)
+    assert response.data == "hug"
+    assert "set-cookie" not in response.headers_dict
+    assert calls == [("get", "known")]
+
+    del calls[:]
+    response = hug.test.get(hug_api, "/write", headers=headers)
+    assert "sid=known" in response.headers_dict["set-cookie"]
+    assert calls == [("get", "known"), ("set", "known")]
+    assert session_store.get("known") == {"name": "python"}
+
+    hug.test.get(hug_api, "/add_to_cart", headers=headers)
+    hug.test.get(hug_api, "/add_to_cart", headers=headers)
+    assert session_store.get("known") == {"name": "python", "cart": ["item", "item"]}
+
+
+def test_session_middleware_output(hug_api):
+    session_store = InMemoryStore()
+    session_store.set("known", {"name": "tim"})
+    hug_api.http.add_middleware(SessionMiddleware(session_store, cookie_name="sid"))
+
+    @hug.get(api=hug_api)
+    def session(hug_session):
+        return hug_session
+
+    response = hug.test.get(hug_api, "/session", headers={"Cookie": "sid=known"})
+    assert response.data == {"name": "tim"}
+    assert "set-cookie" not in response.headers_dict
+
+
 def test_logging_middleware():
     output = []
 
@@ -94,6 +182,53 @@ def test_logging_middleware():
     assert len(output[1]) > 0
 
 
+def test_queued_logging_middleware(hug_api):
+    output = []
+
+    class Logger(object):
+        def info(self, message, record):
+            output.append(message % record)
+
+    logger = QueuedLogMiddleware(
+        logger=Logger(), flush_interval=60, sample_rates={"2xx": 0.0, "4xx": 1}
+    )
+    hug_api.http.add_middleware(logger)
+    assert logger._writer_pid is None
+
+    @hug.get("/users/{user_id}", api=hug_api)
+    def user(user_id: hug.types.number):
+        return user_id
+
+    hug.test.get(hug_api, "/users/1")
+    assert logger._writer_pid == os.getpid()
+    writers = threading.active_count()
+    hug.test.get(hug_api, "/users/two")
+    assert threading.active_count() == writers
+    assert not output
+    assert len(logger.records) == 1
+    record = logger.records[0]
+    assert record["route"] == "/users/{user_id}"
+    assert record["path"] == "/users/two"
+    assert record["status"] == "400"
+
+    logger.flush()
+    assert not logger.records
+    assert output[0].startswith("GET /users/two 400 ")
+    assert output[0].endswith("ms")
+
+    logger._writer_pid = -1
+    hug.test.get(hug_api, "/users/three")
+    assert logger._writer_pid == os.getpid()
+    assert threading.active_count() == writers + 1
+
+    started = QueuedLogMiddleware(logger=Logger())
+    started.start_writer()
+    reference = weakref.ref(started)
+    del started
+    gc.collect()
+    assert reference() is None
+
+
 def test_cors_middleware(hug_api):
     hug_api.http.add_middleware(CORSMiddleware(hug_api, max_age=10))
 
@@ -153,3 +288,119 @@ def test_cors_middleware(hug_api):
     assert set(methods.split(",")) == set(["OPTIONS", "GET", "DELETE", "PUT"])
     assert set(allow.split(",")) == set(["OPTIONS", "GET", "DELETE", "PUT"])
     assert response.headers_dict["access-control-max-age"] == "10"
+
+
+def test_cors_middleware_preflight_cache(hug_api):
+    """Test to ensure CORS preflights are answered from a compiled route matcher, across multiple base URLs"""
+    cors = CORSMiddleware(hug_api, allow_origins=["https://example.com"])
+    hug_api.http.add_middleware(cors)
+
+    @hug.get("/users/{user_id}", api=hug_api)
+    def user(user_id):
+        return user_id
+
+    hug_api.http.base_url = "/admin"
+
+    @hug.delete("/users/{user_id}", api=hug_api)
+    def remove_user(user_id):
+        return user_id
+
+    def preflight(path, **headers):
+        response = hug.test.options(hug_api, path, headers=headers)
+        return response.headers_dict
+
+    headers = preflight(
+        "/users/1", Origin="https://example.com", **{"Access-Control-Request-Headers": "X-Token"}
+    )
+    assert headers["access-control-allow-methods"] == "GET, OPTIONS"
+    assert headers["access-control-allow-origin"] == "https://example.com"
+    assert headers["access-control-allow-headers"] == "X-Token"
+    assert "access-control-max-age" not in headers
+
+    assert preflight("/admin/users/1")["allow"] == "DELETE, OPTIONS"
+    assert preflight("/admin/v2/users/1")["allow"] == "DELETE, OPTIONS"
+    assert preflight("/users/1/extra")["allow"] == "OPTIONS"
+    assert "access-control-allow-origin" not in preflight("/users/1", Origin="https://evil.com")
+    assert cors.match_route("/admin/users/5") == "/users/{user_id}"
+    assert cors.match_route("/unknown") == "/unknown"
+
+    cached = len(cors._preflights)
+    preflight(
+        "/users/2", Origin="https://example.com", **{"Access-Control-Request-Headers": "X-Token"}
+    )
+    assert len(cors._preflights) == cached
+
+    @hug.put("/users/{user_id}", api=hug_api)
+    def update_user(user_id):
+        return user_id
+
+    assert preflight("/admin/users/1")["allow"] == "DELETE, OPTIONS, PUT"
+
+
+def test_compression_middleware(hug_api):
+    """Test to ensure response bodies are compressed according to the encodings the client accepts"""
+    hug_api.http.add_middleware(CompressionMiddleware(level=9, minimum_size=100))
+    text = "compress me " * 100
+
+    @hug.get(api=hug_api, output=hug.output_format.text)
+    def large():
+        return text
+
+    @hug.get(api=hug_api, output=hug.output_format.text)
+    def small():
+        return "tiny"
+
+    @hug.get(api=hug_api, output=hug.output_format.text, stream=True)
+    def streamed():
+        return ("line {0}\n".format(number) for number in range(1000))
+
+    @hug.get(api=hug_api, output=hug.output_format.png_image)
+    def image():
+        return os.path.join(BASE_DIRECTORY, "artwork", "logo.png")
+
+    @hug.static("/static", api=hug_api)
+    def static():
+        return (BASE_DIRECTORY,)
+
+    server = hug_api.http.server()
+
+    def get(url, accept_encoding=None):
+        response = StartResponseMock()
+        headers = {"Accept-Encoding": accept_encoding} if accept_encoding else {}
+        body = b"".join(server(create_environ(path=url, headers=headers), response))
+        return response.headers_dict, body
+
+    headers, body = get("/large", "gzip, deflate")
+    assert headers["content-encoding"] == "gzip"
+    assert headers["vary"] == "Accept-Encoding"
+    assert int(headers["content-length"]) == len(body) < len(text)
+    assert gzip.decompress(body).decode("utf8") == text
+
+    headers, body = get("/large", "gzip;q=0.5, deflate")
+    assert headers["content-encoding"] == "deflate"
+    assert zlib.decompress(body).decode("utf8") == text
+
+    headers, body = get("/large", "identity, *;q=0")
+    assert "content-encoding" not in headers
+    assert body.decode("utf8") == text
+    assert "content-encoding" not in get("/large")[0]
+    assert "content-encoding" not in get("/small", "gzip")[0]
+    assert "content-encoding" not in get("/image", "gzip")[0]
+
+    headers, body = get("/streamed", "gzip")
+    assert headers["content-encoding"] == "gzip"
+    assert "content-length" not in headers
+    assert gzip.decompress(body).decode("utf8") == "".join(
+        "line {0}\n".format(number) for number in range(1000)
+    )
+
+    identity_headers = get("/static/README.md")[0]
+    assert identity_headers["etag"].startswith('"')
+    headers, body = get("/static/README.md", "gzip")
+    assert headers["content-encoding"] == "gzip"
+    assert headers["etag"] == "W/" + identity_headers["etag"]
+
+    middleware = CompressionMiddleware(encodings=("gzip", "deflate"))
+    assert middleware.negotiate("br, gzip;q=0.1") == "gzip"
+    assert middleware.negotiate("*") == "gzip"
+    assert middleware.negotiate("gzip;q=0, deflate;q=0") is None
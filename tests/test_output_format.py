@@ -19,6 +19,9 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 OTHER DEALINGS IN THE SOFTWARE.
 
 """
+import collections.abc
+import dataclasses
+import enum
 import os
 from collections import namedtuple
 from datetime import datetime, timedelta
@@ -123,6 +126,374 @@ def test_json():
     ) == {"data": ["Τη γλώσσα μου έδωσαν ελληνική"]}
 
 
+@pytest.mark.parametrize("backend", ("orjson", "json"))
+def test_json_backends(backend):
+    """Ensure every JSON backend produces the same output, honouring the registered JSON converters"""
+    original = hug.json_module.json.name
+    hug.json_module.use(backend)
+    try:
+        assert hug.json_module.json.name == backend
+
+        class Money(object):
+            def __init__(self, amount):
+                self.amount = amount
+
+        @hug.output_format.json_convert(Money)
+        def convert(instance):
+            return "${0}".format(instance.amount)
+
+        now = datetime.now()
+        data = {
+            "price": Money(5),
+            "when": now,
+            "ratio": Decimal("1.5"),
+            1: UUID("2bb4a4d6-dafa-4e33-8b5f-1d63e0cc1e9d"),
+            "big": 2 ** 70,
+        }
+        output = hug.output_format.json(data)
+        assert isinstance(output, bytes)
+        assert hug.input_format.json(BytesIO(output)) == {
+            "price": "$5",
+            "when": now.isoformat(),
+            "ratio": "1.5",
+            "1": "2bb4a4d6-dafa-4e33-8b5f-1d63e0cc1e9d",
+            "big": 2 ** 70,
+        }
+        assert hug.output_format.pretty_json({"a": [1]}) == b'{\n    "a": [\n        1\n    ]\n}'
+        assert hug.output_format.json("é", ensure_ascii=True) == b'"\\u00e9"'
+
+        class NewObject(object):
+            pass
+
+        with pytest.raises(TypeError):
+            hug.output_format.json({"value": NewObject()})
+    finally:
+        hug.json_module.use(original)
+
+    with pytest.raises(ValueError):
+        hug.json_module.use("yaml")
+
+
+def test_json_records_nested_across_backends():
+    """Ensure nested namedtuples are written out the same way whichever JSON backend is in use"""
+    Point = namedtuple("Point", ("x", "y"))
+
+    @dataclasses.dataclass
+    class Line(object):
+        start: Point
+        end: Point
+
+    data = {
+        "p": Point(1, 2),
+        "deep": {"x": [Point(7, 8)]},
+        "line": Line(Point(0, 0), Point(1, 1)),
+        "points": [Point(3, 4)],
+    }
+    backends = [backend for backend in ("json", "orjson", "ujson") if getattr(hug.json_module, backend)]
+    original = hug.json_module.json.name
+    outputs = []
+    try:
+        for backend in backends:
+            hug.json_module.use(backend)
+            outputs.append(hug.input_format.json(BytesIO(hug.output_format.json(data))))
+            outputs.append(hug.input_format.json(BytesIO(hug.output_format.json([data]))))
+    finally:
+        hug.json_module.use(original)
+
+    assert outputs[0] == {
+        "p": [1, 2],
+        "deep": {"x": [[7, 8]]},
+        "line": {"start": {"x": 0, "y": 0}, "end": {"x": 1, "y": 1}},
+        "points": [[3, 4]],
+    }
+    assert all(output == outputs[index % 2] for index, output in enumerate(outputs))
+
+
+@pytest.mark.skipif(not hug.json_module.ujson, reason="ujson is not installed")
+def test_json_ujson_backend():
+    """Ensure ujson is only used when asked for, and converts what it can't serialize through the converters"""
+    if "HUG_JSON_BACKEND" not in os.environ and "HUG_USE_UJSON" not in os.environ:
+        assert hug.json_module.HUG_JSON_BACKEND == "json"
+
+    original = hug.json_module.json.name
+    hug.json_module.use("ujson")
+    try:
+
+        class Money(object):
+            def __init__(self, amount):
+                self.amount = amount
+
+        @hug.output_format.json_convert(Money)
+        def convert(instance):
+            return "${0}".format(instance.amount)
+
+        now = datetime.now()
+        output = hug.output_format.json({"price": Money(5), "when": now, "path": "a/b"})
+        assert hug.input_format.json(BytesIO(output)) == {
+            "price": "$5",
+            "when": now.isoformat(),
+            "path": "a/b",
+        }
+        assert b"a/b" in output
+
+        class NewObject(object):
+            pass
+
+        with pytest.raises(TypeError):
+            hug.output_format.json({"value": NewObject()})
+    finally:
+        del hug.output_format.json_converters[Money]
+        hug.output_format.json_dispatch.clear()
+        hug.json_module.use(original)
+
+
+@pytest.mark.parametrize("backend", ("orjson", "json"))
+def test_json_native_type_converters(backend):
+    """Ensure converters registered for types orjson writes out natively are applied with every backend"""
+
+    class Token(UUID):
+        pass
+
+    class Color(enum.Enum):
+        red = 1
+
+    original = hug.json_module.json.name
+    hug.json_module.use(backend)
+    try:
+        plain = UUID(int=1)
+        data = {"token": Token(int=0), "plain": plain}
+        assert hug.input_format.json(BytesIO(hug.output_format.json(data))) == {
+            "token": str(Token(int=0)),
+            "plain": str(plain),
+        }
+        hug.output_format.json_convert(Token)(lambda item: "token:{0}".format(item.int))
+        hug.output_format.json_convert(Color)(lambda item: item.name)
+        assert hug.input_format.json(BytesIO(hug.output_format.json(data))) == {
+            "token": "token:0",
+            "plain": str(plain),
+        }
+        assert hug.output_format.json([Color.red]) == b'["red"]'
+    finally:
+        del hug.output_format.json_converters[Token]
+        del hug.output_format.json_converters[Color]
+        hug.output_format.json_dispatch.clear()
+        hug.output_format._converts_orjson_native.cache_clear()
+        hug.json_module.use(original)
+
+
+def test_json_converter_dispatch():
+    """Ensure JSON converters are resolved once per type, through its bases, and re-resolved on registration"""
+
+    class Base(object):
+        pass
+
+    class Child(Base):
+        pass
+
+    class Sized(object):
+        def __len__(self):
+            return 1
+
+    hug.output_format.json_convert(Base)(lambda item: "base")
+    assert hug.output_format._json_converter(Child()) == "base"
+    assert hug.output_format.json_dispatch[Child] is hug.output_format.json_converters[Base]
+
+    hug.output_format.json_convert(Child)(lambda item: "child")
+    assert Child not in hug.output_format.json_dispatch
+    assert hug.output_format._json_converter(Child()) == "child"
+    assert hug.output_format._json_converter(Base()) == "base"
+
+    with pytest.raises(TypeError):
+        hug.output_format._json_converter(Sized())
+    hug.output_format.json_convert(collections.abc.Sized)(lambda item: len(item))
+    assert hug.output_format._json_converter(Sized()) == 1
+    del hug.output_format.json_converters[collections.abc.Sized]
+    hug.output_format.json_dispatch.clear()
+    hug.output_format.json_native_dispatch.clear()
+
+    class Color(enum.Enum):
+        red = 1
+
+    with pytest.raises(TypeError):
+        hug.output_format._json_converter(Color.red)
+
+
+@pytest.mark.parametrize("backend", ("orjson", "json"))
+def test_json_records(hug_api, backend):
+    """Ensure namedtuples, dataclasses and hug schemas are written out as objects, through generated encoders"""
+    Point = namedtuple("Point", ("x", "y"))
+
+    @dataclasses.dataclass
+    class Line(object):
+        start: Point
+        end: Point
+        label: str = "line"
+
+    @dataclasses.dataclass
+    class Shape(object):
+        lines: list
+
+    class User(hug.types.Schema):
+        username = hug.types.text
+        age = hug.types.number
+
+    original = hug.json_module.json.name
+    hug.json_module.use(backend)
+    try:
+
+        def encoded(data):
+            return hug.input_format.json(BytesIO(hug.output_format.json(data)))
+
+        assert encoded(Point(1, 2)) == {"x": 1, "y": 2}
+        assert encoded([Point(1, 2), Point(3, 4)]) == [{"x": 1, "y": 2}, {"x": 3, "y": 4}]
+        assert encoded(Line(Point(1, 2), Point(3, 4))) == {
+            "start": {"x": 1, "y": 2},
+            "end": {"x": 3, "y": 4},
+            "label": "line",
+        }
+        assert encoded(Shape([Line(Point(0, 0), Point(1, 1), "diagonal")])) == {
+            "lines": [{"start": {"x": 0, "y": 0}, "end": {"x": 1, "y": 1}, "label": "diagonal"}]
+        }
+        assert encoded({"k": Point(1, 2)}) == {"k": [1, 2]}
+        assert encoded([3, (Point(3, 4),)]) == [3, [[3, 4]]]
+        assert encoded(Point(Point(1, 2), Line(Point(0, 0), Point(1, 1)))) == {
+            "x": {"x": 1, "y": 2},
+            "y": {"start": {"x": 0, "y": 0}, "end": {"x": 1, "y": 1}, "label": "line"},
+        }
+        unchanged = {"list": [1, (2, 3)], "text": "value"}
+        assert hug.output_format._json_records(unchanged) is unchanged
+        unchanged = [{"point": Point(1, 2)}, (2, 3)]
+        assert hug.output_format._json_records(unchanged) is unchanged
+
+        Keywords = type(
+            "Keywords", (hug.types.Schema,), {"klass": hug.types.text, "class": hug.types.text}
+        )
+        assert encoded(Keywords({"klass": "a", "class": "b"})) == {"klass": "a", "class": "b"}
+        assert encoded([User({"username": "brandon", "age": "30"}), User({})]) == [
+            {"username": "brandon", "age": 30},
+            {"username": None, "age": None},
+        ]
+        assert hug.output_format.record_encoder(Line) is hug.output_format.record_encoders[Line]
+        assert hug.output_format.record_encoder(dict) is None
+
+        @hug.get(api=hug_api, output=hug.output_format.json)
+        def points():
+            return [Point(number, number) for number in range(3)]
+
+        assert hug.test.get(hug_api, "points").data == [
+            {"x": number, "y": number} for number in range(3)
+        ]
+    finally:
+        hug.json_module.use(original)
+
+
+def test_msgpack(hug_api):
+    """Ensure that it's possible to output MessagePack, applying the registered JSON converters"""
+    msgpack = pytest.importorskip("msgpack")
+
+    class Money(object):
+        pass
+
+    hug.output_format.json_convert(Money)(lambda item: "$5")
+    now = datetime.now()
+    data = {"when": now, "price": Money(), "raw": b"\x00", "ratios": numpy.array([0.5, 1.5])}
+    assert msgpack.unpackb(hug.output_format.msgpack(data)) == {
+        "when": now.isoformat(),
+        "price": "$5",
+        "raw": b"\x00",
+        "ratios": [0.5, 1.5],
+    }
+    point = namedtuple("Point", ("x", "y"))(1, 2)
+    assert msgpack.unpackb(hug.output_format.msgpack([point])) == [{"x": 1, "y": 2}]
+
+    negotiated = hug.output_format.accept(
+        {
+            "application/json": hug.output_format.json,
+            "application/msgpack": hug.output_format.msgpack,
+        }
+    )
+
+    @hug.get(api=hug_api, output=negotiated)
+    def numbers():
+        return list(range(5))
+
+    response = hug.test.get(hug_api, "numbers", headers={"Accept": "application/msgpack"})
+    assert response.content_type == "application/msgpack"
+    assert msgpack.unpackb(response.data) == list(range(5))
+    response = hug.test.get(hug_api, "numbers", headers={"Accept": "application/json"})
+    assert response.data == list(range(5))
+
+
+def test_cbor():
+    """Ensure that it's possible to output CBOR, applying the registered JSON converters"""
+    cbor2 = pytest.importorskip("cbor2")
+
+    class Money(object):
+        pass
+
+    hug.output_format.json_convert(Money)(lambda item: "$5")
+    data = {"price": Money(), "ratios": numpy.array([0.5, 1.5]), "values": {1, 2}}
+    assert cbor2.loads(hug.output_format.cbor(data)) == {
+        "price": "$5",
+        "ratios": [0.5, 1.5],
+        "values": {1, 2},
+    }
+
+
+def test_json_stream(hug_api):
+    """Ensure that it's possible to output large arrays as JSON incrementally, one element at a time"""
+
+    def streamed(data):
+        return hug.input_format.json(BytesIO(b"".join(hug.output_format.json_stream(data))))
+
+    now = datetime.now()
+    assert streamed([1, "two", now, Decimal("1.5")]) == [1, "two", now.isoformat(), "1.5"]
+    assert streamed(number for number in range(3)) == [0, 1, 2]
+    assert streamed([]) == []
+    assert streamed(numpy.arange(3)) == [0, 1, 2]
+
+    class Rows(object):
+        def __native_types__(self):
+            return ({"row": number} for number in range(2))
+
+    assert streamed(Rows()) == [{"row": 0}, {"row": 1}]
+
+    assert hug.output_format.json_stream({"text": "text"}) == hug.output_format.json(
+        {"text": "text"}
+    )
+    data = namedtuple("BaseTuple", ("name", "value"))("name", "value")
+    assert hug.output_format.json_stream(data) == hug.output_format.json(data)
+
+    @hug.get(api=hug_api, output=hug.output_format.json_stream)
+    def export():
+        return [{"id": number} for number in range(1000)]
+
+    assert hug.test.get(hug_api, "export").data == [{"id": number} for number in range(1000)]
+
+
+def test_ndjson(hug_api):
+    """Ensure that it's possible to output records as newline delimited JSON, one record per line"""
+    line = hug.output_format.ndjson({"a": "b"})
+    assert line.endswith(b"\n") and line.count(b"\n") == 1
+    assert hug.input_format.json(BytesIO(line)) == {"a": "b"}
+    output = b"".join(hug.output_format.ndjson({"id": number} for number in range(3)))
+    assert [hug.input_format.json(BytesIO(line)) for line in output.splitlines()] == [
+        {"id": number} for number in range(3)
+    ]
+    assert output.endswith(b"\n")
+    assert b"".join(hug.output_format.ndjson([])) == b""
+
+    @hug.get(api=hug_api, output=hug.output_format.ndjson)
+    def export():
+        return ({"id": number} for number in range(3))
+
+    response = hug.test.get(hug_api, "export")
+    assert response.content_type == "application/x-ndjson; charset=utf-8"
+    assert [
+        hug.input_format.json(BytesIO(line.encode("utf8"))) for line in response.data.splitlines()
+    ] == [{"id": number} for number in range(3)]
+
+
 def test_pretty_json():
     """Ensure that it's possible to output a Hug API method as prettified and indented JSON"""
     test_data = {"text": "text"}
@@ -294,6 +665,50 @@ def test_accept():
     assert formatter("hi", request, response) == b'"hi"'
 
 
+def test_accept_negotiation():
+    """Ensure Accept headers are negotiated by quality and specificity, including wildcard media ranges"""
+    negotiate = hug.format.negotiate
+    offered = ("application/json", "text/plain", "text/html")
+    assert negotiate("text/*", offered) == "text/plain"
+    assert negotiate("text/*, text/html", offered) == "text/html"
+    assert negotiate("text/*;q=0.5, */*;q=0.1", offered) == "text/plain"
+    assert negotiate("*/*;q=0.1, application/json;q=0.2", offered) == "application/json"
+    assert negotiate("text/plain, application/json", offered) == "text/plain"
+    assert negotiate("text/*, text/plain;q=0", offered) == "text/html"
+    assert negotiate("Application/JSON", offered) == "application/json"
+    assert negotiate("image/png, text/plain;q=nonsense", offered) is None
+    assert hug.format.media_ranges("*, text/plain;level=1;q=0.5") == (
+        ("*/*", 1.0),
+        ("text/plain", 0.5),
+    )
+
+    negotiate.cache_clear()
+    negotiate("text/*", offered)
+    negotiate("text/*", offered)
+    assert negotiate.cache_info().hits == 1
+
+    formatter = hug.output_format.accept(
+        {"application/json": hug.output_format.json, "text/plain": hug.output_format.text}
+    )
+
+    class FakeRequest(object):
+        accept = "*/*"
+
+    request = FakeRequest()
+    response = FakeRequest()
+    assert formatter("hi", request, response) == b'"hi"'
+
+    request.accept = "text/*;q=0.9, application/*;q=0.8"
+    assert formatter("hi", request, response) == b"hi"
+    assert response.content_type == hug.output_format.text.content_type
+
+    assert hug.format.match_content_type("text/CSV; charset=utf-8", ("text/*", "*/*")) == "text/*"
+    assert hug.format.match_content_type(None, ("text/*",)) is None
+    assert hug.format.affix_matcher((".json", ".gz", "n"), suffix=True)("data.json") == ".json"
+    assert hug.format.affix_matcher(("v1/", "v1/admin/"))("v1/admin/users") == "v1/admin/"
+    assert hug.format.affix_matcher(())("anything") is None
+
+
 def test_accept_with_http_errors():
     """Ensure that content type based output formats work for HTTP error responses"""
     formatter = hug.output_format.accept(
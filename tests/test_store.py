@@ -19,12 +19,15 @@ CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFT
 OTHER DEALINGS IN THE SOFTWARE.
 
 """
+import sys
+from unittest import mock
+
 import pytest
 
 from hug.exceptions import StoreKeyNotFound
-from hug.store import InMemoryStore
+from hug.store import BoundedInMemoryStore, InMemoryStore, deep_sizeof
 
-stores_to_test = [InMemoryStore()]
+stores_to_test = [InMemoryStore(), BoundedInMemoryStore(ttl=60, max_entries=100)]
 
 
 @pytest.mark.parametrize("store", stores_to_test)
@@ -47,3 +50,72 @@ def test_stores_generically(store):
     # Delete key
     store.delete(key)
     assert not store.exists(key)
+
+
+def test_bounded_store():
+    store = BoundedInMemoryStore(max_entries=2, shards=1)
+    store.set("first", 1)
+    store.set("second", 2)
+    assert store.get("first") == 1
+    store.set("third", 3)
+    assert not store.exists("second")
+    assert store.exists("first") and store.exists("third")
+    assert len(store) == 2
+    assert store.evictions == 1
+
+    with pytest.raises(StoreKeyNotFound):
+        store.get("second")
+    assert (store.hits, store.misses) == (1, 1)
+
+    store = BoundedInMemoryStore(max_entries=3, shards=16)
+    assert len(store.shards) == 3
+    for number in range(20):
+        store.set(number, number)
+    assert len(store) <= 3
+    assert store.exists(19)
+
+    store = BoundedInMemoryStore(max_bytes=10, shards=1, sizeof=len)
+    store.set("first", "12345")
+    store.set("second", "123456")
+    assert not store.exists("first")
+    assert store.get("second") == "123456"
+
+    session = {"cart": ["item"] * 10000}
+    assert deep_sizeof(session) > sys.getsizeof(session) + sys.getsizeof(session["cart"])
+    store = BoundedInMemoryStore(max_bytes=deep_sizeof(session) * 3 // 2, shards=1)
+    store.set("first", session)
+    store.set("second", {"cart": ["other"] * 10000})
+    assert not store.exists("first")
+    assert store.exists("second")
+
+    store = BoundedInMemoryStore(ttl=10, shards=1, sweep_interval=0)
+    with mock.patch("hug.store.time.monotonic", return_value=100):
+        store.set("short", "data", ttl=1)
+        store.set("default", "data")
+    with mock.patch("hug.store.time.monotonic", return_value=105):
+        assert not store.exists("short")
+        with pytest.raises(StoreKeyNotFound):
+            store.get("short")
+        assert store.get("default") == "data"
+    with mock.patch("hug.store.time.monotonic", return_value=1000):
+        store.set("short", "data", ttl=1)
+        assert len(store) == 1
+        assert store.expirations == 2
+        assert store.get("short") == "data"
+
+    store = BoundedInMemoryStore(ttl=10, shards=1, sweep_interval=60, sweep_batch=2)
+    with mock.patch("hug.store.time.monotonic", return_value=100):
+        for number in range(5):
+            store.set(number, number)
+    with mock.patch("hug.store.time.monotonic", return_value=200):
+        store.set("first", "data")
+        assert (len(store), store.expirations) == (4, 2)
+        store.set("second", "data")
+        assert (len(store), store.expirations) == (3, 4)
+        store.set("third", "data")
+        assert (len(store), store.expirations) == (3, 5)
+        store.set("fourth", "data")
+        assert (len(store), store.expirations) == (4, 5)
+
+    store.clear()
+    assert len(store) == 0
@@ -38,6 +38,13 @@ def test_content_type():
     request.content_type = "undefined"
     transformer({"data": "value"}, request) == {"data": "value"}
 
+    transformer = hug.transform.content_type({"text/*": str, "application/json": int})
+    request.content_type = "text/csv; charset=utf-8"
+    assert transformer(3, request) == "3"
+
+    request.content_type = None
+    assert transformer("4", request) == "4"
+
 
 def test_suffix():
     """Test to ensure transformer content based on the end suffix of the URL works as expected"""
@@ -55,6 +62,10 @@ def test_suffix():
     request.path = "hey.undefined"
     transformer({"data": "value"}, request) == {"data": "value"}
 
+    transformer = hug.transform.suffix({".js": int, "min.js": str})
+    request.path = "hey.min.js"
+    assert transformer(5, request) == "5"
+
 
 def test_prefix():
     """Test to ensure transformer content based on the end prefix of the URL works as expected"""
@@ -103,6 +103,28 @@ class TestHTTP(object):
         assert self.service.endpoint == "http://www.google.com/"
         assert self.service.raise_on == (404, 400)
 
+    def test_transport(self):
+        """Test to ensure the HTTP service can send and receive parameters through a binary transport"""
+        msgpack = pytest.importorskip("msgpack")
+        service = use.HTTP("http://example.com/", transport=hug.output_format.msgpack)
+        assert service.session.headers["Accept"] == "application/msgpack"
+
+        sent = {}
+
+        def request(method, url, headers, **kwargs):
+            sent.update(kwargs, method=method, url=url, headers=headers)
+            response = requests.Response()
+            response.status_code = 200
+            response.headers["content-type"] = "application/msgpack"
+            response._content = msgpack.packb({"total": 6})
+            return response
+
+        service.session.request = request
+        assert service.post("total", values=[1, 2, 3]).data == {"total": 6}
+        assert sent["url"] == "http://example.com/total"
+        assert sent["headers"]["Content-Type"] == "application/msgpack"
+        assert msgpack.unpackb(sent["data"]) == {"values": [1, 2, 3]}
+
     @pytest.mark.extnetwork
     def test_request(self):
         """Test so ensure the HTTP service can successfully be used to pull data from an external service"""